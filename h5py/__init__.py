@@ -34,6 +34,12 @@ _errors.silence_errors()
 from ._conv import register_converters as _register_converters
 _register_converters()
 
+# The converters take the GIL, so they must be gone before HDF5's own atexit
+# handler frees them after the interpreter has shut down.
+import atexit as _atexit
+from ._conv import unregister_converters as _unregister_converters
+_atexit.register(_unregister_converters)
+
 from .h5z import _register_lzf
 _register_lzf()
 
@@ -13,23 +13,60 @@
 
 from __future__ import absolute_import
 
+import copy
 import posixpath as pp
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
 import six
 from six.moves import xrange    # pylint: disable=redefined-builtin
+from six.moves import queue
 
 import numpy
 
 from .. import h5s, h5t, h5r, h5d
+from .._objects import file_io
 from .base import HLObject, phil, with_phil
 from . import filters
 from . import selections as sel
+from .selections import box_bounds, box_shape, iter_chunk_slices
 from . import selections2 as sel2
 from .datatype import Datatype
 
 _LEGACY_GZIP_COMPRESSION_VALS = frozenset(range(10))
 
+# File drivers which store the raw data verbatim in a single file
+_MEMMAP_DRIVERS = ('sec2', 'stdio', 'windows')
+
+# Approximate size of the blocks read by Dataset.iter_rows for datasets
+# which aren't chunked
+ITER_BLOCK_BYTES = 1024*1024
+
+# Number of chunks handed to each worker at a time by Dataset.read/write
+READ_BATCH_CHUNKS = 4
+
+# Maximum number of memory types and dataspaces cached by each Dataset
+PLAN_CACHE_SIZE = 64
+
+# Size of the buffer Dataset.__setitem__ fills with copies of a small
+# array (or scalar) broadcast over a larger selection
+BROADCAST_BUFFER_BYTES = 4*1024*1024
+
+# Reads with Dataset.skip_unallocated set are done normally if more than
+# this fraction of the selection lies in allocated chunks
+ALLOCATED_READ_FRACTION = 0.5
+
+# Dataset.read_masked reads masks selecting less than this fraction of the
+# dataset as a point selection, rather than chunk by chunk
+MASK_POINTS_FRACTION = 0.01
+
+# Index list reads needing more than FANCY_SLABS hyperslabs read the box
+# enclosing the index lists instead, if at least FANCY_BOX_FRACTION of it
+# is wanted
+FANCY_SLABS = 64
+FANCY_BOX_FRACTION = 0.02
+
 def readtime_dtype(basetype, names):
     """ Make a NumPy dtype appropriate for reading """
 
@@ -133,6 +170,160 @@ def make_new_dset(parent, shape=None, dtype=None, data=None,
     return dset_id
 
 
+def _check_not_reordered(*selections):
+    """ Direct transfers move data in storage order, so selections with
+    out-of-order or repeated indices can't be used with them.
+    """
+    for selection in selections:
+        if isinstance(selection, sel.FancySelection) and selection.reordered:
+            raise TypeError("Indexing elements must be in increasing order for direct transfers")
+
+
+def _read_ahead(dset, blocks):
+    """ Yield dset[start:stop] for each (start, stop) pair in "blocks",
+    reading the following block in a background thread meanwhile.
+    """
+    # Reads in the worker thread must see the caller's astype() setting
+    astype = getattr(dset._local, 'astype', None)   # pylint: disable=protected-access
+
+    def start_read(start, stop):
+        """ Read a block in a new thread; returns (thread, result dict) """
+        result = {}
+        def run():
+            # pylint: disable=protected-access
+            dset._local.astype = astype
+            try:
+                result['data'] = dset[start:stop]
+            except Exception:
+                result['exc_info'] = sys.exc_info()
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread, result
+
+    def finish_read(pending):
+        """ Wait for a block started by start_read and return its data """
+        thread, result = pending
+        thread.join()
+        if 'exc_info' in result:
+            six.reraise(*result['exc_info'])
+        return result['data']
+
+    pending = None
+    for start, stop in blocks:
+        following = start_read(start, stop)
+        if pending is not None:
+            yield finish_read(pending)
+        pending = following
+    if pending is not None:
+        yield finish_read(pending)
+
+
+def _decode_read(dset, start, stop, out, workers):
+    """ Fill "out" with the box [start, stop) of a chunked dataset, fetching
+    the raw chunks with read_direct_chunk and decoding them in a pool of
+    "workers" threads.  The next batch of chunks is fetched while the
+    previous one is being decoded.
+    """
+    # pylint: disable=protected-access
+    chunks = dset.chunks
+    dtype = dset.dtype
+    pipeline = filters.get_pipeline(dset._dcpl)
+    nelements = int(numpy.prod(chunks))
+    nbytes = nelements*dtype.itemsize
+    fillvalue = dset.fillvalue
+
+    def fetch(slices):
+        """ Read the raw chunk containing "slices" (None if unallocated) """
+        offset = tuple(s.start - s.start % c for s, c in zip(slices, chunks))
+        try:
+            filter_mask, data = dset.id.read_direct_chunk(offset)
+        except KeyError:
+            filter_mask, data = 0, None
+        return slices, offset, filter_mask, data
+
+    def place(item):
+        """ Decode a chunk and copy the selected part into "out" """
+        slices, offset, filter_mask, data = item
+        dest = tuple(slice(s.start-x, s.stop-x) for s, x in zip(slices, start))
+        if data is None:
+            out[dest] = fillvalue
+            return
+        data = filters.decode_chunk(pipeline, filter_mask, data,
+                                    dtype.itemsize, nbytes)
+        arr = numpy.frombuffer(data, dtype=dtype, count=nelements).reshape(chunks)
+        out[dest] = arr[tuple(slice(s.start-o, s.stop-o) for s, o in zip(slices, offset))]
+
+    pool = ThreadPool(workers)
+    try:
+        pending = None
+        batch = []
+        for slices in iter_chunk_slices(start, stop, chunks):
+            batch.append(fetch(slices))
+            if len(batch) == READ_BATCH_CHUNKS*workers:
+                if pending is not None:
+                    pending.get()
+                pending = pool.map_async(place, batch, 1)
+                batch = []
+        if pending is not None:
+            pending.get()
+        pool.map(place, batch, 1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _encode_write(dset, start, stop, data, workers):
+    """ Write "data" to the chunk-aligned box [start, stop) of a chunked
+    dataset, compressing the chunks in a pool of "workers" threads and
+    writing them in order with write_direct_chunk.  The next batch of
+    chunks is compressed while the previous one is being written.
+    """
+    # pylint: disable=protected-access
+    chunks = dset.chunks
+    dtype = dset.dtype
+    pipeline = filters.get_pipeline(dset._dcpl)
+    fillvalue = dset.fillvalue
+
+    def encode(slices):
+        """ Compress the data for the chunk containing "slices" """
+        offset = tuple(s.start for s in slices)
+        src = tuple(slice(s.start-x, s.stop-x) for s, x in zip(slices, start))
+        if all(s.stop-s.start == c for s, c in zip(slices, chunks)):
+            chunk = numpy.ascontiguousarray(data[src])
+        else:
+            # Edge chunks are stored full-size, padded with the fill value
+            chunk = numpy.empty(chunks, dtype=dtype)
+            chunk[...] = fillvalue
+            chunk[tuple(slice(0, s.stop-s.start) for s in slices)] = data[src]
+        return offset, filters.encode_chunk(pipeline, chunk, dtype.itemsize)
+
+    def commit(results):
+        """ Write a batch of compressed chunks to the file """
+        for offset, buf in results:
+            dset.id.write_direct_chunk(offset, buf)
+
+    pool = ThreadPool(workers)
+    try:
+        pending = None
+        batch = []
+        for slices in iter_chunk_slices(start, stop, chunks):
+            batch.append(slices)
+            if len(batch) == READ_BATCH_CHUNKS*workers:
+                following = pool.map_async(encode, batch, 1)
+                if pending is not None:
+                    commit(pending.get())
+                pending = following
+                batch = []
+        following = pool.map_async(encode, batch, 1)
+        if pending is not None:
+            commit(pending.get())
+        commit(following.get())
+    finally:
+        pool.terminate()
+        pool.join()
+
+
 class AstypeContext(object):
 
     """
@@ -152,6 +343,282 @@ class AstypeContext(object):
         self._dset._local.astype = None
 
 
+class DatasetAppender(object):
+
+    """
+        Adds rows to the end of a dataset's first axis.  Rows are collected
+        in a buffer which is written, a whole number of chunks at a time,
+        with one call into HDF5.  Returned by Dataset.appender().
+
+        The first axis is grown geometrically, in whole chunks, and trimmed
+        to the rows actually appended by close().  Until then it may hold
+        unwritten rows (filled with the fill value) past the last one
+        flushed.
+    """
+
+    def __init__(self, dset, buffer_rows):
+        self._dset = dset
+        shape = dset.shape
+        self._rowshape = shape[1:]
+        self._chunk = dset.chunks[0]
+        self._maxlen = dset.maxshape[0]
+        self._mtype = h5t.py_create(dset.dtype)
+        self._buf = numpy.empty((buffer_rows,)+self._rowshape, dtype=dset.dtype)
+        self._nbuf = 0
+        self._length = shape[0]     # Rows written to the file
+        self._extent = shape[0]     # Current length of the first axis
+        self._fill = buffer_rows - self._length % self._chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        """ Number of rows in the dataset, including those buffered """
+        return self._length + self._nbuf
+
+    def append(self, row):
+        """ Add a single row """
+        self._check(1)
+        if self._nbuf == self._fill:
+            self.flush()
+        self._buf[self._nbuf] = row
+        self._nbuf += 1
+
+    def extend(self, rows):
+        """ Add the rows of an array of shape (N,) + row shape """
+        self._check(0)
+        rows = numpy.asarray(rows, dtype=self._buf.dtype)
+        if rows.shape[1:] != self._buf.shape[1:]:
+            raise TypeError("Can't append array of shape %s to rows of shape %s"
+                            % (rows.shape, self._rowshape))
+        self._check(len(rows))
+
+        pos = 0
+        while pos < len(rows):
+            if self._nbuf == self._fill:
+                self.flush()
+
+            # Whole buffers' worth of rows are written without copying
+            nrows = len(rows) - pos
+            if self._nbuf == 0 and nrows >= self._fill:
+                nrows = self._fill + (nrows-self._fill)//len(self._buf)*len(self._buf)
+                self._write(numpy.ascontiguousarray(rows[pos:pos+nrows]))
+                pos += nrows
+                continue
+
+            nrows = min(nrows, self._fill - self._nbuf)
+            self._buf[self._nbuf:self._nbuf+nrows] = rows[pos:pos+nrows]
+            self._nbuf += nrows
+            pos += nrows
+
+    def flush(self):
+        """ Write the buffered rows to the dataset """
+        if self._nbuf:
+            self._write(self._buf[:self._nbuf])
+            self._nbuf = 0
+
+    def close(self):
+        """ Write the buffered rows and trim the first axis to the rows
+        appended.  Further appends raise ValueError.
+        """
+        if self._buf is None:
+            return
+        self.flush()
+        if self._extent != self._length:
+            self._dset.resize(self._length, axis=0)
+            self._extent = self._length
+        self._buf = None
+
+    def _check(self, nrows):
+        """ Make sure "nrows" more rows can be appended """
+        if self._buf is None:
+            raise ValueError("Appender is closed")
+        if self._maxlen is not None and len(self) + nrows > self._maxlen:
+            raise ValueError("Can't append beyond the maximum shape (%s rows)"
+                             % self._maxlen)
+
+    def _write(self, data):
+        """ Write rows following the last ones written, growing the
+        dataset if needed """
+        dset = self._dset
+        start = self._length
+        stop = start + len(data)
+        with file_io(dset.id):
+            if stop > self._extent:
+                extent = max(stop, 2*self._extent)
+                extent = -(-extent//self._chunk)*self._chunk
+                if self._maxlen is not None:
+                    extent = min(extent, self._maxlen)
+                dset.resize(extent, axis=0)
+                self._extent = extent
+
+            count = (len(data),) + self._rowshape
+            fspace = dset.id.get_space()
+            fspace.select_hyperslab((start,) + (0,)*len(self._rowshape), count)
+            mspace = dset._memory_space(count)  # pylint: disable=protected-access
+            dset.id.write(mspace, fspace, data, self._mtype)
+
+        self._length = stop
+        self._fill = len(self._buf) - stop % self._chunk
+
+
+class DatasetWriter(object):
+
+    """
+        Writes to a dataset in a background thread.  Assignments like
+        writer[sel] = data copy the data into a bounded queue and return
+        at once, unless the queue is full.  Queued writes are done in
+        order, and writes of adjacent blocks along the first axis are
+        merged into one.  Returned by Dataset.async_writer().
+
+        An error from a queued write is raised by the next assignment,
+        flush() or close(); writes queued after the failed one are
+        discarded until then.  A writer which is garbage collected without
+        being closed finishes its queued writes and stops its thread, but
+        any error from them is lost.
+    """
+
+    def __init__(self, dset, max_pending):
+        self._queue = queue.Queue(max_pending)
+        self._errors = []   # exc_info of the failed write, if any
+        self._closed = False
+        # The thread mustn't refer to the writer, or it would never be
+        # collected if not closed
+        self._thread = threading.Thread(target=self._run,
+                                        args=(dset, self._queue, self._errors))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't replace the error propagating from the with block
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def __del__(self):
+        if not getattr(self, '_closed', True):
+            self._closed = True
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # Blocking here could deadlock if the collecting thread
+                # holds phil, which the I/O thread needs to drain the queue
+                t = threading.Thread(target=self._queue.put, args=(None,))
+                t.daemon = True
+                t.start()
+
+    def __setitem__(self, args, val):
+        """ Queue a write of "val" to the selection "args", as
+        dset[args] = val would do """
+        if self._closed:
+            raise ValueError("Writer is closed")
+        self._raise_deferred()
+        if isinstance(val, numpy.ndarray):
+            val = val.copy()
+        else:
+            val = copy.deepcopy(val)
+        self._queue.put((args, val))
+
+    def flush(self):
+        """ Wait until every queued write is done """
+        self._queue.join()
+        self._raise_deferred()
+
+    def close(self):
+        """ Wait until every queued write is done, and stop the thread """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_deferred()
+
+    def _raise_deferred(self):
+        """ Raise the error from a queued write, if there is one """
+        if self._errors:
+            six.reraise(*self._errors.pop())
+
+    @classmethod
+    def _run(cls, dset, q, errors):
+        """ Body of the I/O thread """
+        running = True
+        while running:
+            batch = [q.get()]
+            while batch[-1] is not None:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            try:
+                if not errors:
+                    with file_io(dset.id):
+                        for args, val in cls._merge(dset.shape, batch):
+                            dset[args] = val
+            except Exception:
+                errors.append(sys.exc_info())
+            finally:
+                for _ in xrange(len(batch) + (not running)):
+                    q.task_done()
+
+    @classmethod
+    def _merge(cls, shape, batch):
+        """ Yield (args, val) pairs writing the same data as "batch" to a
+        dataset of the given shape, combining runs of writes to blocks
+        which follow each other along the first axis """
+        pending = None  # (start, stop, data) of the current run
+        for args, val in batch:
+            block = None
+            if isinstance(val, numpy.ndarray) and len(shape) > 0 and \
+              not any(isinstance(x, six.string_types)
+                      for x in (args if isinstance(args, tuple) else (args,))):
+                try:
+                    start, stop = box_bounds(shape, args)
+                    if val.shape == box_shape(shape, args):
+                        block = (start, stop, val.reshape(tuple(y-x for x, y in zip(start, stop))))
+                except (ValueError, TypeError):
+                    pass
+
+            if pending is not None and block is not None and \
+              pending[1][0] == block[0][0] and \
+              pending[0][1:] == block[0][1:] and pending[1][1:] == block[1][1:] and \
+              pending[2][-1].dtype == block[2].dtype:
+                pending[1] = (block[1][0],) + pending[1][1:]
+                pending[2].append(block[2])
+                continue
+
+            if pending is not None:
+                yield cls._run_args(pending)
+                pending = None
+            if block is not None:
+                pending = [block[0], block[1], [block[2]]]
+            else:
+                yield args, val
+
+        if pending is not None:
+            yield cls._run_args(pending)
+
+    @staticmethod
+    def _run_args(run):
+        """ Arguments writing a run of blocks built by _merge """
+        start, stop, blocks = run
+        args = tuple(slice(x, y) for x, y in zip(start, stop))
+        if len(blocks) == 1:
+            return args, blocks[0]
+        return args, numpy.concatenate(blocks)
+
+
 class Dataset(HLObject):
 
     """
@@ -284,6 +751,10 @@ class Dataset(HLObject):
         self._filters = filters.get_filters(self._dcpl)
         self._local = local()
         self._local.astype = None
+        self._use_memmap = False
+        self._skip_unallocated = False
+        self._local.skipped = None
+        self._plans = {}
 
     def resize(self, size, axis=None):
         """ Resize the dataset, or the specified axis.
@@ -299,7 +770,10 @@ class Dataset(HLObject):
         grown or shrunk independently.  The coordinates of existing data are
         fixed.
         """
-        with phil:
+        # Resizing is serialized with I/O on the file, so that the
+        # resize-then-write sequences in DatasetAppender and DatasetWriter
+        # stay atomic with per-file locking enabled
+        with file_io(self.id):
             if self.chunks is None:
                 raise TypeError("Only chunked datasets can be resized")
 
@@ -317,6 +791,42 @@ class Dataset(HLObject):
             self.id.set_extent(size)
             #h5f.flush(self.id)  # THG recommends
 
+    def appender(self, buffer_rows=None):
+        """ Return a DatasetAppender, which adds rows to the end of the
+        first axis, e.g.:
+
+        >>> with dataset.appender() as app:
+        ...     for event in events:
+        ...         app.append(event)
+
+        Rows are buffered and written "buffer_rows" at a time, rounded up
+        to whole chunks along the first axis.  The default is about
+        ITER_BLOCK_BYTES worth of rows.  The dataset must be chunked.
+        """
+        with phil:
+            if self.chunks is None:
+                raise TypeError("Only chunked datasets can be appended to")
+            chunk = self.chunks[0]
+            if buffer_rows is None:
+                rowsize = self.dtype.itemsize*numpy.prod(self.shape[1:])
+                buffer_rows = ITER_BLOCK_BYTES//max(rowsize, 1)
+            buffer_rows = max(-(-int(buffer_rows)//chunk), 1)*chunk
+            return DatasetAppender(self, buffer_rows)
+
+    def async_writer(self, max_pending=64):
+        """ Return a DatasetWriter, which performs writes in a background
+        thread so they don't block the caller, e.g.:
+
+        >>> with dataset.async_writer() as writer:
+        ...     for i, frame in enumerate(frames):
+        ...         writer[i] = frame
+
+        At most "max_pending" writes are queued; further assignments wait
+        for the queue to drain.  Call flush() to wait for queued writes,
+        and close the writer before the file.
+        """
+        return DatasetWriter(self, max_pending)
+
     @with_phil
     def __len__(self):
         """ The size of the first axis.  TypeError if scalar.
@@ -340,18 +850,160 @@ class Dataset(HLObject):
                 raise TypeError("Attempt to take len() of scalar dataset")
             return shape[0]
 
-    @with_phil
     def __iter__(self):
         """ Iterate over the first axis.  TypeError if scalar.
 
+        Rows are read in blocks; see iter_rows.
+
         BEWARE: Modifications to the yielded data are *NOT* written to file.
         """
+        return self.iter_rows()
+
+    def iter_rows(self, block_rows=None, prefetch=False):
+        """ Iterate over the first axis, reading "block_rows" rows at a time.
+
+        Each block is read with a single call into HDF5, and the rows are
+        yielded as views of it.  By default a block is one chunk along the
+        first axis, or about ITER_BLOCK_BYTES worth of rows if the dataset
+        isn't chunked.  If "prefetch" is True, the next block is read in a
+        background thread while the current one is being consumed.
+
+        TypeError if scalar.
+
+        BEWARE: Modifications to the yielded data are *NOT* written to file.
+        """
+        with phil:
+            shape = self.shape
+            if len(shape) == 0:
+                raise TypeError("Can't iterate over a scalar dataset")
+
+            if block_rows is None:
+                chunks = self.chunks
+                if chunks is not None:
+                    block_rows = chunks[0]
+                else:
+                    rowsize = self.dtype.itemsize*numpy.prod(shape[1:])
+                    block_rows = ITER_BLOCK_BYTES//max(rowsize, 1)
+            block_rows = max(int(block_rows), 1)
+
+        blocks = ((start, min(start+block_rows, shape[0]))
+                  for start in xrange(0, shape[0], block_rows))
+        if prefetch:
+            buffers = _read_ahead(self, blocks)
+        else:
+            buffers = (self[start:stop] for start, stop in blocks)
+
+        return (row for buf in buffers for row in buf)
+
+    def iter_chunks(self, sel=None):
+        """ Return an iterator over the chunks of this dataset.
+
+        Each item is a tuple of slices selecting the part of one chunk which
+        lies inside "sel" (by default, the whole dataset), in C order.  The
+        selection must be the output of numpy.s_[<args>], containing only
+        unit-step slices and integers.
+
+        Raises TypeError if the dataset is not chunked.
+        """
+        with phil:
+            chunks = self.chunks
+            if chunks is None:
+                raise TypeError("Chunked dataset required")
+            start, stop = box_bounds(self.shape, sel)
+            return iter_chunk_slices(start, stop, chunks)
+
+    if hasattr(h5d.DatasetID, "get_chunk_info"):
+        def iter_chunk_info(self, sel=None):
+            """ Return an iterator over the allocated chunks of this dataset.
+
+            Each item is a namedtuple h5d.StoreInfo with fields chunk_offset
+            (the logical position of the chunk's first element),
+            filter_mask, byte_offset (the position in the file) and size
+            (the stored size in bytes).  If "sel" is given, only chunks
+            intersecting it are included; as for iter_chunks, it may contain
+            only unit-step slices and integers.
+
+            Chunks are visited in the order of the chunk index, except that
+            with HDF5 older than 1.12.3 they may instead be looked up by
+            position, in C order; see _allocated_chunks for the cost.
+
+            Raises TypeError if the dataset is not chunked.  This only exists
+            when the HDF5 library version >= 1.10.5
+            """
+            with phil:
+                if self.chunks is None:
+                    raise TypeError("Chunked dataset required")
+                start, stop = box_bounds(self.shape, sel)
+                return iter(self._allocated_chunks(start, stop))
+
+        def chunk_info(self, sel=None):
+            """ Return a list describing the allocated chunks of this
+            dataset; see iter_chunk_info.
+            """
+            return list(self.iter_chunk_info(sel))
+
+    @with_phil
+    def read_masked(self, mask):
+        """ Read the elements selected by a boolean mask with the shape of
+        the dataset, returning a 1-D array in C order as self[mask] would.
+
+        Rather than selecting every point individually, this reads each
+        chunk (or, for contiguous datasets, each block of rows of about
+        ITER_BLOCK_BYTES) which has something selected, and picks out the
+        masked values with NumPy.  Chunks with nothing selected are not
+        read at all.  If fewer than MASK_POINTS_FRACTION of the elements
+        are selected, reading them as points is cheaper, and self[mask]
+        is used instead.
+        """
+        mask = numpy.asarray(mask)
         shape = self.shape
-        if len(shape) == 0:
-            raise TypeError("Can't iterate over a scalar dataset")
-        for i in xrange(shape[0]):
-            yield self[i]
+        if mask.dtype.kind != 'b' or mask.shape != shape:
+            raise TypeError("Mask must be a boolean array of shape %s" % (shape,))
+
+        npoints = numpy.count_nonzero(mask)
+        if npoints == 0:
+            return numpy.ndarray((0,), dtype=self._read_types(())[0])
+        if len(shape) == 0 or npoints < mask.size*MASK_POINTS_FRACTION:
+            return self[mask]
+
+        chunks = self.chunks
+        if chunks is None:
+            rowsize = self.dtype.itemsize*int(numpy.prod(shape[1:]))
+            chunks = (max(ITER_BLOCK_BYTES//max(rowsize, 1), 1),) + shape[1:]
+
+        # Chunks come in C order, so those in one slab of chunk rows are
+        # visited together; the rank in the output of each selected point
+        # is computed for a slab at a time.
+        out = None
+        pos = 0
+        slab = None
+        for slices in iter_chunk_slices((0,)*len(shape), shape, chunks):
+            if slices[0] != slab:
+                slab = slices[0]
+                ranks = numpy.cumsum(mask[slab], dtype='i8').reshape(mask[slab].shape)
+                ranks += pos - 1
+                pos = int(ranks.flat[-1]) + 1
+            chunk_mask = mask[slices]
+            if not chunk_mask.any():
+                continue
+            values = self[slices][chunk_mask]
+            if out is None:
+                out = numpy.empty((npoints,) + values.shape[1:], dtype=values.dtype)
+            out[ranks[(slice(None),) + slices[1:]][chunk_mask]] = values
+        return out
+
+    def iter_blocks(self, sel=None):
+        """ Return an iterator over (slices, ndarray) pairs, one per chunk.
+
+        The slices are those yielded by iter_chunks(sel), and the array
+        holds the data they select.  Each chunk is read and decompressed
+        exactly once, which makes this the fastest way to scan through a
+        chunked dataset.
 
+        BEWARE: Modifications to the yielded data are *NOT* written to file.
+        """
+        chunk_slices = self.iter_chunks(sel)
+        return ((slices, self[slices]) for slices in chunk_slices)
 
     @with_phil
     def __getitem__(self, args):
@@ -373,14 +1025,7 @@ class Dataset(HLObject):
         if not six.PY3:
             names = tuple(x.encode('utf-8') if isinstance(x, six.text_type) else x for x in names)
 
-        new_dtype = getattr(self._local, 'astype', None)
-        if new_dtype is not None:
-            new_dtype = readtime_dtype(new_dtype, names)
-        else:
-            # This is necessary because in the case of array types, NumPy
-            # discards the array information at the top level.
-            new_dtype = readtime_dtype(self.id.dtype, names)
-        mtype = h5t.py_create(new_dtype)
+        new_dtype, mtype = self._read_types(names)
 
         # === Special-case region references ====
 
@@ -426,15 +1071,24 @@ class Dataset(HLObject):
         # === Everything else ===================
 
         # Perform the dataspace selection.
-        selection = sel.select(self.shape, args, dsid=self.id)
+        selection = self._select(args)
 
         if selection.nselect == 0:
             return numpy.ndarray(selection.mshape, dtype=new_dtype)
 
+        # Indices out of order or repeated are read in increasing order,
+        # then rearranged
+        reordered = isinstance(selection, sel.FancySelection) and selection.reordered
+
         # Up-converting to (1,) so that numpy.ndarray correctly creates
         # np.void rows in case of multi-field dtype. (issue 135)
         single_element = selection.mshape == ()
-        mshape = (1,) if single_element else selection.mshape
+        if single_element:
+            mshape = (1,)
+        elif reordered:
+            mshape = selection.sorted_mshape
+        else:
+            mshape = selection.mshape
         arr = numpy.ndarray(mshape, new_dtype, order='C')
 
         # HDF5 has a bug where if the memory shape has a different rank
@@ -444,9 +1098,15 @@ class Dataset(HLObject):
             mshape = (1,)*(len(self.shape)-len(mshape)) + mshape
 
         # Perfom the actual read
-        mspace = h5s.create_simple(mshape)
-        fspace = selection.id
-        self.id.read(mspace, fspace, arr, mtype)
+        self._local.skipped = None
+        if not (self._skip_unallocated and len(names) == 0 and
+                self._read_allocated(args, arr, mtype)) and \
+           not self._read_covering(selection, arr, mtype):
+            mspace = self._memory_space(mshape)
+            fspace = selection.id
+            self.id.read(mspace, fspace, arr, mtype)
+        if reordered:
+            arr = selection.permute(arr)
 
         # Patch up the output for NumPy
         if len(names) == 1:
@@ -458,6 +1118,96 @@ class Dataset(HLObject):
         return arr
 
 
+    def _read_types(self, names):
+        """ Return the NumPy dtype and HDF5 memory type for reading the
+        given fields (or the whole type if "names" is empty), respecting
+        astype().  Cached per dataset, as building them costs more than
+        reading a few elements.
+        """
+        astype = getattr(self._local, 'astype', None)
+        key = ('types', astype, names)
+        plan = self._plans.get(key)
+        if plan is None:
+            if astype is not None:
+                new_dtype = readtime_dtype(astype, names)
+            else:
+                # This is necessary because in the case of array types, NumPy
+                # discards the array information at the top level.
+                new_dtype = readtime_dtype(self.id.dtype, names)
+            plan = (new_dtype, h5t.py_create(new_dtype))
+            self._cache_plan(key, plan)
+        return plan
+
+    def _memory_space(self, mshape):
+        """ Return a dataspace of shape "mshape" with everything selected.
+        Cached per dataset and thread, as the phil lock may be released
+        while HDF5 uses it; callers must not change the selection.
+        """
+        spaces = getattr(self._local, 'spaces', None)
+        if spaces is None:
+            spaces = self._local.spaces = {}
+        mspace = spaces.get(mshape)
+        if mspace is None:
+            if len(spaces) >= PLAN_CACHE_SIZE:
+                spaces.clear()
+            mspace = spaces[mshape] = h5s.create_simple(mshape)
+        return mspace
+
+    def _cache_plan(self, key, plan):
+        """ Store an entry in the plan cache, bounding its size """
+        if len(self._plans) >= PLAN_CACHE_SIZE:
+            self._plans.clear()
+        self._plans[key] = plan
+
+    def _read_covering(self, selection, arr, mtype):
+        """ Read an index list selection made of many hyperslabs into "arr"
+        (of shape selection.sorted_mshape) by reading the box enclosing the
+        index lists, and picking the points out of it with numpy.take.
+
+        HDF5 handles selections of many small hyperslabs slowly, so this is
+        quicker unless the box is much bigger than the selection.  Returns
+        False, having read nothing, if the selection has no more than
+        FANCY_SLABS hyperslabs or is less than FANCY_BOX_FRACTION of the
+        box.
+        """
+        if not isinstance(selection, sel.FancySelection) or \
+          selection.nslabs <= FANCY_SLABS:
+            return False
+        args, take = selection.covering_box()
+        box = sel.SimpleSelection(self.shape)[args]
+        if selection.nselect < box.nselect*FANCY_BOX_FRACTION:
+            return False
+
+        data = numpy.ndarray(box.mshape, dtype=arr.dtype)
+        mshape = (1,)*(len(self.shape)-len(box.mshape)) + box.mshape
+        self.id.read(self._memory_space(mshape), box.id, data, mtype)
+        for axis, indices in take:
+            data = data.take(indices, axis=axis)
+        arr[...] = data
+        return True
+
+    def _select(self, args):
+        """ Return a selection for "args", as selections.select() would.
+
+        For plain integer and slice arguments, the SimpleSelection from the
+        previous call in this thread is re-pointed at the new hyperslab
+        rather than making a new file dataspace.  The result is only valid
+        until the next call from the same thread.  It is kept per thread
+        because the phil lock is released while HDF5 reads or writes
+        (see _objects.file_io), so another thread may select while a
+        read is still using the dataspace.
+        """
+        shape = self.shape
+        if all(isinstance(x, (slice, six.integer_types, numpy.integer)) or x is Ellipsis
+               for x in args):
+            selection = getattr(self._local, 'selection', None)
+            if selection is None or selection.shape != shape:
+                selection = sel.SimpleSelection(shape)
+                self._local.selection = selection
+            selection[args]
+            return selection
+        return sel.select(shape, args, dsid=self.id)
+
     @with_phil
     def __setitem__(self, args, val):
         """ Write to the HDF5 dataset from a Numpy array.
@@ -514,7 +1264,7 @@ class Dataset(HLObject):
                 val = val.view(numpy.dtype([(names[0], dtype)]))
                 val = val.reshape(val.shape[:len(val.shape) - len(dtype.shape)])
         else:
-            val = numpy.asarray(val, order='C')
+            val = numpy.asarray(val)
 
         # Check for array dtype compatibility and convert
         if self.dtype.subdtype is not None:
@@ -573,6 +1323,27 @@ class Dataset(HLObject):
             val = val2
             mshape = val.shape
 
+        # Indices out of order or repeated are written in increasing order,
+        # the last value given for an index winning
+        if isinstance(selection, sel.FancySelection) and selection.reordered:
+            if mshape != selection.mshape:
+                raise TypeError("Broadcasting is not supported for complex selections")
+            val = numpy.ascontiguousarray(selection.unpermute(val))
+            mshape = selection.sorted_mshape
+
+        # Small arrays broadcast over many tiles are written from a buffer
+        # holding many copies of them, a few large bands at a time
+        if isinstance(selection, sel.SimpleSelection) and len(self.shape) > 0:
+            if self._write_tiled(selection, val, mshape, mtype):
+                return
+
+        # Strided views are written without copying them whole
+        if not val.flags.c_contiguous:
+            if mshape == selection.mshape and self.dtype.subdtype is None and \
+              self._write_strided(selection, val, mtype):
+                return
+            val = numpy.ascontiguousarray(val)
+
         # Perform the write, with broadcasting
         # Be careful to pad memory shape with ones to avoid HDF5 chunking
         # glitch, which kicks in for mismatched memory/file selections
@@ -584,6 +1355,76 @@ class Dataset(HLObject):
         for fspace in selection.broadcast(mshape):
             self.id.write(mspace, fspace, val, mtype)
 
+    def _write_tiled(self, selection, val, mshape, mtype):
+        """ Write "val" broadcast over a simple selection, from a buffer
+        of up to BROADCAST_BUFFER_BYTES filled with copies of it.
+
+        Returns False without writing anything if "val" covers the
+        selection in a single tile, or is too large for the buffer; in
+        those cases writing it tile by tile is already efficient.
+        """
+        count = selection.count
+        tshape = selection.broadcast_shape(mshape)
+        if tshape == count:
+            return False
+
+        subshape = val.shape[len(mshape):]  # Array dtypes
+        pointsize = val.dtype.itemsize*int(numpy.prod(subshape))
+        max_points = BROADCAST_BUFFER_BYTES//max(pointsize, 1)
+        if numpy.prod(tshape) > max_points//2:
+            return False
+
+        val = val.reshape(tshape + subshape)
+
+        buf = None
+        for fspace, index in selection.bands(max_points):
+            axis = len(index)-1
+            vindex = tuple(x if t != 1 else slice(0, 1) for x, t in zip(index, tshape))
+            if buf is None:
+                bshape = tuple(x.stop-x.start for x in index) + count[axis+1:]
+                buf = numpy.empty(bshape + subshape, dtype=val.dtype)
+                buf[...] = val[vindex]
+                # If val is broadcast along the axes the bands are cut from,
+                # every band holds the same data
+                constant = all(t == 1 for t in tshape[:axis+1])
+            data = buf[(slice(None),)*axis + (slice(0, index[axis].stop-index[axis].start),)]
+            if not constant:
+                data[...] = val[vindex]
+            mspace = self._memory_space(data.shape[:len(count)])
+            self.id.write(mspace, fspace, data, mtype)
+        return True
+
+    def _write_strided(self, selection, val, mtype):
+        """ Write the non-contiguous array "val" to a selection of the
+        same shape, without making a contiguous copy of all of it.
+
+        This mirrors _read_into: arrays whose rows are contiguous are
+        written in place through a hyperslab memory dataspace, and other
+        layouts a band of ITER_BLOCK_BYTES at a time through a small
+        buffer.  Returns False, writing nothing, if neither applies.
+        """
+        layout = sel.strided_hyperslab(val.shape, val.strides, val.itemsize)
+        if layout is not None and (val.ndim == 0 or layout[1][-1] == 1):
+            mspace, base = self._strided_memory(val, layout)
+            self.id.write(mspace, selection.id, base, mtype)
+            return True
+
+        if not isinstance(selection, sel.SimpleSelection) or len(self.shape) == 0:
+            return False
+
+        source = val.view()
+        source.shape = selection.count
+        buf = None
+        for fspace, index in selection.bands(max(ITER_BLOCK_BYTES//val.itemsize, 1)):
+            axis = len(index)-1
+            if buf is None:
+                bshape = tuple(x.stop-x.start for x in index) + selection.count[axis+1:]
+                buf = numpy.empty(bshape, dtype=val.dtype)
+            data = buf[(slice(None),)*axis + (slice(0, index[axis].stop-index[axis].start),)]
+            data[...] = source[index]
+            self.id.write(self._memory_space(data.shape), fspace, data, mtype)
+        return True
+
     def read_direct(self, dest, source_sel=None, dest_sel=None):
         """ Read data directly from HDF5 into an existing NumPy array.
 
@@ -604,6 +1445,7 @@ class Dataset(HLObject):
             else:
                 dest_sel = sel.select(dest.shape, dest_sel, self.id)
 
+            _check_not_reordered(source_sel, dest_sel)
             for mspace in dest_sel.broadcast(source_sel.mshape):
                 self.id.read(mspace, fspace, dest)
 
@@ -627,15 +1469,425 @@ class Dataset(HLObject):
             else:
                 dest_sel = sel.select(self.shape, dest_sel, self.id)
 
+            _check_not_reordered(source_sel, dest_sel)
             for fspace in dest_sel.broadcast(source_sel.mshape):
                 self.id.write(mspace, fspace, source)
 
+    def write(self, sel, data, workers=None):
+        """ Write data to a selection of the dataset, as self[sel] = data
+        would.
+
+        If "workers" is greater than 1, the dataset is chunked, and every
+        filter applied to it is one h5py can run itself (gzip, LZF, shuffle
+        and fletcher32), the data is split into chunks which are compressed
+        by a pool of that many threads, and then written directly to the
+        file.  This requires the selection to be the output of
+        numpy.s_[<args>] containing only unit-step slices and integers,
+        aligned with the chunk grid, and "data" to have exactly the shape
+        of the selection.  Otherwise this method falls back to an ordinary
+        write.
+        """
+        if sel is None:
+            sel = ()
+
+        if workers is not None and workers > 1:
+            with phil:
+                encodable = self._can_filter_chunks('write_direct_chunk')
+                if encodable:
+                    try:
+                        start, stop = box_bounds(self.shape, sel)
+                        mshape = box_shape(self.shape, sel)
+                    except (ValueError, TypeError):
+                        encodable = False
+                if encodable:
+                    encodable = all(x % c == 0 and (y % c == 0 or y == n)
+                        for x, y, c, n in zip(start, stop, self.chunks, self.shape))
+                if encodable:
+                    data = numpy.asarray(data, order='C', dtype=self.dtype)
+                    encodable = data.shape == mshape
+
+            if encodable:
+                data = data.reshape(tuple(y-x for x, y in zip(start, stop)))
+                _encode_write(self, start, stop, data, int(workers))
+                return
+
+        self[sel] = data
+
+    def _is_raw_dtype(self):
+        """ Determine if the raw bytes of this dataset in the file can be
+        interpreted directly using self.dtype.
+        """
+        dtype = self.dtype
+        return dtype.kind != 'O' and dtype.fields is None and \
+               dtype.itemsize == self.id.get_type().get_size()
+
+    def _can_filter_chunks(self, method):
+        """ Determine if h5py can run the filter pipeline of this dataset
+        itself, and the DatasetID method for direct chunk I/O exists.
+        """
+        return self.chunks is not None and hasattr(self.id, method) and \
+            self._is_raw_dtype() and \
+            all(code in filters.CODEC_FILTERS
+                for code, _ in filters.get_pipeline(self._dcpl))
+
+    def read(self, sel=None, workers=None, out=None):
+        """ Read a selection from the dataset, as self[sel] would.
+
+        If "workers" is greater than 1, the dataset is chunked, and every
+        filter applied to it is one h5py can undo itself (gzip, LZF,
+        shuffle and fletcher32), the raw chunks are fetched and then
+        decompressed by a pool of that many threads.  This requires the
+        selection to be the output of numpy.s_[<args>] containing only
+        unit-step slices and integers; for anything else this method falls
+        back to an ordinary read.
+
+        If "out" is given, the data is stored in that array and it is
+        returned.  It must be writable and have the shape of the selection,
+        and the data is converted to its dtype.  It need not be contiguous:
+        views with contiguous rows, like big[:, 3, :100], are filled in
+        place by HDF5, and others like big[:, 3, ::2] through a small
+        buffer rather than a full-size temporary array.
+        """
+        if sel is None:
+            sel = ()
+        if out is not None and not out.flags.writeable:
+            raise TypeError("Output array must be writable")
+
+        if workers is not None and workers > 1:
+            with phil:
+                decodable = self._can_filter_chunks('read_direct_chunk')
+                if decodable:
+                    try:
+                        start, stop = box_bounds(self.shape, sel)
+                        mshape = box_shape(self.shape, sel)
+                    except (ValueError, TypeError):
+                        decodable = False
+
+            if decodable:
+                if out is not None and out.shape != mshape:
+                    raise TypeError("Can't read selection of shape %s into array of shape %s"
+                                    % (mshape, out.shape))
+                dtype = getattr(self._local, 'astype', None) or self.dtype
+                result = numpy.empty(tuple(y-x for x, y in zip(start, stop)), dtype=dtype)
+                _decode_read(self, start, stop, result, int(workers))
+                result = result.reshape(mshape)
+                if out is None:
+                    return result
+                out[...] = result
+                return out
+
+        if out is not None:
+            return self._read_into(sel, out)
+        return self[sel]
+
+    def _read_into(self, args, out):
+        """ Read the selection "args" into the existing array "out".
+
+        If the array's strides describe a regular hyperslab of a C array
+        whose rows are contiguous, the memory dataspace selects that
+        hyperslab of a C-contiguous view starting at the array's first
+        element, and HDF5 fills it in place.  HDF5 scatters any other
+        layout one element at a time, which is slower than copying, so
+        simple selections are then read in bands of ITER_BLOCK_BYTES
+        into a small buffer and copied.  Anything else (field names,
+        reordered indices, scalar datasets) is read into a new array.
+        """
+        args = args if isinstance(args, tuple) else (args,)
+        with phil:
+            if self.shape == () or self.dtype.subdtype is not None or \
+              any(isinstance(x, six.string_types) for x in args):
+                out[...] = self[args]
+                return out
+
+            selection = sel.select(self.shape, args, dsid=self.id)
+            if selection.mshape != out.shape:
+                raise TypeError("Can't read selection of shape %s into array of shape %s"
+                                % (selection.mshape, out.shape))
+            if selection.nselect == 0:
+                return out
+            if isinstance(selection, sel.FancySelection) and selection.reordered:
+                out[...] = self[args]
+                return out
+
+            if out.dtype.kind == 'O':
+                mtype = self._read_types(())[1]  # vlen types need the dataset's
+            else:
+                mtype = h5t.py_create(out.dtype)
+
+            layout = sel.strided_hyperslab(out.shape, out.strides, out.itemsize)
+            if layout is not None and (out.ndim == 0 or layout[1][-1] == 1):
+                mspace, base = self._strided_memory(out, layout)
+                self.id.read(mspace, selection.id, base, mtype)
+
+            elif isinstance(selection, sel.SimpleSelection):
+                dest = out.view()
+                dest.shape = selection.count
+                buf = None
+                for fspace, index in selection.bands(max(ITER_BLOCK_BYTES//out.itemsize, 1)):
+                    axis = len(index)-1
+                    if buf is None:
+                        bshape = tuple(x.stop-x.start for x in index) + selection.count[axis+1:]
+                        buf = numpy.empty(bshape, dtype=out.dtype)
+                    data = buf[(slice(None),)*axis + (slice(0, index[axis].stop-index[axis].start),)]
+                    self.id.read(self._memory_space(data.shape), fspace, data, mtype)
+                    dest[index] = data
+
+            else:
+                out[...] = self[args]
+        return out
+
+    def _strided_memory(self, arr, layout):
+        """ Return a memory dataspace and a C-contiguous array for reading
+        or writing "arr" in place, given its strided_hyperslab() layout.
+
+        The array starts at arr's first element and encloses it; the
+        dataspace selects arr's elements within it.
+        """
+        vshape, step = layout
+
+        # Pad with ones, as for __getitem__
+        pad = (1,)*(len(self.shape)-len(vshape))
+        mspace = h5s.create_simple(pad + vshape)
+        mspace.select_hyperslab((0,)*len(mspace.shape), pad + arr.shape, pad + step)
+
+        strides = []
+        nbytes = arr.itemsize
+        for x in reversed(vshape):
+            strides.insert(0, nbytes)
+            nbytes *= x
+        base = numpy.lib.stride_tricks.as_strided(arr, vshape, tuple(strides))
+        return mspace, base
+
+    def read_many(self, sels):
+        """ Read a list of selections with a single call into HDF5,
+        returning a list of arrays as [self[x] for x in sels] would.
+
+        Each selection must be the output of numpy.s_[<args>] containing
+        only slices and integers, and they must not overlap.  The union of
+        the selections is read into one buffer, and the arrays returned are
+        views of it.  If these conditions aren't met, each selection is
+        read separately.
+        """
+        with phil:
+            shape = self.shape
+            try:
+                if len(shape) == 0:
+                    raise TypeError("Can't combine selections of a scalar dataset")
+                slabs = [sel.hyperslab(shape, x) for x in sels]
+            except (ValueError, TypeError):
+                return [self[x] for x in sels]
+
+            # Position of each element of the union in the packed buffer,
+            # in the order HDF5 will transfer them (C order in the file)
+            indices = [sel.hyperslab_indices(shape, *slab[0:3]) for slab in slabs]
+            indices = numpy.concatenate(indices) if len(indices) else numpy.zeros((0,), 'i8')
+            order = numpy.argsort(indices, kind='mergesort')
+            if numpy.any(numpy.diff(indices[order]) == 0):
+                return [self[x] for x in sels]
+
+            new_dtype, mtype = self._read_types(())
+            out = numpy.empty((len(indices),), dtype=new_dtype)
+
+            if len(indices) > 0:
+                fspace = h5s.create_simple(shape)
+                fspace.select_none()
+                for start, count, step, mshape in slabs:
+                    if 0 not in count:
+                        fspace.select_hyperslab(start, count, step, op=h5s.SELECT_OR)
+
+                mspace = h5s.create_simple(out.shape[0:1])
+                if numpy.any(order != numpy.arange(len(order))):
+                    # Out of file order: scatter to the right places
+                    mspace.select_elements(order.reshape((-1, 1)).astype('u8'))
+                self.id.read(mspace, fspace, out, mtype)
+
+        arrays = []
+        offset = 0
+        for start, count, step, mshape in slabs:
+            size = int(numpy.prod(count))
+            if mshape == ():
+                arrays.append(out[offset])
+            else:
+                arrays.append(out[offset:offset+size].reshape(mshape + out.shape[1:]))
+            offset += size
+        return arrays
+
+    def as_memmap(self):
+        """ Return a read-only numpy.memmap over the raw data in the file.
+
+        Only works for datasets with contiguous storage which has been
+        allocated, using a fixed-size type whose file layout NumPy can
+        describe, in a file opened with the sec2 or stdio driver.  Raises
+        TypeError otherwise.
+
+        The map bypasses HDF5 entirely; subsequent writes through HDF5 may
+        not be visible until the file is flushed.
+        """
+        with phil:
+            if self._dcpl.get_layout() != h5d.CONTIGUOUS:
+                raise TypeError("Only contiguous datasets can be memory-mapped")
+
+            f = self.file
+            if f.driver not in _MEMMAP_DRIVERS:
+                raise TypeError('Datasets in files using the "%s" driver can\'t be memory-mapped' % f.driver)
+
+            dtype = self.dtype
+            if not self._is_raw_dtype():
+                raise TypeError("Type %s can't be memory-mapped" % dtype)
+
+            offset = self.id.get_offset()
+            if offset is None:
+                raise TypeError("No storage has been allocated for this dataset")
+
+            if f.mode == 'r+':
+                f.flush()
+
+            return numpy.memmap(f.filename, dtype=dtype, mode='r',
+                                offset=offset, shape=self.shape)
+
+    @property
+    def use_memmap(self):
+        """ If True, numpy.asarray(dset) and friends return a memory map of
+        the dataset when possible (see as_memmap), rather than reading it.
+        """
+        return self._use_memmap
+    @use_memmap.setter
+    def use_memmap(self, val):
+        # pylint: disable=missing-docstring
+        self._use_memmap = bool(val)
+
+    @property
+    def skip_unallocated(self):
+        """ If True, reads from a chunked dataset which is only partly
+        written fill the output from the fill value, and then read only
+        the chunks which have been allocated.  See skipped_fraction.
+        """
+        return self._skip_unallocated
+    @skip_unallocated.setter
+    def skip_unallocated(self, val):
+        # pylint: disable=missing-docstring
+        self._skip_unallocated = bool(val)
+
+    @property
+    def skipped_fraction(self):
+        """ Fraction of the elements in the last read by this thread which
+        came from unallocated chunks, and so were never read from the file.
+        None unless skip_unallocated was set and the read was a box
+        selection (slices and integers) from a chunked dataset.
+        """
+        return getattr(self._local, 'skipped', None)
+
+    def _allocated_chunks(self, start, stop):
+        """ Return a list of StoreInfo for the allocated chunks which
+        intersect the box from "start" to "stop".
+
+        With HDF5 1.12.3 or later this is a single pass over the chunk
+        index.  Older versions can only look chunks up one at a time,
+        either by position, or by number in the index; the latter searches
+        the index from the start every time, so listing n chunks that way
+        takes time proportional to n**2.  Whichever is cheaper is used.
+        """
+        chunks = self.chunks
+
+        def overlaps(offset):
+            """ Determine if the chunk at offset intersects the box """
+            return all(o < y and o+c > x for o, c, x, y in
+                       zip(offset, chunks, start, stop))
+
+        if hasattr(self.id, 'chunk_iter'):
+            infos = []
+            def visit(info):
+                """ Collect chunks intersecting the box """
+                if overlaps(info.chunk_offset):
+                    infos.append(info)
+            self.id.chunk_iter(visit)
+            return infos
+
+        nsel = int(numpy.prod([(y-1)//c - x//c + 1 for x, y, c in zip(start, stop, chunks)]))
+        if nsel <= 0 or self.id.get_space_status() == h5d.SPACE_STATUS_NOT_ALLOCATED:
+            return []
+        nalloc = self.id.get_num_chunks()
+        if nalloc*nalloc < nsel:
+            infos = (self.id.get_chunk_info(i) for i in xrange(nalloc))
+            return [info for info in infos if overlaps(info.chunk_offset)]
+
+        infos = []
+        for slices in iter_chunk_slices(start, stop, chunks):
+            offset = tuple(s.start - s.start % c for s, c in zip(slices, chunks))
+            info = self.id.get_chunk_info_by_coord(offset)
+            if info.byte_offset is not None:
+                infos.append(info)
+        return infos
+
+    def _read_allocated(self, args, arr, mtype):
+        """ Read a box selection into "arr", skipping unallocated chunks.
+
+        Returns False without reading anything if the selection or dataset
+        isn't suitable, or if more than ALLOCATED_READ_FRACTION of the
+        selection is allocated anyway, in which case the caller should do
+        a normal read.
+        """
+        chunks = self.chunks
+        if chunks is None or arr.dtype.hasobject or \
+          not hasattr(self.id, 'get_chunk_info_by_coord'):
+            return False
+        try:
+            start, stop = box_bounds(self.shape, args)
+        except (ValueError, TypeError):
+            return False
+
+        if self.id.get_space_status() == h5d.SPACE_STATUS_ALLOCATED:
+            self._local.skipped = 0.0
+            return False
+
+        shape = tuple(y-x for x, y in zip(start, stop))
+        total = int(numpy.prod(shape))
+        boxes = []
+        nread = 0
+        for info in self._allocated_chunks(start, stop):
+            box = [(max(x, o), min(y, o+c)) for x, y, o, c
+                   in zip(start, stop, info.chunk_offset, chunks)]
+            boxes.append(box)
+            nread += int(numpy.prod([b-a for a, b in box]))
+
+        self._local.skipped = 1 - nread/float(total) if total > 0 else 0.0
+        if nread > total*ALLOCATED_READ_FRACTION:
+            return False
+
+        arr[...] = self.fillvalue
+        if nread == 0:
+            return True
+
+        # Read the union of the allocated parts with one call into HDF5.
+        # Both selections are the same boxes, offset by the start of the
+        # selection, so HDF5 pairs up their elements in C order.
+        mspace = h5s.create_simple(shape)
+        mspace.select_none()
+        fspace = self.id.get_space()
+        fspace.select_none()
+        for box in boxes:
+            count = tuple(b-a for a, b in box)
+            mspace.select_hyperslab(tuple(a-x for (a, b), x in zip(box, start)),
+                                    count, op=h5s.SELECT_OR)
+            fspace.select_hyperslab(tuple(a for a, b in box), count, op=h5s.SELECT_OR)
+        self.id.read(mspace, fspace, arr, mtype)
+        return True
+
     @with_phil
     def __array__(self, dtype=None):
         """ Create a Numpy array containing the whole dataset.  DON'T THINK
         THIS MEANS DATASETS ARE INTERCHANGABLE WITH ARRAYS.  For one thing,
         you have to read the whole dataset everytime this method is called.
+
+        If use_memmap is set and the dataset supports it, a read-only
+        memory map is returned instead.
         """
+        if self._use_memmap and (dtype is None or numpy.dtype(dtype) == self.dtype):
+            try:
+                return self.as_memmap()
+            except TypeError:
+                pass
+
         arr = numpy.empty(self.shape, dtype=self.dtype if dtype is None else dtype)
 
         # Special case for (0,)*-shape datasets
@@ -684,3 +1936,48 @@ class Dataset(HLObject):
             self._id.flush()
             
 
+
+    def _check_chunk_offset(self, offsets):
+        """ Validate the logical offset of a chunk, returning it as a tuple.
+        """
+        if self.chunks is None:
+            raise TypeError("Chunked dataset required")
+        offsets = tuple(int(x) for x in offsets)
+        if len(offsets) != len(self.chunks):
+            raise ValueError("Offset rank (%d) must match dataset rank (%d)" % (len(offsets), len(self.chunks)))
+        for o, c in zip(offsets, self.chunks):
+            if o < 0 or o % c != 0:
+                raise ValueError("Offset %s is not aligned with chunk shape %s" % (offsets, self.chunks))
+        return offsets
+
+    if hasattr(h5d.DatasetID, "read_direct_chunk"):
+        @with_phil
+        def read_direct_chunk(self, offsets):
+            """ Read a raw chunk, bypassing the filter pipeline.
+
+            "offsets" is the logical position of the first element in the
+            chunk, and must be a multiple of the chunk shape.  Returns a tuple
+            (filter_mask, data), where data is a bytes object holding the
+            chunk exactly as stored, i.e. still compressed.  Bits set in
+            filter_mask indicate filters which were skipped for this chunk.
+
+            Raises KeyError if the chunk has not been written.
+
+            This only exists when the HDF5 library version >= 1.10.2
+            """
+            return self.id.read_direct_chunk(self._check_chunk_offset(offsets))
+
+    if hasattr(h5d.DatasetID, "write_direct_chunk"):
+        @with_phil
+        def write_direct_chunk(self, offsets, data, filter_mask=0):
+            """ Write a raw chunk, bypassing the filter pipeline.
+
+            "offsets" is the logical position of the first element in the
+            chunk, and must be a multiple of the chunk shape.  "data" is any
+            contiguous buffer (e.g. bytes) holding the chunk exactly as it
+            should be stored; it must already have been passed through the
+            dataset's filters, except those flagged in filter_mask.
+
+            This only exists when the HDF5 library version >= 1.8.11
+            """
+            self.id.write_direct_chunk(self._check_chunk_offset(offsets), data, filter_mask)
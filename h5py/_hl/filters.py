@@ -40,6 +40,8 @@
 
 from __future__ import absolute_import, division
 
+import zlib
+
 import numpy as np
 from .. import h5z, h5p, h5d
 
@@ -245,6 +247,116 @@ def get_filters(plist):
 
     return pipeline
 
+# Filters which encode_chunk and decode_chunk know how to handle
+CODEC_FILTERS = (h5z.FILTER_DEFLATE, h5z.FILTER_SHUFFLE,
+                 h5z.FILTER_FLETCHER32, h5z.FILTER_LZF)
+
+def get_pipeline(plist):
+    """ Extract the filter pipeline from a DCPL, as a list of
+    (filter_code, cd_values) tuples in the order applied when writing.
+    Bit N of a chunk's filter mask refers to entry N.
+
+    Undocumented and subject to change without warning.
+    """
+    pipeline = []
+    for i in range(plist.get_nfilters()):
+        code, _, vals, _ = plist.get_filter(i)
+        pipeline.append((code, vals))
+    return pipeline
+
+def fletcher32(data):
+    """ Compute the HDF5 Fletcher-32 checksum of a buffer.
+
+    Undocumented and subject to change without warning.
+    """
+    buf = np.frombuffer(data, dtype='u1')
+    if len(buf) % 2:
+        buf = np.concatenate((buf, np.zeros((1,), dtype='u1')))
+    words = buf.view('>u2').astype('u8')
+    if not words.any():
+        return 0
+    # The running sums are folded modulo 65535, but never to zero once the
+    # first non-zero word has been seen.
+    weights = np.arange(len(words), 0, -1, dtype='u8') % 65535
+    sum1 = int(words.sum())
+    sum2 = int((words*weights % 65535).sum())
+    return (((sum2-1) % 65535 + 1) << 16) | ((sum1-1) % 65535 + 1)
+
+def _unshuffle(data, elsize):
+    """ Undo the HDF5 byte-shuffle filter """
+    buf = np.frombuffer(data, dtype='u1')
+    nelem = len(buf) // elsize
+    if elsize <= 1 or nelem <= 1:
+        return data
+    out = np.empty_like(buf)
+    out[:nelem*elsize] = buf[:nelem*elsize].reshape((elsize, nelem)).T.ravel()
+    out[nelem*elsize:] = buf[nelem*elsize:]
+    return out
+
+def _shuffle(data, elsize):
+    """ Apply the HDF5 byte-shuffle filter """
+    buf = np.frombuffer(data, dtype='u1')
+    nelem = len(buf) // elsize
+    if elsize <= 1 or nelem <= 1:
+        return data
+    out = np.empty_like(buf)
+    out[:nelem*elsize] = buf[:nelem*elsize].reshape((nelem, elsize)).T.ravel()
+    out[nelem*elsize:] = buf[nelem*elsize:]
+    return out
+
+def encode_chunk(pipeline, data, itemsize):
+    """ Apply the filter pipeline to a buffer holding one chunk, for use
+    with write_direct_chunk.  Every filter is applied, so the chunk's
+    filter mask is 0.  Only filters listed in CODEC_FILTERS are supported.
+
+    Undocumented and subject to change without warning.
+    """
+    for code, vals in pipeline:
+        if code == h5z.FILTER_DEFLATE:
+            data = zlib.compress(data, vals[0] if len(vals) > 0 else DEFAULT_GZIP)
+        elif code == h5z.FILTER_LZF:
+            data = h5z.lzf_compress(data)
+        elif code == h5z.FILTER_SHUFFLE:
+            data = _shuffle(data, vals[0] if len(vals) > 0 else itemsize)
+        elif code == h5z.FILTER_FLETCHER32:
+            checksum = np.array([fletcher32(data)], dtype='<u4')
+            data = np.concatenate((np.frombuffer(data, dtype='u1'),
+                                   checksum.view('u1')))
+        else:
+            raise TypeError("Filter %d can't be encoded" % code)
+    return data
+
+def decode_chunk(pipeline, filter_mask, data, itemsize, nbytes):
+    """ Undo the filter pipeline for a chunk read with read_direct_chunk.
+    Returns a buffer holding the raw chunk data.  Only filters listed in
+    CODEC_FILTERS are supported.
+
+    Undocumented and subject to change without warning.
+    """
+    for idx in range(len(pipeline)-1, -1, -1):
+        if filter_mask & (1 << idx):
+            continue
+        code, vals = pipeline[idx]
+        if code == h5z.FILTER_DEFLATE:
+            data = zlib.decompress(data)
+        elif code == h5z.FILTER_LZF:
+            data = h5z.lzf_decompress(data, nbytes)
+        elif code == h5z.FILTER_SHUFFLE:
+            data = _unshuffle(data, vals[0] if len(vals) > 0 else itemsize)
+        elif code == h5z.FILTER_FLETCHER32:
+            buf = np.frombuffer(data, dtype='u1')
+            stored = int(buf[-4:].view('<u4')[0])
+            data = buf[:-4]
+            checksum = fletcher32(data)
+            # Files written by old versions of HDF5 may have the bytes of
+            # each half swapped
+            swapped = ((checksum & 0xff00ff00) >> 8) | ((checksum & 0x00ff00ff) << 8)
+            if stored not in (checksum, swapped):
+                raise IOError("Fletcher32 checksum mismatch in chunk")
+        else:
+            raise TypeError("Filter %d can't be decoded" % code)
+    return data
+
 CHUNK_BASE = 16*1024    # Multiplier by which chunks are adjusted
 CHUNK_MIN = 8*1024      # Soft lower limit (8k)
 CHUNK_MAX = 1024*1024   # Hard upper limit (1M)
@@ -16,7 +16,8 @@
 
 from __future__ import absolute_import
 
-import six
+import itertools
+
 from six.moves import xrange    # pylint: disable=redefined-builtin
 
 import numpy as np
@@ -267,19 +268,19 @@ class SimpleSelection(Selection):
         return self
 
 
-    def broadcast(self, target_shape):
-        """ Return an iterator over target dataspaces for broadcasting.
+    @property
+    def count(self):
+        """ Number of points selected along each axis, including axes
+        indexed by integers (which count 1) """
+        return self._sel[1]
+
+    def broadcast_shape(self, target_shape):
+        """ Return the tile shape (one entry per axis) which an array of
+        shape target_shape covers when broadcast over the selection.
 
         Follows the standard NumPy broadcasting rules against the current
         selection shape (self.mshape).
         """
-        if self.shape == ():
-            if np.product(target_shape) != 1:
-                raise TypeError("Can't broadcast %s to scalar" % target_shape)
-            self._id.select_all()
-            yield self._id
-            return
-
         start, count, step, scalar = self._sel
 
         rank = len(count)
@@ -296,7 +297,24 @@ class SimpleSelection(Selection):
                 else:
                     raise TypeError("Can't broadcast %s -> %s" % (target_shape, count))
         tshape.reverse()
-        tshape = tuple(tshape)
+        return tuple(tshape)
+
+    def broadcast(self, target_shape):
+        """ Return an iterator over target dataspaces for broadcasting.
+
+        Follows the standard NumPy broadcasting rules against the current
+        selection shape (self.mshape).
+        """
+        if self.shape == ():
+            if np.product(target_shape) != 1:
+                raise TypeError("Can't broadcast %s to scalar" % target_shape)
+            self._id.select_all()
+            yield self._id
+            return
+
+        start, count, step, scalar = self._sel
+        rank = len(count)
+        tshape = self.broadcast_shape(target_shape)
 
         chunks = tuple(x//y for x, y in zip(count, tshape))
         nchunks = int(np.product(chunks))
@@ -311,6 +329,34 @@ class SimpleSelection(Selection):
                 sid.offset_simple(offset)
                 yield sid
 
+    def bands(self, max_points):
+        """ Return an iterator over (dataspace, index) pairs splitting the
+        selection into regular bands of at most max_points points.
+
+        Bands span whole trailing axes where possible.  The index is a tuple
+        of slices locating each band within an array of shape self.count.
+        """
+        start, count, step, scalar = self._sel
+        rank = len(count)
+
+        axis = rank-1
+        inner = 1
+        while axis > 0 and inner*count[axis] <= max_points:
+            inner *= count[axis]
+            axis -= 1
+        rows = max(min(count[axis], max_points//inner), 1)
+
+        sid = self._id.copy()
+        for outer in itertools.product(*[xrange(x) for x in count[:axis]]):
+            ostart = tuple(s + i*t for s, i, t in zip(start, outer, step))
+            oindex = tuple(slice(i, i+1) for i in outer)
+            for row in xrange(0, count[axis], rows):
+                nrows = min(rows, count[axis]-row)
+                bstart = ostart + (start[axis] + row*step[axis],) + start[axis+1:]
+                bcount = (1,)*axis + (nrows,) + count[axis+1:]
+                sid.select_hyperslab(bstart, bcount, step)
+                yield sid, oindex + (slice(row, row+nrows),)
+
 
 class FancySelection(Selection):
 
@@ -319,7 +365,15 @@ class FancySelection(Selection):
         the standard slice-and-int behavior.
 
         Indexing arguments may be ints, slices, lists of indicies, or
-        per-axis (1D) boolean arrays.
+        per-axis (1D) boolean arrays or lists, used as masks.  Lists or arrays given for several
+        axes select orthogonally: dset[[1,5], :, [2,3]] has shape
+        (2, N, 2), unlike the pointwise pairing NumPy would do.
+
+        Lists of indices need not be sorted and may contain repeats.  HDF5
+        always transfers selected points in increasing order, each point
+        once; in that case the data is read in storage order (with shape
+        "sorted_mshape") and rearranged with permute(), and data to be
+        written is brought into storage order with unpermute().
 
         Broadcasting is not supported for these selections.
     """
@@ -328,9 +382,23 @@ class FancySelection(Selection):
     def mshape(self):
         return self._mshape
 
+    @property
+    def sorted_mshape(self):
+        """ Shape of the data as transferred by HDF5 """
+        return self._sorted_mshape
+
+    @property
+    def reordered(self):
+        """ True if the data must be rearranged to match the indices """
+        return len(self._reorder) != 0
+
     def __init__(self, shape, *args, **kwds):
         Selection.__init__(self, shape, *args, **kwds)
         self._mshape = self.shape
+        self._sorted_mshape = self.shape
+        self._reorder = []
+        self._slabs = None
+        self._nslabs = 1
 
     def __getitem__(self, args):
 
@@ -344,43 +412,67 @@ class FancySelection(Selection):
         sequenceargs = {}
         for idx, arg in enumerate(args):
             if not isinstance(arg, slice):
+                if isinstance(arg, list) and len(arg) > 0 and \
+                  all(isinstance(x, (bool, np.bool_)) for x in arg):
+                    arg = np.array(arg, dtype='bool')
                 if hasattr(arg, 'dtype') and arg.dtype == np.dtype('bool'):
                     if len(arg.shape) != 1:
                         raise TypeError("Boolean indexing arrays must be 1-D")
                     arg = arg.nonzero()[0]
                 try:
-                    sequenceargs[idx] = list(arg)
+                    sequenceargs[idx] = _translate_indices(arg, self.shape[idx])
                 except TypeError:
                     pass
-                else:
-                    if sorted(arg) != list(arg):
-                        raise TypeError("Indexing elements must be in increasing order")
 
-        if len(sequenceargs) > 1:
-            raise TypeError("Only one indexing vector or array is currently allowed for advanced selection")
         if len(sequenceargs) == 0:
             raise TypeError("Advanced selection inappropriate")
 
-        vectorlength = len(list(sequenceargs.values())[0])
-        if not all(len(x) == vectorlength for x in sequenceargs.values()):
-            raise TypeError("All sequence arguments must have the same length %s" % sequenceargs)
-
-        # Now generate a vector of selection lists,
-        # consisting only of slices and ints
-
-        argvector = []
-        for idx in xrange(vectorlength):
-            entry = list(args)
-            for position, seq in six.iteritems(sequenceargs):
-                entry[position] = seq[idx]
-            argvector.append(entry)
-
-        # "OR" all these selection lists together to make the final selection
-
-        self._id.select_none()
-        for idx, vector in enumerate(argvector):
-            start, count, step, scalar = _handle_simple(self.shape, vector)
-            self._id.select_hyperslab(start, count, step, op=h5s.SELECT_OR)
+        # Out-of-order or repeated indices: select each index once, and
+        # remember how to get from storage order back to the request.
+        # "last" is the final occurrence of each index, so that when
+        # writing, the last value given for a repeated index wins.
+        reorder = {}
+        for position, indices in sequenceargs.items():
+            if np.any(indices[1:] <= indices[:-1]):
+                reversed_indices = indices[::-1]
+                indices, first = np.unique(reversed_indices, return_index=True)
+                last = len(reversed_indices) - 1 - first
+                inverse = np.searchsorted(indices, reversed_indices[::-1])
+                sequenceargs[position] = indices
+                reorder[position] = (inverse, last)
+
+        # Sequences select orthogonally, as an outer product of the index
+        # lists.  Each list is split into runs with a constant stride, and
+        # one hyperslab is selected per combination of runs, so only the
+        # requested points are transferred.  The remaining axes are the
+        # same for every hyperslab.  SpaceID.select_hyperslabs merges them
+        # without the quadratic cost of OR'ing them in one at a time.  The
+        # dataspace is only built when first needed, as readers may use covering_box() instead.
+
+        positions = sorted(sequenceargs)
+        entry = list(args)
+        for position in positions:
+            entry[position] = slice(None)
+        start, count, step, scalar = _handle_simple(self.shape, entry)
+
+        runs = [np.array(list(_coalesce_indices(sequenceargs[position])),
+                         dtype='u8').reshape((-1, 3)) for position in positions]
+        if 0 in count:
+            runs = [x[0:0] for x in runs]
+        combinations = [x.ravel() for x in
+                        np.meshgrid(*[np.arange(len(x)) for x in runs], indexing='ij')]
+        nslabs = len(combinations[0])
+        slabs = [np.empty((nslabs, len(self.shape)), dtype='u8') for _ in xrange(3)]
+        for table, value in zip(slabs, (start, count, step)):
+            table[...] = value
+        for position, run, combination in zip(positions, runs, combinations):
+            for column in xrange(3):
+                slabs[column][:, position] = run[combination, column]
+        self._slabs = slabs
+        self._nslabs = nslabs
+
+        self._args = entry
+        self._sequences = [(position, sequenceargs[position]) for position in positions]
 
         # Final shape excludes scalars, except where
         # they correspond to sequence entries
@@ -390,14 +482,72 @@ class FancySelection(Selection):
             if idx in sequenceargs:
                 mshape[idx] = len(sequenceargs[idx])
             elif scalar[idx]:
-                mshape[idx] = 0
+                mshape[idx] = None
+
+        self._sorted_mshape = tuple(x for x in mshape if x is not None)
+
+        self._reorder = []
+        for position in sorted(reorder):
+            axis = len([x for x in mshape[:position] if x is not None])
+            self._reorder.append((axis,) + reorder[position])
+        self._mshape = self._sorted_mshape
+        for axis, inverse, last in self._reorder:
+            self._mshape = self._mshape[:axis] + (len(inverse),) + self._mshape[axis+1:]
 
-        self._mshape = tuple(x for x in mshape if x != 0)
+    @property
+    def id(self):
+        """ SpaceID instance """
+        if self._slabs is not None:
+            self._id.select_hyperslabs(*self._slabs)
+            self._slabs = None
+        return self._id
+
+    @property
+    def nselect(self):
+        """ Number of elements currently selected """
+        return int(np.prod(self._sorted_mshape))
+
+    @property
+    def nslabs(self):
+        """ Number of hyperslabs the selection is made of """
+        return self._nslabs
+
+    def covering_box(self):
+        """ Return (args, take) for reading the selection through the box
+        enclosing its index lists, where "args" selects the box as a simple
+        selection, and "take" is a list of (axis, indices) pairs which pick
+        an array of shape "sorted_mshape" out of the box with numpy.take.
+        """
+        args = list(self._args)
+        take = []
+        for position, indices in self._sequences:
+            first = int(indices[0]) if len(indices) else 0
+            last = int(indices[-1]) if len(indices) else 0
+            args[position] = slice(first, last+1)
+            axis = len([x for x in self._args[:position] if isinstance(x, slice)])
+            take.append((axis, indices - first))
+        return tuple(args), take
+
+    def permute(self, arr):
+        """ Rearrange an array of shape "sorted_mshape", as read from the
+        file, to the order of the requested indices.
+        """
+        for axis, inverse, last in self._reorder:
+            arr = arr.take(inverse, axis=axis)
+        return arr
+
+    def unpermute(self, arr):
+        """ Rearrange an array of shape "mshape" into storage order, for
+        writing.  Where an index is repeated, the last value given wins.
+        """
+        for axis, inverse, last in self._reorder:
+            arr = arr.take(last, axis=axis)
+        return arr
 
     def broadcast(self, target_shape):
-        if not target_shape == self.mshape:
+        if not target_shape == self.sorted_mshape:
             raise TypeError("Broadcasting is not supported for complex selections")
-        yield self._id
+        yield self.id
 
 def _expand_ellipsis(args, rank):
     """ Expand ellipsis objects and fill in missing axes.
@@ -468,6 +618,59 @@ def _translate_int(exp, length):
 
     return exp, 1, 1
 
+def _translate_indices(exp, length):
+    """ Given a sequence of integer indices, return them as an array of
+        non-negative integers, checking they are within range.  Raises
+        TypeError if "exp" isn't a sequence of integers.
+    """
+    try:
+        indices = np.asarray(exp)
+    except Exception:
+        raise TypeError("Not an index sequence")
+    if indices.ndim != 1:
+        raise TypeError("Not an index sequence")
+    if indices.size == 0:
+        return np.zeros((0,), dtype='i8')
+    if indices.dtype.kind not in 'iu':
+        raise TypeError("Not an index sequence")
+
+    indices = indices.astype('i8')
+    indices[indices < 0] += length
+
+    bad = (indices < 0) | (indices >= length)
+    if bad.any():
+        raise ValueError("Index (%s) out of range (0-%s)" % (indices[bad][0], length-1))
+    return indices
+
+def _coalesce_indices(indices):
+    """ Split an increasing vector of indices into as few runs with a
+        constant stride as a single left-to-right pass finds.  Yields
+        (start, count, step) tuples suitable for hyperslab selection.
+    """
+    nindices = len(indices)
+    if nindices == 0:
+        return
+    if nindices == 1:
+        yield int(indices[0]), 1, 1
+        return
+
+    # Find groups of equal consecutive differences.  Differences first:last
+    # cover indices first through last inclusive.
+    diffs = np.diff(indices)
+    breaks = np.flatnonzero(diffs[1:] != diffs[:-1]) + 1
+    firsts = np.concatenate(([0], breaks)).tolist()
+    lasts = np.concatenate((breaks, [len(diffs)])).tolist()
+
+    pos = 0     # First index not yet part of a run
+    for first, last in zip(firsts, lasts):
+        first = max(first, pos)
+        # A lone index is left to start the next group instead
+        if last - first >= 1:
+            yield int(indices[first]), last-first+1, int(diffs[first])
+            pos = last+1
+    if pos < nindices:
+        yield int(indices[pos]), 1, 1
+
 def _translate_slice(exp, length):
     """ Given a slice object, return a 3-tuple
         (start, count, step)
@@ -487,6 +690,114 @@ def _translate_slice(exp, length):
 
     return start, count, step
 
+def box_bounds(shape, args):
+    """ Given a selection made of unit-step slices and integers, return
+        a 2-tuple (start, stop) of tuples bounding the selected box.  An
+        integer selects a single element along its axis.  If "args" is None,
+        the entire dataspace is selected.
+    """
+    if args is None:
+        args = ()
+    elif not isinstance(args, tuple):
+        args = (args,)
+
+    start, count, step, scalar = _handle_simple(shape, args)
+    if any(x != 1 for x in step):
+        raise ValueError("Only unit-step slices are allowed")
+
+    stop = tuple(x+y for x, y in zip(start, count))
+    return start, stop
+
+def box_shape(shape, args):
+    """ Given a selection accepted by box_bounds, return the shape of the
+        array it reads, i.e. the box shape without the integer-indexed axes.
+    """
+    if args is None:
+        args = ()
+    elif not isinstance(args, tuple):
+        args = (args,)
+
+    start, count, step, scalar = _handle_simple(shape, args)
+    return tuple(x for x, s in zip(count, scalar) if not s)
+
+def hyperslab(shape, args):
+    """ Given a selection made of slices and integers, return a 4-tuple
+        (start, count, step, mshape) describing the selected hyperslab and
+        the shape of the array it reads.
+    """
+    if not isinstance(args, tuple):
+        args = (args,)
+
+    start, count, step, scalar = _handle_simple(shape, args)
+    mshape = tuple(x for x, s in zip(count, scalar) if not s)
+    return start, count, step, mshape
+
+def hyperslab_indices(shape, start, count, step):
+    """ Return the flat (C order) indices into a dataspace of the given
+        shape of every element in a hyperslab, in C order, as a 1-D array.
+    """
+    grids = np.ix_(*[np.arange(x, x+y*z, z, dtype='i8') for x, y, z in zip(start, count, step)])
+    return np.ravel_multi_index(grids, shape).ravel()
+
+def strided_hyperslab(shape, strides, itemsize):
+    """ Describe an array with the given shape and byte strides as a
+        regular hyperslab (starting at zero, with count equal to "shape")
+        of a C-contiguous array beginning at the same address.
+
+        Returns (vshape, step), the shape of the enclosing array and the
+        hyperslab step along each axis, or None if there is no such
+        description: strides which are negative, overlapping, not whole
+        elements, or not in decreasing (C) order.
+    """
+    axes = [i for i, x in enumerate(shape) if x > 1]
+    vshape = [1]*len(shape)
+    step = [1]*len(shape)
+    if len(axes) == 0:
+        return tuple(vshape), tuple(step)
+
+    # The enclosing array's stride along each axis must divide the array's
+    # stride there, and the enclosing array's stride on the previous axis
+    units = []
+    unit = 0
+    for i in axes:
+        if strides[i] <= 0 or strides[i] % itemsize != 0:
+            return None
+        unit = _gcd(unit, strides[i])
+        units.append(unit)
+    units[-1] = itemsize
+
+    outer = None
+    for i, unit in zip(axes, units):
+        step[i] = strides[i]//unit
+        extent = (shape[i]-1)*step[i] + 1
+        if outer is None:
+            vshape[i] = extent
+        elif outer//unit < extent:
+            return None
+        else:
+            vshape[i] = outer//unit
+        outer = unit
+    return tuple(vshape), tuple(step)
+
+def _gcd(a, b):
+    """ Greatest common divisor of two non-negative integers """
+    while b:
+        a, b = b, a % b
+    return a
+
+def iter_chunk_slices(start, stop, chunks):
+    """ Yield a tuple of slices for every chunk intersecting the box
+        [start, stop), clipped to the box.  Chunks are visited in C order.
+    """
+    if any(y <= x for x, y in zip(start, stop)):
+        return
+
+    ranges = [xrange(x//c, (y-1)//c + 1) for x, y, c in zip(start, stop, chunks)]
+
+    for idx in itertools.product(*ranges):
+        yield tuple(slice(max(x, i*c), min(y, (i+1)*c))
+                    for i, x, y, c in zip(idx, start, stop, chunks))
+
 def guess_shape(sid):
     """ Given a dataspace, try to deduce the shape of the selection.
 
@@ -24,6 +24,7 @@ cdef class FastRLock:
     cdef int _count             # re-entry count
     cdef int _pending_requests  # number of pending requests for real lock
     cdef bint _is_locked        # whether the real lock is acquired
+    cdef object __weakref__
 
     def __cinit__(self):
         self._owner = -1
@@ -126,3 +127,27 @@ cdef inline void unlock_lock(FastRLock lock) nogil:
             lock._is_locked = False
 ## end of http://code.activestate.com/recipes/577336/ }}}
 
+cdef int lock_release_save(FastRLock lock) except -1:
+    # Completely release a lock owned by the current thread, regardless of
+    # its recursion level.  Returns the recursion count, which must be passed
+    # to lock_acquire_restore.  Like threading.RLock._release_save.
+
+    cdef int count
+
+    if lock._owner != pythread.PyThread_get_thread_ident():
+        return 0
+    count = lock._count
+    lock._count = 1
+    unlock_lock(lock)
+    return count
+
+cdef int lock_acquire_restore(FastRLock lock, int count) except -1:
+    # Re-acquire a lock released by lock_release_save, restoring its
+    # recursion count.  Blocks (without the GIL) until the lock is available.
+
+    if count == 0:
+        return 0
+    lock_lock(lock, pythread.PyThread_get_thread_ident(), True)
+    lock._count = count
+    return 0
+
@@ -15,6 +15,9 @@ cdef class ObjectID:
     cdef readonly hid_t id
     cdef public int locked              # Cannot be closed, explicitly or auto
     cdef object _hash
+    cdef object _io_lock                # Lock serializing bulk I/O (see file_io)
+
+    cdef void _invalidated(self)
 
 # Convenience functions
 cdef hid_t pdefault(ObjectID pid)
@@ -11,6 +11,7 @@
     Implements ObjectID base class.
 """
 
+include "config.pxi"
 include "_locks.pxi"
 from defs cimport *
 
@@ -36,6 +37,15 @@ DEF DEBUG_ID = False
 # it before we've had a chance to set obj.id = 0.  For this reason, h5py is
 # advertised for EITHER multithreaded use OR use alongside PyTables/NetCDF4,
 # but not both at the same time.
+#
+# The bulk data calls (H5Dread, H5Dwrite and H5Tconvert in _proxy) release
+# the GIL while still holding this lock, so other threads can run Python and
+# NumPy code during I/O.  This is deadlock-free because of how FastRLock hands
+# the lock over: a thread which finds the lock owned by somebody else takes
+# the underlying real lock (which nobody holds at that point, so this never
+# blocks), then releases the GIL and blocks on the real lock a second time.
+# The owner never needs the GIL to finish its HDF5 call, and when it
+# eventually releases the lock (with the GIL held), the waiter wakes up.
 
 IF USE_LOCKING:
     cdef FastRLock _phil = FastRLock()
@@ -114,6 +124,7 @@ def nonlocal_close():
     """ Find dead ObjectIDs and set their integer identifiers to 0.
     """
     cdef ObjectID obj
+    cdef list invalidated = []
 
     for python_id, ref in registry.items():
 
@@ -138,11 +149,129 @@ def nonlocal_close():
                 print("NONLOCAL - invalidating %d of kind %s HDF5 id %d" %
                         (python_id, type(obj), obj.id) )
             obj.id = 0
+            invalidated.append(obj)
             continue
 
+    # Only now, as this may free other objects and so change the registry
+    for obj in invalidated:
+        obj._invalidated()
+
 # --- End registry code -------------------------------------------------------
 
 
+# --- Per-file locking --------------------------------------------------------
+#
+# By default, all dataset I/O is serialized by phil, even when it targets
+# unrelated files.  On a thread-safe build of HDF5 the library protects its
+# own internal state, so as an opt-in h5py can instead serialize bulk dataset
+# I/O with one lock per file.  Everything else, including the identifier
+# registry and all object creation/destruction, stays under phil.
+#
+# A thread entering a per-file I/O section first releases phil completely
+# (even if acquired recursively further up the stack), then takes the file
+# lock.  It releases the file lock before re-acquiring phil.  Nobody ever
+# waits for a file lock while holding phil, so the two can't deadlock.
+#
+# This means that frames further up the stack lose phil's protection while
+# the transfer runs, and any other thread may run h5py code meanwhile.  The
+# only code which may hold phil across DatasetID.read/write (the callers of
+# file_io) is code which leaves nothing shared in an inconsistent state
+# across the call, and doesn't rely on shared state being unchanged after
+# it.  Within h5py that is DatasetID itself and the high-level Dataset,
+# which keeps the dataspaces it hands to HDF5 per thread (Dataset._select
+# and Dataset._memory_space).  Anything else holding phil around a read or
+# write must not be used with per-file locking enabled.
+
+cdef bint _per_file_locking = False
+
+# Maps file number (see ObjectID.fileno) -> FastRLock
+_file_locks = weakref.WeakValueDictionary()
+
+
+def is_threadsafe():
+    """ () => BOOL
+
+    Determine if the HDF5 library was built with thread-safety enabled.
+    """
+    cdef hbool_t is_ts = 0
+    IF HDF5_VERSION >= (1, 8, 16):
+        with _phil:
+            H5is_library_threadsafe(&is_ts)
+    return bool(is_ts)
+
+
+def get_per_file_locking():
+    """ () => BOOL
+
+    Determine if dataset I/O is serialized per file rather than globally.
+    """
+    return _per_file_locking
+
+
+def set_per_file_locking(bint enable):
+    """ (BOOL enable)
+
+    Serialize dataset I/O with one lock per file, rather than with the
+    global lock.  Requires a thread-safe build of HDF5.  Identifiers opened
+    before the setting changed keep using the lock they had.
+    """
+    global _per_file_locking
+    if enable and not is_threadsafe():
+        raise RuntimeError("Per-file locking requires a thread-safe build of HDF5")
+    _per_file_locking = enable
+
+
+cdef class _FileIOLock:
+
+    """
+        Context manager for a per-file I/O section; see above.
+    """
+
+    cdef FastRLock lock
+    cdef int saved
+
+    def __cinit__(self, FastRLock lock not None):
+        self.lock = lock
+        self.saved = 0
+
+    def __enter__(self):
+        self.saved = lock_release_save(_phil)
+        lock_lock(self.lock, pythread.PyThread_get_thread_ident(), True)
+
+    def __exit__(self, *args):
+        unlock_lock(self.lock)
+        lock_acquire_restore(_phil, self.saved)
+
+
+def file_io(ObjectID obj not None):
+    """ (ObjectID obj) => Context manager
+
+    Get a context manager which serializes bulk I/O on the file containing
+    obj.  This is phil itself, unless per-file locking is enabled, in which
+    case phil is released completely inside it, even if held by callers;
+    see the notes on per-file locking above.
+    """
+    cdef FastRLock lock
+
+    with _phil:
+        if obj._io_lock is None:
+            if not _per_file_locking:
+                obj._io_lock = _phil
+            else:
+                key = obj.fileno
+                lock = _file_locks.get(key)
+                if lock is None:
+                    lock = FastRLock()
+                    _file_locks[key] = lock
+                obj._io_lock = lock
+
+        if obj._io_lock is _phil:
+            return _phil
+        return _FileIOLock(obj._io_lock)
+
+# --- End per-file locking ----------------------------------------------------
+
+
 cdef class ObjectID:
 
     """
@@ -210,6 +339,12 @@ cdef class ObjectID:
                     H5Idec_ref(self.id)
             finally:
                 self.id = 0
+                self._invalidated()
+
+
+    cdef void _invalidated(self):
+        # Called once the identifier is closed, to drop anything kept for it
+        pass
 
 
     def close(self):
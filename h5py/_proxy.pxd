@@ -12,5 +12,7 @@ from defs cimport *
 cdef herr_t attr_rw(hid_t attr, hid_t mtype, void *progbuf, int read) except -1
 
 cdef herr_t dset_rw(hid_t dset, hid_t mtype, hid_t mspace, hid_t fspace,
-                    hid_t dxpl, void* progbuf, int read) except -1
+                    hid_t dxpl, void* progbuf, int read, int plan=*) except -1
+
+cdef int dset_rw_plan(hid_t dset, hid_t mtype, int read) except -1
 
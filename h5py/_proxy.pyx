@@ -13,6 +13,17 @@
     Proxy functions for read/write, to work around the HDF5 bogus type issue.
 """
 
+include "config.pxi"
+
+from _errors cimport set_exception
+from numpy cimport ndarray, import_array, PyArray_DATA
+
+import threading
+
+import numpy
+
+import_array()
+
 cdef enum copy_dir:
     H5PY_SCATTER = 0,
     H5PY_GATHER
@@ -51,7 +62,7 @@ cdef herr_t attr_rw(hid_t attr, hid_t mtype, void *progbuf, int read) except -1:
             else:
                 need_bkg = needs_bkg_buffer(mtype, atype)
             if need_bkg:
-                back_buf = malloc(msize*npoints)
+                back_buf = create_buffer(msize, msize, npoints)
                 memcpy(back_buf, progbuf, msize*npoints)
 
             if read:
@@ -65,8 +76,8 @@ cdef herr_t attr_rw(hid_t attr, hid_t mtype, void *progbuf, int read) except -1:
                 H5Dvlen_reclaim(atype, aspace, H5P_DEFAULT, conv_buf)
 
     finally:
-        free(conv_buf)
-        free(back_buf)
+        release_buffer(conv_buf)
+        release_buffer(back_buf)
         if atype > 0:
             H5Tclose(atype)
         if aspace > 0:
@@ -76,61 +87,140 @@ cdef herr_t attr_rw(hid_t attr, hid_t mtype, void *progbuf, int read) except -1:
 
 # =============================================================================
 # Proxy functions to safely release the GIL around read/write operations
+#
+# The checked wrappers in defs can't be called without the GIL, since on
+# failure they set a Python exception.  We declare unchecked, nogil versions
+# of the bulk-data calls here, and translate the HDF5 error stack ourselves
+# once the GIL is re-acquired.
+#
+# Releasing the GIL does *not* release phil.  The calling thread still owns
+# the lock, so no other thread can enter HDF5 while the I/O is in progress;
+# see _locks.pxi for how a competing thread waits on it.  Any h5py type
+# conversion callbacks HDF5 invokes along the way re-acquire the GIL
+# themselves (see _conv.pyx).
+
+cdef extern from "hdf5.h":
+    herr_t H5Dread_nogil "H5Dread" (hid_t dset_id, hid_t mem_type_id,
+                    hid_t mem_space_id, hid_t file_space_id, hid_t plist_id,
+                    void *buf) nogil
+    herr_t H5Dwrite_nogil "H5Dwrite" (hid_t dset_id, hid_t mem_type,
+                    hid_t mem_space, hid_t file_space, hid_t xfer_plist,
+                    void* buf) nogil
+    herr_t H5Tconvert_nogil "H5Tconvert" (hid_t src_id, hid_t dst_id,
+                    size_t nelmts, void *buf, void *background,
+                    hid_t plist_id) nogil
+
+cdef int raise_hdf5_error(fname) except -1:
+    # Convert the HDF5 error stack into a Python exception
+    if not set_exception():
+        raise RuntimeError("Unspecified error in %s (return value <0)" % fname)
+    return -1
 
 cdef herr_t H5PY_H5Dread(hid_t dset, hid_t mtype, hid_t mspace,
                         hid_t fspace, hid_t dxpl, void* buf) except -1:
     cdef herr_t retval
-    #with nogil:
-    retval = H5Dread(dset, mtype, mspace, fspace, dxpl, buf)
+    with nogil:
+        retval = H5Dread_nogil(dset, mtype, mspace, fspace, dxpl, buf)
     if retval < 0:
-        return -1
+        return raise_hdf5_error("H5Dread")
     return retval
 
 cdef herr_t H5PY_H5Dwrite(hid_t dset, hid_t mtype, hid_t mspace,
                         hid_t fspace, hid_t dxpl, void* buf) except -1:
     cdef herr_t retval
-    #with nogil:
-    retval = H5Dwrite(dset, mtype, mspace, fspace, dxpl, buf)
+    with nogil:
+        retval = H5Dwrite_nogil(dset, mtype, mspace, fspace, dxpl, buf)
+    if retval < 0:
+        return raise_hdf5_error("H5Dwrite")
+    return retval
+
+cdef herr_t H5PY_H5Tconvert(hid_t src, hid_t dst, size_t nl, void* buf,
+                        void* bkg, hid_t dxpl) except -1:
+    cdef herr_t retval
+    with nogil:
+        retval = H5Tconvert_nogil(src, dst, nl, buf, bkg, dxpl)
     if retval < 0:
-        return -1
+        return raise_hdf5_error("H5Tconvert")
     return retval
 
 # =============================================================================
 # Proxy for vlen buf workaround
 
 
+# Flags describing how dset_rw() must transfer data for a given pair of
+# dataset and memory types
+DEF PLAN_PROXY = 1      # Convert through a proxy buffer
+DEF PLAN_BKG = 2        # ... which needs a background buffer
+
+cdef hid_t transfer_type(hid_t dset, hid_t mtype, int read) except -1:
+    # Return a new copy of the dataset type to use for a transfer.
+    #
+    # Issue 372: when a compound type is involved, using the dataset type
+    # may result in uninitialized data being sent to H5Tconvert for fields
+    # not present in the memory type.  Limit the type used for the dataset
+    # to only those fields present in the memory type.  We can't use the
+    # memory type directly because of course that triggers HDFFV-1063.
+
+    cdef hid_t rawdstype = -1
+
+    if (H5Tget_class(mtype) == H5T_COMPOUND) and (not read):
+        rawdstype = H5Dget_type(dset)
+        try:
+            return make_reduced_type(mtype, rawdstype)
+        finally:
+            H5Tclose(rawdstype)
+    return H5Dget_type(dset)
+
+cdef int plan_flags(hid_t dstype, hid_t mtype, int read) except -1:
+    # Work out the PLAN_* flags for a transfer between dstype and mtype
+
+    if not (needs_proxy(dstype) or needs_proxy(mtype)):
+        return 0
+
+    # Only create a (contiguous) backing buffer if absolutely
+    # necessary. Note this buffer always has memory type.
+    if read:
+        need_bkg = needs_bkg_buffer(dstype, mtype)
+    else:
+        need_bkg = needs_bkg_buffer(mtype, dstype)
+    return PLAN_PROXY | (PLAN_BKG if need_bkg else 0)
+
+cdef int dset_rw_plan(hid_t dset, hid_t mtype, int read) except -1:
+    # Work out the plan for dset_rw() with these arguments.  Walking the
+    # types is slow for wide compound types, so callers doing repeated
+    # transfers with the same memory type may keep the result and pass it
+    # back to dset_rw().
+
+    cdef hid_t dstype = transfer_type(dset, mtype, read)
+    try:
+        return plan_flags(dstype, mtype, read)
+    finally:
+        H5Tclose(dstype)
+
 cdef herr_t dset_rw(hid_t dset, hid_t mtype, hid_t mspace, hid_t fspace,
-                    hid_t dxpl, void* progbuf, int read) except -1:
+                    hid_t dxpl, void* progbuf, int read, int plan=-1) except -1:
+    # Read or write data.  "plan" is the result of dset_rw_plan() for this
+    # dataset, memory type and direction, or -1 to work it out here.
 
     cdef htri_t need_bkg
     cdef hid_t dstype = -1      # Dataset datatype
-    cdef hid_t rawdstype = -1
     cdef hid_t dspace = -1      # Dataset dataspace
-    cdef hid_t cspace = -1      # Temporary contiguous dataspaces
-
-    cdef void* back_buf = NULL
-    cdef void* conv_buf = NULL
     cdef hsize_t npoints
+    cdef size_t elsize
 
     try:
-        # Issue 372: when a compound type is involved, using the dataset type
-        # may result in uninitialized data being sent to H5Tconvert for fields
-        # not present in the memory type.  Limit the type used for the dataset
-        # to only those fields present in the memory type.  We can't use the
-        # memory type directly because of course that triggers HDFFV-1063.
-        if (H5Tget_class(mtype) == H5T_COMPOUND) and (not read):
-            rawdstype = H5Dget_type(dset)
-            dstype = make_reduced_type(mtype, rawdstype)
-            H5Tclose(rawdstype)
-        else:
-            dstype = H5Dget_type(dset)
+        if plan < 0:
+            dstype = transfer_type(dset, mtype, read)
+            plan = plan_flags(dstype, mtype, read)
 
-        if not (needs_proxy(dstype) or needs_proxy(mtype)):
+        if not (plan & PLAN_PROXY):
             if read:
                 H5PY_H5Dread(dset, mtype, mspace, fspace, dxpl, progbuf)
             else:
                 H5PY_H5Dwrite(dset, mtype, mspace, fspace, dxpl, progbuf)
         else:
+            if dstype < 0:
+                dstype = transfer_type(dset, mtype, read)
 
             if mspace == H5S_ALL and fspace != H5S_ALL:
                 mspace = fspace
@@ -139,44 +229,213 @@ cdef herr_t dset_rw(hid_t dset, hid_t mtype, hid_t mspace, hid_t fspace,
             elif mspace == H5S_ALL and fspace == H5S_ALL:
                 fspace = mspace = dspace = H5Dget_space(dset)
 
-            npoints = H5Sget_select_npoints(mspace)
-            cspace = H5Screate_simple(1, &npoints, NULL)
-
-            conv_buf = create_buffer(H5Tget_size(dstype), H5Tget_size(mtype), npoints)
+            need_bkg = plan & PLAN_BKG
 
-            # Only create a (contiguous) backing buffer if absolutely
-            # necessary. Note this buffer always has memory type.
-            if read:
-                need_bkg = needs_bkg_buffer(dstype, mtype)
+            npoints = H5Sget_select_npoints(mspace)
+            elsize = max(H5Tget_size(dstype), H5Tget_size(mtype))
+            if npoints*elsize <= strip_bytes:
+                proxy_rw(dset, dstype, mtype, mspace, fspace, dxpl, progbuf,
+                         read, need_bkg, None, npoints)
             else:
-                need_bkg = needs_bkg_buffer(mtype, dstype)
-            if need_bkg:
-                back_buf = create_buffer(H5Tget_size(dstype), H5Tget_size(mtype), npoints)
-                h5py_copy(mtype, mspace, back_buf, progbuf, H5PY_GATHER)
+                strip_rw(dset, dstype, mtype, mspace, fspace, dxpl, progbuf,
+                         read, need_bkg, max(strip_bytes//elsize, 1))
 
-            if read:
-                H5PY_H5Dread(dset, dstype, cspace, fspace, dxpl, conv_buf)
-                H5Tconvert(dstype, mtype, npoints, conv_buf, back_buf, dxpl)
-                h5py_copy(mtype, mspace, conv_buf, progbuf, H5PY_SCATTER)
-            else:
-                h5py_copy(mtype, mspace, conv_buf, progbuf, H5PY_GATHER)
-                H5Tconvert(mtype, dstype, npoints, conv_buf, back_buf, dxpl)
-                H5PY_H5Dwrite(dset, dstype, cspace, fspace, dxpl, conv_buf)
-                H5Dvlen_reclaim(dstype, cspace, H5P_DEFAULT, conv_buf)
- 
     finally:
-        free(back_buf)
-        free(conv_buf)
         if dstype > 0:
             H5Tclose(dstype)
         if dspace > 0:
             H5Sclose(dspace)
+
+    return 0
+
+
+cdef int proxy_rw(hid_t dset, hid_t dstype, hid_t mtype, hid_t mspace,
+                  hid_t fspace, hid_t dxpl, void* progbuf, int read,
+                  int need_bkg, SelectionRuns runs, hsize_t npoints) except -1:
+    # Transfer the points selected in fspace through a contiguous conversion
+    # buffer.  In memory they are the next npoints points of mspace listed
+    # by "runs", or the whole selection if that is None.
+
+    cdef hid_t cspace = -1
+    cdef void* back_buf = NULL
+    cdef void* conv_buf = NULL
+
+    try:
+        cspace = H5Screate_simple(1, &npoints, NULL)
+        conv_buf = create_buffer(H5Tget_size(dstype), H5Tget_size(mtype), npoints)
+
+        if need_bkg:
+            back_buf = create_buffer(H5Tget_size(dstype), H5Tget_size(mtype), npoints)
+            if runs is not None:
+                mark = runs.save()
+            copy_points(mtype, mspace, back_buf, progbuf, H5PY_GATHER, runs, npoints)
+            if runs is not None:
+                runs.restore(mark)
+
+        if read:
+            H5PY_H5Dread(dset, dstype, cspace, fspace, dxpl, conv_buf)
+            H5PY_H5Tconvert(dstype, mtype, npoints, conv_buf, back_buf, dxpl)
+            copy_points(mtype, mspace, conv_buf, progbuf, H5PY_SCATTER, runs, npoints)
+        else:
+            copy_points(mtype, mspace, conv_buf, progbuf, H5PY_GATHER, runs, npoints)
+            H5PY_H5Tconvert(mtype, dstype, npoints, conv_buf, back_buf, dxpl)
+            H5PY_H5Dwrite(dset, dstype, cspace, fspace, dxpl, conv_buf)
+            H5Dvlen_reclaim(dstype, cspace, H5P_DEFAULT, conv_buf)
+
+    finally:
+        release_buffer(back_buf)
+        release_buffer(conv_buf)
         if cspace > 0:
             H5Sclose(cspace)
 
     return 0
 
 
+cdef int strip_rw(hid_t dset, hid_t dstype, hid_t mtype, hid_t mspace,
+                  hid_t fspace, hid_t dxpl, void* progbuf, int read,
+                  int need_bkg, hsize_t strip) except -1:
+    # Transfer a large selection in strips of about "strip" points, so the
+    # conversion buffers stay small.  Point selections are cut into pieces
+    # of the point list.  Otherwise the strips are boxes cut from the
+    # bounding box of the file selection: a range along one axis, a single
+    # index along each axis before it, and everything along the axes after
+    # it.  The axis is the first for which a box one element thick holds
+    # no more than "strip" points, assuming the points are spread evenly.
+    # HDF5 visits hyperslabs in C order, so visiting the boxes in C order
+    # visits the points of the selection in order.  The memory runs of the
+    # points are worked out as each strip needs them.  Where the points are
+    # not spread evenly, box_rw() splits boxes holding too many of them.
+
+    cdef hid_t sub = -1
+    cdef int rank, axis, i
+    cdef hsize_t npoints, nsub, first, band
+    cdef double density, thickness
+    cdef ndarray coords, start, count
+    cdef SelectionRuns runs
+
+    runs = selection_runs(mspace)
+    rank = H5Sget_simple_extent_ndims(fspace)
+    npoints = H5Sget_select_npoints(fspace)
+    first = 0
+
+    try:
+        if H5Sget_select_type(fspace) == H5S_SEL_POINTS:
+            while first < npoints:
+                nsub = min(strip, npoints - first)
+                coords = numpy.empty((nsub, rank), dtype=numpy.uint64)
+                H5Sget_select_elem_pointlist(fspace, first, nsub,
+                                             <hsize_t*>PyArray_DATA(coords))
+                sub = H5Scopy(fspace)
+                H5Sselect_elements(sub, H5S_SELECT_SET, nsub,
+                                   <hsize_t*>PyArray_DATA(coords))
+                proxy_rw(dset, dstype, mtype, mspace, sub, dxpl, progbuf,
+                         read, need_bkg, runs, nsub)
+                H5Sclose(sub)
+                sub = -1
+                first += nsub
+            return 0
+
+        # Bounding box of the selection
+        start = numpy.empty((rank,), dtype=numpy.uint64)
+        count = numpy.empty((rank,), dtype=numpy.uint64)
+        H5Sget_select_bounds(fspace, <hsize_t*>PyArray_DATA(start),
+                             <hsize_t*>PyArray_DATA(count))
+        lower = [int(x) for x in start]
+        upper = [int(x) + 1 for x in count]
+
+        # Points in a box one element thick along each axis
+        density = npoints
+        for i from 0<=i<rank:
+            density /= (upper[i] - lower[i])
+        axis = rank - 1
+        thickness = density
+        while axis > 0 and thickness*(upper[axis] - lower[axis]) <= strip:
+            thickness *= (upper[axis] - lower[axis])
+            axis -= 1
+        band = max(<hsize_t>(strip/thickness), 1)
+
+        box = list(lower)
+        while True:
+            box[axis] = lower[axis]
+            while box[axis] < upper[axis]:
+                for i from 0<=i<rank:
+                    start[i] = box[i]
+                    if i < axis:
+                        count[i] = 1
+                    elif i == axis:
+                        count[i] = min(band, upper[axis] - box[axis])
+                    else:
+                        count[i] = upper[i] - lower[i]
+                box_rw(dset, dstype, mtype, mspace, fspace, dxpl, progbuf,
+                       read, need_bkg, strip, runs, start, count, axis)
+                box[axis] += band
+
+            # Next index along the axes before "axis", in C order
+            i = axis - 1
+            while i >= 0:
+                box[i] += 1
+                if box[i] < upper[i]:
+                    break
+                box[i] = lower[i]
+                i -= 1
+            if i < 0:
+                break
+
+    finally:
+        if sub > 0:
+            H5Sclose(sub)
+
+    return 0
+
+
+cdef int box_rw(hid_t dset, hid_t dstype, hid_t mtype, hid_t mspace,
+                hid_t fspace, hid_t dxpl, void* progbuf, int read,
+                int need_bkg, hsize_t strip, SelectionRuns runs,
+                ndarray start, ndarray count, int axis) except -1:
+    # Transfer the points of fspace within the box "start"/"count", for
+    # strip_rw().  If there are more than "strip" of them, the box is cut in
+    # two along its first axis (from "axis" on) longer than one element,
+    # and the halves are done in turn, so they are still visited in C order.
+
+    cdef hid_t sub = -1
+    cdef hsize_t nsub, half
+    cdef ndarray upper_start, upper_count
+
+    try:
+        sub = H5Scopy(fspace)
+        if H5Sget_select_type(fspace) == H5S_SEL_ALL:
+            H5Sselect_hyperslab(sub, H5S_SELECT_SET, <hsize_t*>PyArray_DATA(start),
+                                NULL, <hsize_t*>PyArray_DATA(count), NULL)
+        else:
+            H5Sselect_hyperslab(sub, H5S_SELECT_AND, <hsize_t*>PyArray_DATA(start),
+                                NULL, <hsize_t*>PyArray_DATA(count), NULL)
+        nsub = H5Sget_select_npoints(sub)
+        if nsub <= strip:
+            if nsub > 0:
+                proxy_rw(dset, dstype, mtype, mspace, sub, dxpl, progbuf,
+                         read, need_bkg, runs, nsub)
+            return 0
+    finally:
+        if sub > 0:
+            H5Sclose(sub)
+
+    # More than one point, so some axis is longer than one element
+    while count[axis] == 1:
+        axis += 1
+    half = count[axis]//2
+    upper_start = start.copy()
+    upper_count = count.copy()
+    upper_start[axis] += half
+    upper_count[axis] -= half
+    count = count.copy()
+    count[axis] = half
+    box_rw(dset, dstype, mtype, mspace, fspace, dxpl, progbuf, read,
+           need_bkg, strip, runs, start, count, axis)
+    box_rw(dset, dstype, mtype, mspace, fspace, dxpl, progbuf, read,
+           need_bkg, strip, runs, upper_start, upper_count, axis)
+    return 0
+
+
 cdef hid_t make_reduced_type(hid_t mtype, hid_t dstype):
     # Go through dstype, pick out the fields which also appear in mtype, and
     # return a new compound type with the fields packed together
@@ -231,21 +490,176 @@ cdef hid_t make_reduced_type(hid_t mtype, hid_t dstype):
     return newtype
 
 
+# Largest conversion buffer dset_rw() uses for one transfer; bigger
+# selections are converted in strips of about this size
+cdef size_t strip_bytes = 64*1024*1024
+
+def get_conversion_strip_size():
+    """ () => INT
+
+    Get the largest conversion buffer, in bytes, used for reading or
+    writing data that needs converting (e.g. variable-length strings).
+    """
+    return strip_bytes
+
+def set_conversion_strip_size(size_t nbytes):
+    """ (UINT nbytes)
+
+    Set the largest conversion buffer, in bytes, used for reading or
+    writing data that needs converting.  Larger transfers are done in
+    strips, reading, converting and scattering one strip at a time.
+    """
+    global strip_bytes
+    strip_bytes = nbytes
+
+# =============================================================================
+# Conversion buffer pool
+#
+# Conversion and background buffers are taken from a per-thread pool rather
+# than malloc'd and freed on every read or write.  Requests are rounded up
+# to size classes (eight per power of two), so that a buffer can be reused
+# for any request of a similar size, and each thread keeps at most
+# pool_limit bytes of idle buffers.  Every buffer is preceded by a small
+# header recording its size class.
+
+DEF POOL_MIN_BYTES = 4096
+DEF POOL_HEADER = 16
+
+cdef size_t pool_limit = 32*1024*1024
+
+# Counters, for all threads
+cdef size_t pool_requests = 0
+cdef size_t pool_reused = 0
+
+cdef class BufferPool:
+
+    """ Idle conversion buffers belonging to one thread """
+
+    cdef dict free_lists    # Size class -> list of buffer addresses
+    cdef size_t cached      # Total size of the idle buffers
+    cdef size_t largest     # Largest buffer handed out since clear()
+
+    def __cinit__(self):
+        self.free_lists = {}
+        self.cached = 0
+        self.largest = 0
+
+    def __dealloc__(self):
+        self.clear()
+
+    cdef int clear(self) except -1:
+        for addresses in self.free_lists.values():
+            for address in addresses:
+                free(<void*><size_t>address)
+        self.free_lists = {}
+        self.cached = 0
+        self.largest = 0
+        return 0
+
+_pools = threading.local()
+
+cdef BufferPool get_pool():
+    # The calling thread's pool
+    pool = getattr(_pools, 'pool', None)
+    if pool is None:
+        pool = BufferPool()
+        _pools.pool = pool
+    return pool
+
+cdef size_t size_class(size_t nbytes):
+    # Round up to the next multiple of 1/8 of the enclosing power of two
+    cdef size_t size = POOL_MIN_BYTES
+    cdef size_t step
+    while size < nbytes:
+        size <<= 1
+    step = size >> 3
+    return ((nbytes + step - 1)//step)*step
+
 cdef void* create_buffer(size_t ipt_size, size_t opt_size, size_t nl) except NULL:
-    
+    # Get a buffer big enough for nl elements of either size; release it
+    # with release_buffer().
+
+    global pool_requests, pool_reused
     cdef size_t final_size
-    cdef void* buf
+    cdef char* buf
+    cdef BufferPool pool
 
     if ipt_size >= opt_size:
         final_size = ipt_size*nl
     else:
         final_size = opt_size*nl
-        
-    buf = malloc(final_size)
+    final_size = size_class(final_size)
+
+    pool = get_pool()
+    pool_requests += 1
+    if final_size > pool.largest:
+        pool.largest = final_size
+    addresses = pool.free_lists.get(final_size)
+    if addresses:
+        buf = <char*><size_t>addresses.pop()
+        pool.cached -= final_size
+        pool_reused += 1
+    else:
+        buf = <char*>malloc(final_size + POOL_HEADER)
+        if buf == NULL:
+            raise MemoryError("Failed to allocate conversion buffer")
+        (<size_t*>buf)[0] = final_size
+
+    return buf + POOL_HEADER
+
+cdef int release_buffer(void* buf) except -1:
+    # Return a buffer from create_buffer() to the pool, or free it if the
+    # pool is full.  NULL is ignored.
+
+    cdef char* base
+    cdef size_t size
+    cdef BufferPool pool
+
     if buf == NULL:
-        raise MemoryError("Failed to allocate conversion buffer")
+        return 0
+
+    base = (<char*>buf) - POOL_HEADER
+    size = (<size_t*>base)[0]
+
+    pool = get_pool()
+    if pool.cached + size <= pool_limit:
+        pool.free_lists.setdefault(size, []).append(<size_t>base)
+        pool.cached += size
+    else:
+        free(base)
+    return 0
 
-    return buf
+def get_buffer_pool_stats():
+    """ () => DICT
+
+    Counters for the conversion buffer pool.  "requests" and "reused"
+    count buffers asked for and those served from a pool, over all threads;
+    "cached" is the size in bytes of the idle buffers held for the calling
+    thread, and "limit" is the most each thread may hold.  "largest" is the
+    size of the largest buffer the calling thread has used since its pool
+    was last cleared.
+    """
+    cdef BufferPool pool = get_pool()
+    return {'requests': pool_requests, 'reused': pool_reused,
+            'cached': pool.cached, 'limit': pool_limit,
+            'largest': pool.largest}
+
+def set_buffer_pool_limit(size_t nbytes):
+    """ (UINT nbytes)
+
+    Set how many bytes of idle conversion buffers each thread may keep.
+    Zero disables pooling.  The calling thread's idle buffers are freed.
+    """
+    global pool_limit
+    pool_limit = nbytes
+    get_pool().clear()
+
+def clear_buffer_pool():
+    """ ()
+
+    Free the idle conversion buffers held for the calling thread.
+    """
+    get_pool().clear()
 
 # =============================================================================
 # Scatter/gather routines
@@ -279,6 +693,11 @@ cdef herr_t h5py_gather_cb(void* elem, hid_t type_id, unsigned ndim,
 
     return 0
 
+# Selections with at most this many points are copied element by element
+# with H5Diterate; above it, working out the runs of consecutive elements
+# first is cheaper.
+DEF ITERATE_MAX_POINTS = 32
+
 # Copy between a contiguous and non-contiguous buffer, with the layout
 # of the latter specified by a dataspace selection.
 cdef herr_t h5py_copy(hid_t tid, hid_t space, void* contig, void* noncontig,
@@ -286,21 +705,395 @@ cdef herr_t h5py_copy(hid_t tid, hid_t space, void* contig, void* noncontig,
 
     cdef h5py_scatter_t info
     cdef hsize_t elsize
+    cdef H5S_sel_type sel_type
+    cdef hssize_t npoints
+    cdef SelectionRuns runs
+
+    if op != H5PY_SCATTER and op != H5PY_GATHER:
+        raise RuntimeError("Illegal direction")
 
     elsize = H5Tget_size(tid)
+    sel_type = H5Sget_select_type(space)
+    npoints = H5Sget_select_npoints(space)
 
-    info.i = 0
-    info.elsize = elsize
-    info.buf = contig
+    if sel_type == H5S_SEL_NONE or npoints == 0:
+        return 0
 
-    if op == H5PY_SCATTER:
-        H5Diterate(noncontig, tid, space, h5py_scatter_cb, &info)
-    elif op == H5PY_GATHER:
-        H5Diterate(noncontig, tid, space, h5py_gather_cb, &info)
-    else:
-        raise RuntimeError("Illegal direction")
+    if sel_type == H5S_SEL_ALL:
+        # Both buffers have the same layout
+        if op == H5PY_SCATTER:
+            memcpy(noncontig, contig, elsize*npoints)
+        else:
+            memcpy(contig, noncontig, elsize*npoints)
+        return 0
 
-    return 0
+    if npoints <= ITERATE_MAX_POINTS or H5Sget_simple_extent_ndims(space) == 0:
+        info.i = 0
+        info.elsize = elsize
+        info.buf = contig
+
+        if op == H5PY_SCATTER:
+            H5Diterate(noncontig, tid, space, h5py_scatter_cb, &info)
+        else:
+            H5Diterate(noncontig, tid, space, h5py_gather_cb, &info)
+        return 0
+
+    # Copy whole runs of consecutive elements at a time
+    runs = selection_runs(space)
+    return runs.copy(elsize, contig, noncontig, op, npoints)
+
+
+cdef herr_t copy_points(hid_t tid, hid_t space, void* contig, void* noncontig,
+                        copy_dir op, SelectionRuns runs,
+                        hsize_t npoints) except -1:
+    # Like h5py_copy, but for the next npoints points of the selection
+    # listed by "runs".  With no runs, the whole selection is copied.
+
+    if runs is None:
+        return h5py_copy(tid, space, contig, noncontig, op)
+    return runs.copy(H5Tget_size(tid), contig, noncontig, op, npoints)
+
+
+cdef object regular_hyperslab(hid_t space, int rank):
+    # The (start, stride, count, block) pattern of a hyperslab selection
+    # described by a single such pattern, as four int64 arrays, or None if
+    # the selection isn't one
+    cdef ndarray pattern
+    IF HDF5_VERSION >= (1, 10, 0):
+        if H5Sget_select_type(space) != H5S_SEL_HYPERSLABS or \
+          H5Sis_regular_hyperslab(space) <= 0:
+            return None
+        pattern = numpy.empty((4, rank), dtype=numpy.uint64)
+        H5Sget_regular_hyperslab(space, <hsize_t*>PyArray_DATA(pattern),
+                                 (<hsize_t*>PyArray_DATA(pattern)) + rank,
+                                 (<hsize_t*>PyArray_DATA(pattern)) + 2*rank,
+                                 (<hsize_t*>PyArray_DATA(pattern)) + 3*rank)
+        return tuple(pattern.astype(numpy.int64))
+    ELSE:
+        return None
+
+
+# Runs of a selection are worked out about this many at a time
+DEF RUN_BATCH = 65536
+
+cdef enum run_kind:
+    RUNS_ALL,
+    RUNS_POINTS,
+    RUNS_REGULAR,
+    RUNS_BLOCKS
+
+cdef class SelectionRuns:
+
+    """
+        The runs of consecutive elements of a dataspace selection, in a
+        C-order buffer with the dataspace's extent, ordered the way
+        H5Diterate visits the selection: the order given for points, and C
+        order for hyperslabs.  Make one with selection_runs().
+
+        next_batch() lists them about RUN_BATCH at a time, so the runs of a
+        large selection are never all held in memory at once.  copy() uses
+        them to copy the selection a number of points at a time.
+    """
+
+    cdef hid_t space
+    cdef int rank
+    cdef run_kind kind
+    cdef hsize_t pos            # Next point, row or block to list
+    cdef hsize_t total          # Number of points, rows or blocks
+    cdef ndarray strides        # Flat offset of a step along each axis
+
+    # Regular hyperslabs: coordinates selected along each axis (just the
+    # start of each run along the last), and the length of every run
+    cdef list coords
+    cdef list outer
+    cdef object length
+
+    # Other hyperslabs: blocks sharing a range of the first axis whose rows
+    # are too many for one batch, and how far through that range we are
+    cdef object group
+    cdef hsize_t group_row
+
+    # Position of copy(): the batch of runs, the run, and the number of
+    # points of that run already copied
+    cdef ndarray starts
+    cdef ndarray lengths
+    cdef Py_ssize_t run
+    cdef hsize_t skip
+
+    cdef int init(self, hid_t space) except -1:
+
+        cdef ndarray dims
+
+        self.space = space
+        self.pos = 0
+        self.group = None
+        self.rank = H5Sget_simple_extent_ndims(space)
+
+        if H5Sget_select_type(space) == H5S_SEL_ALL or self.rank == 0:
+            self.kind = RUNS_ALL
+            self.total = 1
+            return 0
+
+        dims = numpy.empty((self.rank,), dtype=numpy.uint64)
+        H5Sget_simple_extent_dims(space, <hsize_t*>PyArray_DATA(dims), NULL)
+        dims = dims.astype(numpy.int64)
+        self.strides = numpy.ones((self.rank,), dtype=numpy.int64)
+        self.strides[:-1] = numpy.cumprod(dims[:0:-1])[::-1]
+
+        if H5Sget_select_type(space) == H5S_SEL_POINTS:
+            self.kind = RUNS_POINTS
+            self.total = H5Sget_select_elem_npoints(space)
+            return 0
+
+        pattern = regular_hyperslab(space, self.rank)
+        if pattern is not None:
+            # Regular hyperslabs are listed one element per block when the
+            # block size is 1, so work the rows out from the pattern instead.
+            # Along each axis the selected coordinates are the elements of
+            # "count" blocks, "stride" apart; the rows come out in C order.
+            self.kind = RUNS_REGULAR
+            start, stride, count, block = pattern
+            last = self.rank - 1
+            self.coords = [(s + numpy.arange(c)[:, None]*st + numpy.arange(b)[None, :]).ravel()
+                           for s, st, c, b in zip(start, stride, count, block)]
+            if stride[last] == block[last]:
+                # Blocks along the last axis touch, making a single row
+                self.coords[last] = self.coords[last][0:1]
+                self.length = count[last]*block[last]
+            else:
+                self.length = block[last]
+                self.coords[last] = self.coords[last][::block[last]]
+            self.outer = [len(x) for x in self.coords[:last]]
+            self.total = numpy.prod(self.outer, dtype=numpy.int64)
+            return 0
+
+        self.kind = RUNS_BLOCKS
+        self.total = H5Sget_select_hyper_nblocks(space)
+        return 0
+
+    cdef object next_batch(self):
+        # The next (starts, lengths) pair of int64 arrays, in elements, or
+        # None if every run has been listed
+
+        if self.kind == RUNS_ALL:
+            if self.pos == self.total:
+                return None
+            self.pos = self.total
+            starts = numpy.zeros((1,), dtype=numpy.int64)
+            lengths = numpy.array([H5Sget_select_npoints(self.space)], dtype=numpy.int64)
+            return starts, lengths
+
+        if self.pos == self.total and self.group is None:
+            return None
+
+        if self.kind == RUNS_POINTS:
+            starts, lengths = self.point_runs()
+        elif self.kind == RUNS_REGULAR:
+            starts, lengths = self.regular_runs()
+        else:
+            corners = None
+            if self.group is None:
+                corners, counts = self.next_blocks()
+            if corners is not None:
+                starts, lengths = block_runs(corners, counts, self.strides)
+            else:
+                starts, lengths = self.group_runs()
+        return join_runs(starts, lengths)
+
+    cdef int copy(self, size_t elsize, void* contig, void* noncontig,
+                  copy_dir op, hsize_t npoints) except -1:
+        # Copy the next npoints points of the selection between the
+        # contiguous buffer and noncontig, carrying on from the last call
+
+        cdef int64_t* pstarts
+        cdef int64_t* plengths
+        cdef hsize_t take
+        cdef char* contig_pos = <char*>contig
+        cdef char* noncontig_pos
+
+        while npoints > 0:
+            if self.starts is None or self.run == self.starts.shape[0]:
+                batch = self.next_batch()
+                if batch is None:
+                    raise RuntimeError("Selection has fewer points than expected")
+                self.starts, self.lengths = batch
+                self.run = 0
+                self.skip = 0
+            pstarts = <int64_t*>PyArray_DATA(self.starts)
+            plengths = <int64_t*>PyArray_DATA(self.lengths)
+
+            while npoints > 0 and self.run < self.starts.shape[0]:
+                take = min(<hsize_t>plengths[self.run] - self.skip, npoints)
+                noncontig_pos = (<char*>noncontig) + (pstarts[self.run] + self.skip)*elsize
+                if op == H5PY_SCATTER:
+                    memcpy(noncontig_pos, contig_pos, take*elsize)
+                else:
+                    memcpy(contig_pos, noncontig_pos, take*elsize)
+                contig_pos += take*elsize
+                npoints -= take
+                self.skip += take
+                if self.skip == <hsize_t>plengths[self.run]:
+                    self.run += 1
+                    self.skip = 0
+        return 0
+
+    cdef object save(self):
+        # The position of copy(), to go back to with restore()
+        return (self.pos, self.group, self.group_row, self.starts,
+                self.lengths, self.run, self.skip)
+
+    cdef int restore(self, object state) except -1:
+        (self.pos, self.group, self.group_row, self.starts,
+         self.lengths, self.run, self.skip) = state
+        return 0
+
+    cdef object point_runs(self):
+        # Runs for the next RUN_BATCH points
+
+        cdef hsize_t n = min(<hsize_t>RUN_BATCH, self.total - self.pos)
+        cdef ndarray points = numpy.empty((n, self.rank), dtype=numpy.uint64)
+
+        H5Sget_select_elem_pointlist(self.space, self.pos, n,
+                                     <hsize_t*>PyArray_DATA(points))
+        self.pos += n
+        starts = numpy.dot(points.astype(numpy.int64), self.strides)
+        return starts, numpy.ones((n,), dtype=numpy.int64)
+
+    cdef object regular_runs(self):
+        # Runs for the next rows of a regular hyperslab, about RUN_BATCH
+        # runs in all
+
+        cdef int axis
+        cdef int last = self.rank - 1
+        cdef hsize_t n
+
+        n = max(RUN_BATCH//len(self.coords[last]), 1)
+        n = min(n, self.total - self.pos)
+        rows = numpy.arange(self.pos, self.pos + n, dtype=numpy.int64)
+        self.pos += n
+
+        offsets = numpy.zeros((n,), dtype=numpy.int64)
+        for axis in xrange(last-1, -1, -1):
+            offsets += self.coords[axis][rows % self.outer[axis]]*self.strides[axis]
+            rows //= self.outer[axis]
+        starts = (offsets[:, None] + self.coords[last][None, :]*self.strides[last]).ravel()
+        lengths = numpy.empty((len(starts),), dtype=numpy.int64)
+        lengths.fill(self.length)
+        return starts, lengths
+
+    cdef object next_blocks(self):
+        # Take the next blocks from the block list, as (corners, counts)
+        # int64 arrays.  HDF5 lists the blocks of a hyperslab in C order of
+        # their first corners, and the rows of blocks only interleave when
+        # they share the same range of the first axis.  So we take whole
+        # groups of such blocks, with about RUN_BATCH rows in all.  A group
+        # with more rows than that is kept in self.group to be listed a
+        # range of its first axis at a time, and (None, None) returned.
+
+        cdef hsize_t n = min(<hsize_t>RUN_BATCH, self.total - self.pos)
+        cdef ndarray blocks
+
+        while True:
+            blocks = numpy.empty((n, 2, self.rank), dtype=numpy.uint64)
+            H5Sget_select_hyper_blocklist(self.space, self.pos, n,
+                                          <hsize_t*>PyArray_DATA(blocks))
+            blocks = blocks.astype(numpy.int64)
+
+            # Index of the first block of each group
+            bounds = numpy.flatnonzero((blocks[1:, 0, 0] != blocks[:-1, 0, 0]) |
+                                       (blocks[1:, 1, 0] != blocks[:-1, 1, 0])) + 1
+            if self.pos + n == self.total:
+                bounds = numpy.append(bounds, n)
+            if len(bounds) > 0:
+                break
+            # The last group may continue past the blocks we have
+            n = min(2*n, self.total - self.pos)
+
+        corners = blocks[:, 0, :]
+        counts = blocks[:, 1, :] - corners + 1
+        rows = numpy.cumsum(numpy.prod(counts[:, :-1], axis=1))
+        fit = bounds[rows[bounds-1] <= RUN_BATCH]
+
+        if len(fit) == 0:
+            n = bounds[0]
+            self.group = (corners[:n], counts[:n])
+            self.group_row = 0
+            self.pos += n
+            return None, None
+
+        n = fit[-1]
+        self.pos += n
+        return corners[:n], counts[:n]
+
+    cdef object group_runs(self):
+        # Runs for the next range of the first axis of self.group, about
+        # RUN_BATCH runs in all
+
+        cdef hsize_t n, nrows
+
+        corners, counts = self.group
+        nrows = counts[0, 0]
+        n = max(RUN_BATCH//numpy.sum(numpy.prod(counts[:, 1:-1], axis=1)), 1)
+        n = min(n, nrows - self.group_row)
+
+        corners = corners.copy()
+        counts = counts.copy()
+        corners[:, 0] += self.group_row
+        counts[:, 0] = n
+        self.group_row += n
+        if self.group_row == nrows:
+            self.group = None
+        return block_runs(corners, counts, self.strides)
+
+
+cdef SelectionRuns selection_runs(hid_t space):
+    # Runs of the point or hyperslab selection of a dataspace; see
+    # SelectionRuns
+    cdef SelectionRuns runs = SelectionRuns()
+    runs.init(space)
+    return runs
+
+
+cdef object block_runs(ndarray corners, ndarray counts, ndarray strides):
+    # Runs for the rows along the last axis of the blocks with the given
+    # corners and counts, in C order.  The rows of blocks sharing a range of
+    # the first axis interleave, so they are sorted.
+
+    cdef int axis
+    cdef int rank = strides.shape[0]
+    cdef Py_ssize_t n = corners.shape[0]
+
+    nrows = numpy.prod(counts[:, :-1], axis=1)
+    block = numpy.repeat(numpy.arange(n), nrows)
+    row = numpy.arange(len(block)) - numpy.repeat(numpy.cumsum(nrows) - nrows, nrows)
+
+    starts = numpy.dot(corners, strides)[block]
+    for axis in xrange(rank-2, -1, -1):
+        count = counts[block, axis]
+        starts += (row % count)*strides[axis]
+        row //= count
+    lengths = counts[block, rank-1]
+
+    if n > 1:
+        order = numpy.argsort(starts, kind='mergesort')
+        starts = starts[order]
+        lengths = lengths[order]
+    return starts, lengths
+
+
+cdef object join_runs(starts, lengths):
+    # Join runs which follow on from each other, returning contiguous int64
+    # arrays
+    if len(starts) > 1:
+        first = numpy.ones((len(starts),), dtype=bool)
+        first[1:] = starts[1:] != starts[:-1] + lengths[:-1]
+        if not first.all():
+            where = numpy.flatnonzero(first)
+            starts = starts[where]
+            lengths = numpy.add.reduceat(lengths, where)
+
+    return numpy.ascontiguousarray(starts, dtype=numpy.int64), \
+           numpy.ascontiguousarray(lengths, dtype=numpy.int64)
 
 # =============================================================================
 # VLEN support routines
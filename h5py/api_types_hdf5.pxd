@@ -76,6 +76,9 @@ cdef extern from "hdf5.h":
   ctypedef  herr_t (*H5D_operator_t)(void *elem, hid_t type_id, unsigned ndim,
                     hsize_t *point, void *operator_data) except -1
 
+  ctypedef int (*H5D_chunk_iter_op_t)(const hsize_t *offset, unsigned filter_mask,
+                    haddr_t addr, hsize_t size, void *op_data) except 2
+
 # === H5F - File API ==========================================================
 
   # File constants
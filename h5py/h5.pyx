@@ -10,7 +10,7 @@
 include "config.pxi"
 
 from defs cimport *
-from ._objects import phil, with_phil
+from ._objects import phil, with_phil, get_per_file_locking, set_per_file_locking
 
 ITER_INC    = H5_ITER_INC     # Increasing order
 ITER_DEC    = H5_ITER_DEC     # Decreasing order
@@ -127,6 +127,26 @@ cdef class H5PYConfig:
             ELSE:
                 return False
                 
+    property per_file_locking:
+        """ Boolean indicating if dataset I/O is serialized per file.
+
+        By default, a single global lock serializes all access to HDF5.
+        With a thread-safe build of HDF5, setting this to True lets reads
+        and writes on unrelated files proceed concurrently.  Set it before
+        opening any files.
+
+        Reads, writes and Dataset.resize() on the same file are still
+        serialized, and so are the resize-and-write steps of
+        Dataset.appender() and Dataset.async_writer().  But the global lock
+        is released during I/O, so holding it (h5py._objects.phil) no longer
+        makes a sequence of calls including reads or writes atomic.
+        """
+        def __get__(self):
+            return get_per_file_locking()
+
+        def __set__(self, val):
+            set_per_file_locking(bool(val))
+
     property swmr_min_hdf5_version:
         """ Tuple indicating the minimum HDF5 version required for SWMR features"""
         def __get__(self):
@@ -10,7 +10,12 @@
 from defs cimport *
 
 from _objects cimport ObjectID
+from h5t cimport TypeID
 
 cdef class DatasetID(ObjectID):
     cdef object _dtype
+    cdef dict _rw_plans
+
+    cdef int _rw_plan(self, TypeID mtype, int read) except -1
+    cdef void _invalidated(self)
 
@@ -16,11 +16,16 @@ include "config.pxi"
 from _objects cimport pdefault
 from numpy cimport ndarray, import_array, PyArray_DATA, NPY_WRITEABLE
 from utils cimport  check_numpy_read, check_numpy_write, \
-                    convert_tuple, emalloc, efree
+                    convert_tuple, convert_dims, emalloc, efree
 from h5t cimport TypeID, typewrap, py_create
 from h5s cimport SpaceID
 from h5p cimport PropID, propwrap
-from _proxy cimport dset_rw
+from _proxy cimport dset_rw, dset_rw_plan
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, \
+                            PyBUF_ANY_CONTIGUOUS
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
+
+from collections import namedtuple
 
 from h5py import _objects
 from ._objects import phil, with_phil
@@ -51,6 +56,36 @@ FILL_VALUE_UNDEFINED    = H5D_FILL_VALUE_UNDEFINED
 FILL_VALUE_DEFAULT      = H5D_FILL_VALUE_DEFAULT
 FILL_VALUE_USER_DEFINED = H5D_FILL_VALUE_USER_DEFINED
 
+# Location of a stored chunk; see DatasetID.get_chunk_info
+StoreInfo = namedtuple('StoreInfo',
+                       'chunk_offset, filter_mask, byte_offset, size')
+
+
+# === Chunk iteration =========================================================
+
+cdef class _ChunkVisitor:
+
+    cdef object func
+    cdef object retval
+    cdef int rank
+
+    def __init__(self, func):
+        self.func = func
+        self.retval = None
+
+cdef int cb_chunk_iter(const hsize_t *offset, unsigned filter_mask, haddr_t addr,
+                       hsize_t size, void *data) except 2:
+
+    cdef _ChunkVisitor visit = <_ChunkVisitor>data
+
+    info = StoreInfo(convert_dims(<hsize_t*>offset, <hsize_t>visit.rank), filter_mask,
+                     None if addr == HADDR_UNDEF else addr, size)
+    visit.retval = visit.func(info)
+
+    if visit.retval is not None:
+        return 1
+    return 0
+
 
 # === Dataset operations ======================================================
 
@@ -137,6 +172,34 @@ cdef class DatasetID(ObjectID):
                 return sid.get_simple_extent_ndims()
 
 
+    cdef int _rw_plan(self, TypeID mtype, int read) except -1:
+        # How dset_rw must transfer data with this memory type.  The dataset
+        # type can't change, so the plan is kept for each memory type used.
+        # An identifier doesn't pin down a type: unlocked types can be
+        # modified, and identifiers reused once closed.  So a copy of the
+        # type is kept with the plan, and it is only used for a type which
+        # is still equal to that copy.
+        cdef int plan
+        cdef TypeID saved
+        if self._rw_plans is None:
+            self._rw_plans = {}
+        key = (mtype.id, read)
+        entry = self._rw_plans.get(key)
+        if entry is not None:
+            saved = entry[0]
+            if H5Tequal(saved.id, mtype.id):
+                return entry[1]
+        plan = dset_rw_plan(self.id, mtype.id, read)
+        if len(self._rw_plans) >= 16:
+            self._rw_plans.clear()
+        self._rw_plans[key] = (mtype.copy(), plan)
+        return plan
+
+    cdef void _invalidated(self):
+        # The saved memory types would otherwise live as long as this object
+        self._rw_plans = None
+
+
     @with_phil
     def read(self, SpaceID mspace not None, SpaceID fspace not None,
                    ndarray arr_obj not None, TypeID mtype=None,
@@ -162,6 +225,7 @@ cdef class DatasetID(ObjectID):
         cdef hid_t self_id, mtype_id, mspace_id, fspace_id, plist_id
         cdef void* data
         cdef int oldflags
+        cdef int plan
 
         if mtype is None:
             mtype = py_create(arr_obj.dtype)
@@ -173,8 +237,10 @@ cdef class DatasetID(ObjectID):
         fspace_id = fspace.id
         plist_id = pdefault(dxpl)
         data = PyArray_DATA(arr_obj)
+        plan = self._rw_plan(mtype, 1)
 
-        dset_rw(self_id, mtype_id, mspace_id, fspace_id, plist_id, data, 1)
+        with _objects.file_io(self):
+            dset_rw(self_id, mtype_id, mspace_id, fspace_id, plist_id, data, 1, plan)
 
 
     @with_phil
@@ -202,6 +268,7 @@ cdef class DatasetID(ObjectID):
         cdef hid_t self_id, mtype_id, mspace_id, fspace_id, plist_id
         cdef void* data
         cdef int oldflags
+        cdef int plan
 
         if mtype is None:
             mtype = py_create(arr_obj.dtype)
@@ -213,8 +280,10 @@ cdef class DatasetID(ObjectID):
         fspace_id = fspace.id
         plist_id = pdefault(dxpl)
         data = PyArray_DATA(arr_obj)
+        plan = self._rw_plan(mtype, 0)
 
-        dset_rw(self_id, mtype_id, mspace_id, fspace_id, plist_id, data, 0)
+        with _objects.file_io(self):
+            dset_rw(self_id, mtype_id, mspace_id, fspace_id, plist_id, data, 0, plan)
 
 
     @with_phil
@@ -353,7 +422,243 @@ cdef class DatasetID(ObjectID):
             may even be zero.
         """
         return H5Dget_storage_size(self.id)
-        
+
+
+    IF HDF5_VERSION >= (1, 10, 5):
+
+        @with_phil
+        def get_num_chunks(self, SpaceID space=None):
+            """ (SpaceID space=None) => INT num_chunks
+
+            Get the number of chunks with allocated storage which intersect
+            the selection in the given dataspace (by default, the whole
+            dataset).  Some versions of HDF5 ignore the selection and
+            always count every allocated chunk.
+
+            Feature requires: 1.10.5 HDF5
+            """
+            cdef hsize_t num_chunks
+
+            if space is None:
+                space = self.get_space()
+            H5Dget_num_chunks(self.id, space.id, &num_chunks)
+            return num_chunks
+
+
+        @with_phil
+        def get_chunk_info(self, hsize_t index, SpaceID space=None):
+            """ (INT index, SpaceID space=None) => StoreInfo
+
+            Get the location of the index'th allocated chunk intersecting
+            the selection in the given dataspace (by default, the whole
+            dataset).  Returns a namedtuple with fields:
+
+            chunk_offset
+                Logical position of the chunk's first element
+            filter_mask
+                Bit mask of filters skipped for this chunk
+            byte_offset
+                Offset of the chunk in the file, in bytes
+            size
+                Size of the stored (i.e. compressed) chunk, in bytes
+
+            Feature requires: 1.10.5 HDF5
+            """
+            cdef hid_t dspace_id = 0
+            cdef int rank
+            cdef hsize_t *offset = NULL
+            cdef unsigned int filter_mask
+            cdef haddr_t addr
+            cdef hsize_t size
+
+            try:
+                dspace_id = H5Dget_space(self.id)
+                rank = H5Sget_simple_extent_ndims(dspace_id)
+                offset = <hsize_t*>emalloc(sizeof(hsize_t)*rank)
+
+                if space is None:
+                    space = self.get_space()
+                H5Dget_chunk_info(self.id, space.id, index, offset,
+                                  &filter_mask, &addr, &size)
+                return StoreInfo(convert_dims(offset, <hsize_t>rank),
+                                 filter_mask,
+                                 None if addr == HADDR_UNDEF else addr,
+                                 size)
+            finally:
+                efree(offset)
+                if dspace_id:
+                    H5Sclose(dspace_id)
+
+
+        @with_phil
+        def get_chunk_info_by_coord(self, offsets):
+            """ (TUPLE offsets) => StoreInfo
+
+            Get the location of the chunk whose first element is at the given
+            logical position.  For unallocated chunks, byte_offset is None
+            and size is 0.  See get_chunk_info.
+
+            Feature requires: 1.10.5 HDF5
+            """
+            cdef hid_t dspace_id = 0
+            cdef int rank
+            cdef hsize_t *offset = NULL
+            cdef unsigned int filter_mask = 0
+            cdef haddr_t addr
+            cdef hsize_t size
+
+            try:
+                dspace_id = H5Dget_space(self.id)
+                rank = H5Sget_simple_extent_ndims(dspace_id)
+
+                if len(offsets) != rank:
+                    raise TypeError("offset length (%d) must match dataset rank (%d)" % (len(offsets), rank))
+
+                offset = <hsize_t*>emalloc(sizeof(hsize_t)*rank)
+                convert_tuple(offsets, offset, rank)
+
+                H5Dget_chunk_info_by_coord(self.id, offset, &filter_mask,
+                                           &addr, &size)
+                if addr == HADDR_UNDEF:
+                    return StoreInfo(tuple(offsets), 0, None, 0)
+                return StoreInfo(tuple(offsets), filter_mask, addr, size)
+            finally:
+                efree(offset)
+                if dspace_id:
+                    H5Sclose(dspace_id)
+
+
+    IF HDF5_VERSION >= (1, 12, 3):
+
+        @with_phil
+        def chunk_iter(self, object func):
+            """ (CALLABLE func) => <Return value from func>
+
+            Call func(StoreInfo) for every allocated chunk, in the order of
+            the chunk index, with a single pass over the index.  This is
+            much faster than calling get_chunk_info() for each chunk, which
+            has to search the index from the start every time.  If func
+            returns anything other than None, iteration stops and that
+            value is returned.  See get_chunk_info.
+
+            Feature requires: 1.12.3 HDF5
+            """
+            cdef _ChunkVisitor visit = _ChunkVisitor(func)
+            visit.rank = self.rank
+            H5Dchunk_iter(self.id, H5P_DEFAULT,
+                          <H5D_chunk_iter_op_t>cb_chunk_iter, <void*>visit)
+            return visit.retval
+
+
+    IF HDF5_VERSION >= (1, 8, 11):
+
+        @with_phil
+        def write_direct_chunk(self, offsets, data, uint32_t filter_mask=0,
+                               PropID dxpl=None):
+            """ (TUPLE offsets, BUFFER data, UINT filter_mask=0,
+                PropDXID dxpl=None)
+
+            Write a chunk straight to the file, bypassing the type conversion
+            and filter pipelines.  Offsets give the logical position of the
+            first element of the chunk, and must be a multiple of the chunk
+            shape.  Data must be a contiguous buffer holding the chunk exactly
+            as it should appear on disk, i.e. already compressed.
+
+            Bits set in filter_mask mark filters in the pipeline which have
+            been *skipped* for this chunk; the default (0) means all of them
+            were applied.
+
+            Feature requires: 1.8.11 HDF5
+            """
+            cdef hid_t space_id = 0
+            cdef int rank
+            cdef hsize_t *offset = NULL
+            cdef Py_buffer view
+
+            try:
+                space_id = H5Dget_space(self.id)
+                rank = H5Sget_simple_extent_ndims(space_id)
+
+                if len(offsets) != rank:
+                    raise TypeError("offset length (%d) must match dataset rank (%d)" % (len(offsets), rank))
+
+                offset = <hsize_t*>emalloc(sizeof(hsize_t)*rank)
+                convert_tuple(offsets, offset, rank)
+
+                PyObject_GetBuffer(data, &view, PyBUF_ANY_CONTIGUOUS)
+                try:
+                    H5DOwrite_chunk(self.id, pdefault(dxpl), filter_mask,
+                                    offset, <size_t>view.len, view.buf)
+                finally:
+                    PyBuffer_Release(&view)
+            finally:
+                efree(offset)
+                if space_id:
+                    H5Sclose(space_id)
+
+
+    IF HDF5_VERSION >= (1, 10, 2):
+
+        @with_phil
+        def read_direct_chunk(self, offsets, PropID dxpl=None):
+            """ (TUPLE offsets, PropDXID dxpl=None) => (UINT filter_mask, BYTES data)
+
+            Read a chunk straight from the file, bypassing the type conversion
+            and filter pipelines.  Offsets give the logical position of the
+            first element of the chunk, and must be a multiple of the chunk
+            shape.  Returns the chunk exactly as stored on disk, along with
+            its filter mask (see write_direct_chunk).
+
+            Raises KeyError if no storage has been allocated for the chunk.
+
+            Feature requires: 1.10.2 HDF5
+            """
+            cdef hid_t space_id = 0
+            cdef int rank
+            cdef hsize_t *offset = NULL
+            cdef hsize_t chunk_bytes
+            cdef uint32_t filter_mask = 0
+            cdef uint32_t read_mask = 0
+            cdef unsigned int mask
+            cdef haddr_t addr
+            cdef bytes data
+
+            try:
+                space_id = H5Dget_space(self.id)
+                rank = H5Sget_simple_extent_ndims(space_id)
+
+                if len(offsets) != rank:
+                    raise TypeError("offset length (%d) must match dataset rank (%d)" % (len(offsets), rank))
+
+                offset = <hsize_t*>emalloc(sizeof(hsize_t)*rank)
+                convert_tuple(offsets, offset, rank)
+
+                IF HDF5_VERSION >= (1, 10, 5):
+                    H5Dget_chunk_info_by_coord(self.id, offset, &mask,
+                                               &addr, &chunk_bytes)
+                    if addr == HADDR_UNDEF:
+                        chunk_bytes = 0
+                    # Some versions of H5DOread_chunk report a stale filter
+                    # mask for chunks written in the same session
+                    filter_mask = mask
+                ELSE:
+                    H5Dget_chunk_storage_size(self.id, offset, &chunk_bytes)
+                if chunk_bytes == 0:
+                    raise KeyError("No storage allocated for chunk at %s" % (tuple(offsets),))
+
+                data = PyBytes_FromStringAndSize(NULL, <Py_ssize_t>chunk_bytes)
+                H5DOread_chunk(self.id, pdefault(dxpl), offset, &read_mask,
+                               PyBytes_AS_STRING(data))
+                IF HDF5_VERSION < (1, 10, 5):
+                    filter_mask = read_mask
+            finally:
+                efree(offset)
+                if space_id:
+                    H5Sclose(space_id)
+
+            return filter_mask, data
+
+
     IF HDF5_VERSION >= SWMR_MIN_HDF5_VERSION:
 
         @with_phil
@@ -11,6 +11,8 @@
     Low-level interface to the "H5S" family of data-space functions.
 """
 
+include "config.pxi"
+
 # Pyrex compile-time imports
 from utils cimport  require_tuple, convert_dims, convert_tuple, \
                     emalloc, efree, create_numpy_hsize, create_hsize_array
@@ -573,6 +575,88 @@ cdef class SpaceID(ObjectID):
             efree(block_array)
 
 
+    @with_phil
+    def select_hyperslabs(self, object start, object count, object stride=None):
+        """(ARRAY start, ARRAY count, ARRAY stride=None)
+
+        Select the union of many hyperslabs, replacing the current
+        selection.  Row i of each array, of shape (<nslabs>, <space rank>),
+        gives the start, count and stride of hyperslab i.
+
+        Building a selection with one select_hyperslab(op=SELECT_OR) call
+        per hyperslab takes time quadratic in their number.  With HDF5
+        1.10.7 or later they are instead merged pairwise, which doesn't.
+        """
+        cdef int rank
+        cdef size_t nslabs, i, j, n
+        cdef ndarray hstart, hcount, hstride
+        cdef hsize_t* stride_ptr = NULL
+        cdef hid_t* spaces = NULL
+        cdef hid_t merged
+
+        rank = H5Sget_simple_extent_ndims(self.id)
+        hstart = create_hsize_array(start)
+        hcount = create_hsize_array(count)
+        for arr in (hstart, hcount):
+            if arr.nd != 2 or arr.dimensions[1] != rank:
+                raise ValueError("Arrays must have shape (<nslabs>, %d)" % rank)
+        nslabs = hstart.dimensions[0]
+        if hcount.dimensions[0] != nslabs:
+            raise ValueError("Start and count arrays must have the same shape")
+        if stride is not None:
+            hstride = create_hsize_array(stride)
+            if hstride.nd != 2 or hstride.dimensions[0] != nslabs or \
+              hstride.dimensions[1] != rank:
+                raise ValueError("Start and stride arrays must have the same shape")
+
+        H5Sselect_none(self.id)
+        if nslabs == 0:
+            return
+
+        IF HDF5_VERSION >= (1, 10, 7):
+            # Select each hyperslab in a copy of this (now empty) dataspace,
+            # then merge neighbours until one is left
+            spaces = <hid_t*>emalloc(sizeof(hid_t)*nslabs)
+            n = 0
+            try:
+                for i from 0<=i<nslabs:
+                    if stride is not None:
+                        stride_ptr = <hsize_t*>hstride.data + i*rank
+                    spaces[i] = H5Scopy(self.id)
+                    n += 1
+                    H5Sselect_hyperslab(spaces[i], H5S_SELECT_SET,
+                                        <hsize_t*>hstart.data + i*rank, stride_ptr,
+                                        <hsize_t*>hcount.data + i*rank, NULL)
+                while n > 1:
+                    j = 0
+                    for i from 0<=i<n by 2:
+                        if i+1 < n:
+                            merged = H5Scombine_select(spaces[i], H5S_SELECT_OR, spaces[i+1])
+                            H5Sclose(spaces[i])
+                            spaces[i] = -1
+                            H5Sclose(spaces[i+1])
+                            spaces[i+1] = -1
+                            spaces[j] = merged
+                        else:
+                            spaces[j] = spaces[i]
+                            spaces[i] = -1
+                        j += 1
+                    n = j
+                H5Sselect_copy(self.id, spaces[0])
+            finally:
+                for i from 0<=i<nslabs:
+                    if i < n and spaces[i] > 0:
+                        H5Sclose(spaces[i])
+                efree(spaces)
+        ELSE:
+            for i from 0<=i<nslabs:
+                if stride is not None:
+                    stride_ptr = <hsize_t*>hstride.data + i*rank
+                H5Sselect_hyperslab(self.id, H5S_SELECT_OR,
+                                    <hsize_t*>hstart.data + i*rank, stride_ptr,
+                                    <hsize_t*>hcount.data + i*rank, NULL)
+
+
 
 
 
@@ -11,8 +11,20 @@
     Filter API and constants.
 """
 
+from libc.stdlib cimport malloc, free
+from libc.errno cimport errno, E2BIG
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, \
+                            PyBUF_ANY_CONTIGUOUS
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
 from ._objects import phil, with_phil
 
+cdef extern from "lzf/lzf.h":
+    unsigned int c_lzf_compress "lzf_compress" (const void *in_data,
+        unsigned int in_len, void *out_data, unsigned int out_len) nogil
+    unsigned int c_lzf_decompress "lzf_decompress" (const void *in_data,
+        unsigned int in_len, void *out_data, unsigned int out_len) nogil
+
 
 # === Public constants and data structures ====================================
 
@@ -99,10 +111,80 @@ def _register_lzf():
     register_lzf()
 
 
+# === LZF codec ===============================================================
+#
+# The compressor behind the LZF filter, for code which (de)compresses chunks
+# itself rather than going through the HDF5 filter pipeline.  The GIL is
+# released while the actual work is done.
 
+def lzf_compress(data):
+    """(BUFFER data) => BYTES
 
-
-
-
-
-
+    Compress a buffer with LZF, in the format read by the LZF filter.
+    Unlike the filter, which stores incompressible chunks uncompressed,
+    this always compresses; the result may be slightly larger than the
+    input.
+    """
+    cdef Py_buffer view
+    cdef void* outbuf = NULL
+    cdef size_t outbuf_size
+    cdef unsigned int status = 0
+
+    PyObject_GetBuffer(data, &view, PyBUF_ANY_CONTIGUOUS)
+    try:
+        if view.len == 0:
+            return b''
+        # Worst case for incompressible input
+        outbuf_size = view.len + view.len//32 + 16
+        outbuf = malloc(outbuf_size)
+        if outbuf == NULL:
+            raise MemoryError("Can't allocate compression buffer")
+        with nogil:
+            status = c_lzf_compress(view.buf, <unsigned int>view.len,
+                                    outbuf, <unsigned int>outbuf_size)
+        if status == 0:
+            raise ValueError("LZF compression failed")
+        return PyBytes_FromStringAndSize(<char*>outbuf, status)
+    finally:
+        free(outbuf)
+        PyBuffer_Release(&view)
+
+
+def lzf_decompress(data, size_t size=0):
+    """(BUFFER data, UINT size=0) => BYTES
+
+    Decompress a buffer produced by the LZF filter.  Size is a guess at
+    the decompressed size; the output buffer is grown if it's too small.
+    """
+    cdef Py_buffer view
+    cdef void* outbuf = NULL
+    cdef size_t outbuf_size
+    cdef unsigned int status = 0
+    cdef int err = 0
+
+    PyObject_GetBuffer(data, &view, PyBUF_ANY_CONTIGUOUS)
+    try:
+        if view.len == 0:
+            return b''
+        outbuf_size = size if size > 0 else view.len
+
+        while not status:
+            free(outbuf)
+            outbuf = malloc(outbuf_size)
+            if outbuf == NULL:
+                raise MemoryError("Can't allocate decompression buffer")
+            with nogil:
+                status = c_lzf_decompress(view.buf, <unsigned int>view.len,
+                                          outbuf, <unsigned int>outbuf_size)
+                if not status:
+                    err = errno
+            if not status:
+                if err == E2BIG:
+                    outbuf_size += view.len
+                else:
+                    raise ValueError("Invalid data for LZF decompression")
+
+        return PyBytes_FromStringAndSize(<char*>outbuf, status)
+    finally:
+        free(outbuf)
+        PyBuffer_Release(&view)
@@ -332,8 +332,6 @@ class Test1DFloat(TestCase):
             self.dset[None]
             
     # FIXME: NumPy raises IndexError
-    # Also this currently raises UnboundLocalError. :(
-    @ut.expectedFailure
     def test_index_illegal(self):
         """ Illegal slicing argument """
         with self.assertRaises(TypeError):
@@ -347,8 +345,17 @@ class Test1DFloat(TestCase):
     def test_indexlist_simple(self):
         self.assertNumpyBehavior(self.dset, self.data, np.s_[[1,2,5]])
         
-    # Another UnboundLocalError
-    @ut.expectedFailure
+    def test_indexlist_strided(self):
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[[0,2,4,6,7,8,9]])
+
+    def test_indexlist_negative(self):
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[[0,3,-2]])
+
+    def test_boollist(self):
+        """ Lists of bools are masks, as in NumPy """
+        mask = [x % 3 == 0 for x in range(13)]
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[mask])
+
     def test_indexlist_empty(self):
         self.assertNumpyBehavior(self.dset, self.data, np.s_[[]])
          
@@ -358,17 +365,13 @@ class Test1DFloat(TestCase):
             self.dset[[100]]
                 
     def test_indexlist_nonmonotonic(self):
-        """ we require index list values to be strictly increasing """
-        with self.assertRaises(TypeError):
-            self.dset[[1,3,2]]
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[[1,3,2]])
         
-    # This results in IOError as the argument is not properly validated.
-    # Suggest IndexError be raised.
-    @ut.expectedFailure
     def test_indexlist_repeated(self):
-        """ we forbid repeated index values """
-        with self.assertRaises(TypeError):
-            self.dset[[1,1,2]]
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[[1,1,2]])
+
+    def test_indexlist_shuffled(self):
+        self.assertNumpyBehavior(self.dset, self.data, np.s_[[9,0,5,5,-1,3,0]])
             
     def test_mask_true(self):
         self.assertNumpyBehavior(self.dset, self.data, np.s_[self.data > -100])
@@ -398,7 +401,6 @@ class Test2DZeroFloat(TestCase):
         self.data = np.ones((0,3), dtype='f')
         self.dset = self.f.create_dataset('x', data=self.data)
         
-    @ut.expectedFailure
     def test_indexlist(self):
         """ see issue #473 """
         self.assertNumpyBehavior(self.dset, self.data, np.s_[:,[0,1,2]])
@@ -14,6 +14,8 @@
 from __future__ import absolute_import
 
 import threading
+
+import numpy as np
 import h5py
 
 from ..common import ut, TestCase
@@ -59,3 +61,140 @@ class TestErrorPrinting(TestCase):
         th = threading.Thread(target=test)
         th.start()
         th.join()
+
+
+class TestConcurrentRead(TestCase):
+
+    """
+        Reads release the GIL but remain serialized by the global lock.
+    """
+
+    def test_concurrent_read(self):
+        """ Simultaneous reads from several threads return correct data """
+        data = np.arange(100000, dtype='f8').reshape((1000, 100))
+        dset = self.f.create_dataset('x', data=data)
+        results = {}
+
+        def read(idx):
+            results[idx] = dset[idx*100:(idx+1)*100]
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(10)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        for idx in range(10):
+            self.assertArrayEqual(results[idx], data[idx*100:(idx+1)*100])
+
+    def test_concurrent_vlen_read(self):
+        """ Type conversion callbacks work from threads without the GIL """
+        dt = h5py.special_dtype(vlen=bytes)
+        data = np.array([b'a'*i for i in range(100)], dtype=object)
+        dset = self.f.create_dataset('x', data=data, dtype=dt)
+        results = {}
+
+        def read(idx):
+            results[idx] = dset[...]
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        for idx in range(4):
+            self.assertEqual(list(results[idx]), list(data))
+
+
+class TestPerFileLocking(TestCase):
+
+    """
+        Feature: Dataset I/O may be serialized per file on thread-safe builds
+    """
+
+    def setUp(self):
+        TestCase.setUp(self)
+        self.config = h5py.get_config()
+        try:
+            self.config.per_file_locking = True
+        except RuntimeError:
+            self.f.close()
+            self.skipTest("HDF5 library is not thread-safe")
+
+    def tearDown(self):
+        self.config.per_file_locking = False
+        TestCase.tearDown(self)
+
+    def test_enabled(self):
+        """ Setting is reflected by the config object """
+        self.assertTrue(self.config.per_file_locking)
+
+    def test_separate_files(self):
+        """ Concurrent reads from separate files return correct data """
+        files = [h5py.File(self.mktemp(), 'w') for i in range(4)]
+        data = np.arange(10000, dtype='i4')
+        results = {}
+
+        def read(idx):
+            dset = files[idx].create_dataset('x', data=data+idx)
+            results[idx] = dset[...]
+
+        try:
+            threads = [threading.Thread(target=read, args=(i,)) for i in range(4)]
+            for th in threads:
+                th.start()
+            for th in threads:
+                th.join()
+        finally:
+            for f in files:
+                f.close()
+
+        for idx in range(4):
+            self.assertArrayEqual(results[idx], data+idx)
+
+    def test_same_dataset(self):
+        """ Concurrent slicing of one dataset returns correct data """
+        data = np.arange(100000, dtype='f8').reshape((1000, 100))
+        dset = self.f.create_dataset('x', data=data)
+        results = {}
+
+        def read(idx):
+            results[idx] = [dset[idx*100:(idx+1)*100, j] for j in range(100)]
+
+        threads = [threading.Thread(target=read, args=(i,)) for i in range(10)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        for idx in range(10):
+            for j in range(100):
+                self.assertArrayEqual(results[idx][j], data[idx*100:(idx+1)*100, j])
+
+    def test_append_and_resize(self):
+        """ Appends stay consistent while other threads resize and write """
+        dset = self.f.create_dataset('x', (0, 10), 'i4', chunks=(4, 10),
+                                     maxshape=(None, 10))
+        other = self.f.create_dataset('y', (0, 10), 'i4', chunks=(4, 10),
+                                      maxshape=(None, 10))
+
+        def append():
+            with dset.appender(buffer_rows=4) as app:
+                for idx in range(500):
+                    app.append(np.full(10, idx, dtype='i4'))
+
+        def grow():
+            for idx in range(500):
+                other.resize(idx+1, axis=0)
+                other[idx] = idx
+
+        threads = [threading.Thread(target=append), threading.Thread(target=grow)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        expected = np.repeat(np.arange(500, dtype='i4'), 10).reshape((500, 10))
+        self.assertArrayEqual(dset[...], expected)
+        self.assertArrayEqual(other[...], expected)
@@ -18,6 +18,7 @@
 
 from __future__ import absolute_import
 
+import os
 import sys
 
 import six
@@ -26,7 +27,7 @@ import numpy as np
 
 from .common import ut, TestCase
 from h5py.highlevel import File, Group, Dataset
-from h5py import h5t
+from h5py import h5t, h5s, _proxy
 import h5py
 
 
@@ -650,6 +651,938 @@ class TestIter(BaseDataset):
         with self.assertRaises(TypeError):
             [x for x in dset]
 
+    def test_iter_1d(self):
+        """ Iterating over a 1D dataset yields scalars """
+        data = np.arange(10, dtype='f')
+        dset = self.f.create_dataset('foo', data=data)
+        self.assertEqual(list(dset), list(data))
+
+    def test_iter_rows_block(self):
+        """ Block size doesn't change the rows yielded """
+        data = np.arange(300, dtype='i').reshape((100, 3))
+        dset = self.f.create_dataset('foo', data=data, chunks=(7, 3))
+        for block_rows in (None, 1, 13, 100, 1000):
+            out = np.array(list(dset.iter_rows(block_rows)))
+            self.assertArrayEqual(out, data)
+
+    def test_iter_rows_prefetch(self):
+        """ Prefetching iteration yields all rows in order """
+        data = np.arange(300, dtype='i').reshape((100, 3))
+        dset = self.f.create_dataset('foo', data=data)
+        out = np.array(list(dset.iter_rows(9, prefetch=True)))
+        self.assertArrayEqual(out, data)
+
+    def test_iter_rows_prefetch_astype(self):
+        """ Prefetching honors astype() """
+        data = np.arange(30, dtype='i').reshape((10, 3))
+        dset = self.f.create_dataset('foo', data=data)
+        with dset.astype('f8'):
+            rows = list(dset.iter_rows(4, prefetch=True))
+        self.assertEqual(rows[0].dtype, np.dtype('f8'))
+        self.assertArrayEqual(np.array(rows), data.astype('f8'))
+
+    def test_iter_rows_empty(self):
+        """ Iterating over a zero-length axis yields nothing """
+        dset = self.f.create_dataset('foo', (0, 3), maxshape=(None, 3))
+        self.assertEqual(list(dset), [])
+
+
+class TestIterChunks(BaseDataset):
+
+    """
+        Feature: Chunked datasets can be traversed chunk by chunk
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.data = np.arange(100*30, dtype='i4').reshape((100, 30))
+        self.dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 8))
+
+    def test_chunks(self):
+        """ iter_chunks() yields the chunk grid in C order, clipped to shape """
+        slices = list(self.dset.iter_chunks())
+        self.assertEqual(len(slices), 4*4)
+        self.assertEqual(slices[0], (slice(0, 32), slice(0, 8)))
+        self.assertEqual(slices[3], (slice(0, 32), slice(24, 30)))
+        self.assertEqual(slices[-1], (slice(96, 100), slice(24, 30)))
+
+    def test_chunks_sel(self):
+        """ iter_chunks() clips chunks to the selection """
+        slices = list(self.dset.iter_chunks(np.s_[30:40, 5]))
+        self.assertEqual(slices, [(slice(30, 32), slice(5, 6)),
+                                  (slice(32, 40), slice(5, 6))])
+
+    def test_chunks_cover(self):
+        """ Chunk slices exactly cover the selection """
+        out = np.zeros(self.data.shape, dtype='i4')
+        for slices in self.dset.iter_chunks(np.s_[10:90, 3:]):
+            out[slices] += 1
+        expected = np.zeros(self.data.shape, dtype='i4')
+        expected[10:90, 3:] = 1
+        self.assertArrayEqual(out, expected)
+
+    def test_chunks_empty(self):
+        """ Empty selection yields no chunks """
+        self.assertEqual(list(self.dset.iter_chunks(np.s_[10:10])), [])
+
+    def test_blocks(self):
+        """ iter_blocks() yields the data selected by each chunk slice """
+        out = np.zeros(self.data.shape, dtype='i4')
+        for slices, block in self.dset.iter_blocks():
+            self.assertArrayEqual(block, self.data[slices])
+            out[slices] = block
+        self.assertArrayEqual(out, self.data)
+
+    def test_not_chunked(self):
+        """ Contiguous datasets raise TypeError """
+        dset = self.f.create_dataset('bar', data=self.data)
+        with self.assertRaises(TypeError):
+            dset.iter_chunks()
+        with self.assertRaises(TypeError):
+            dset.iter_blocks()
+
+    def test_step(self):
+        """ Non-unit steps raise ValueError """
+        with self.assertRaises(ValueError):
+            self.dset.iter_chunks(np.s_[::2])
+
+
+class TestMemmap(BaseDataset):
+
+    """
+        Feature: Contiguous datasets can be memory-mapped
+    """
+
+    def test_memmap(self):
+        """ as_memmap() returns a read-only map of the data """
+        data = np.arange(100, dtype='f8').reshape((10, 10))
+        dset = self.f.create_dataset('foo', data=data)
+        arr = dset.as_memmap()
+        self.assertIsInstance(arr, np.memmap)
+        self.assertArrayEqual(arr, data)
+        with self.assertRaises(ValueError):
+            arr[0, 0] = 1
+
+    def test_byteorder(self):
+        """ Byte order of the file type is preserved """
+        data = np.arange(10, dtype='>i4')
+        dset = self.f.create_dataset('foo', data=data)
+        arr = dset.as_memmap()
+        self.assertEqual(arr.dtype, np.dtype('>i4'))
+        self.assertArrayEqual(arr, data)
+
+    def test_chunked(self):
+        """ Chunked datasets can't be memory-mapped """
+        dset = self.f.create_dataset('foo', (10,), chunks=(5,))
+        with self.assertRaises(TypeError):
+            dset.as_memmap()
+
+    def test_vlen(self):
+        """ Variable-length types can't be memory-mapped """
+        dt = h5py.special_dtype(vlen=bytes)
+        dset = self.f.create_dataset('foo', (10,), dtype=dt)
+        with self.assertRaises(TypeError):
+            dset.as_memmap()
+
+    def test_core_driver(self):
+        """ Files using the core driver can't be memory-mapped """
+        with File(self.mktemp(), 'w', driver='core') as f:
+            dset = f.create_dataset('foo', data=np.arange(10))
+            with self.assertRaises(TypeError):
+                dset.as_memmap()
+
+    def test_use_memmap(self):
+        """ use_memmap makes numpy.asarray return a memory map """
+        data = np.arange(10, dtype='i4')
+        dset = self.f.create_dataset('foo', data=data)
+        self.assertTrue(np.asarray(dset).flags.writeable)
+        dset.use_memmap = True
+        arr = np.asarray(dset)
+        # NumPy may hand back a plain ndarray view of the map
+        self.assertFalse(arr.flags.writeable)
+        self.assertArrayEqual(arr, data)
+
+    def test_use_memmap_fallback(self):
+        """ use_memmap falls back to reading for unsupported datasets """
+        data = np.arange(10, dtype='i4')
+        dset = self.f.create_dataset('foo', data=data, chunks=(5,))
+        dset.use_memmap = True
+        arr = np.asarray(dset)
+        self.assertTrue(arr.flags.writeable)
+        self.assertArrayEqual(arr, data)
+
+
+@ut.skipUnless(hasattr(Dataset, 'read_direct_chunk'),
+               "Direct chunk reads require HDF5 1.10.2")
+class TestDirectChunk(BaseDataset):
+
+    """
+        Feature: Raw chunks can be read and written without filtering
+    """
+
+    def test_roundtrip(self):
+        """ write_direct_chunk output is visible to read_direct_chunk """
+        import zlib
+        dset = self.f.create_dataset('foo', (10, 10), dtype='i4',
+                                     chunks=(5, 5), compression='gzip')
+        data = np.arange(25, dtype='i4').reshape((5, 5))
+        dset.write_direct_chunk((5, 0), zlib.compress(data.tobytes()))
+        self.assertArrayEqual(dset[5:, :5], data)
+        mask, raw = dset.read_direct_chunk((5, 0))
+        self.assertEqual(mask, 0)
+        self.assertEqual(zlib.decompress(raw), data.tobytes())
+
+    def test_filtered(self):
+        """ read_direct_chunk returns filtered data """
+        import zlib
+        data = np.arange(100, dtype='f8').reshape((10, 10))
+        dset = self.f.create_dataset('foo', data=data, chunks=(5, 5),
+                                     compression='gzip')
+        mask, raw = dset.read_direct_chunk((0, 5))
+        out = np.frombuffer(zlib.decompress(raw), dtype='f8').reshape((5, 5))
+        self.assertArrayEqual(out, data[:5, 5:])
+
+    def test_filter_mask(self):
+        """ The filter mask of a chunk is preserved """
+        dset = self.f.create_dataset('foo', (10,), dtype='u1', chunks=(5,),
+                                     compression='gzip')
+        dset.write_direct_chunk((5,), b'\x01'*5, filter_mask=1)
+        self.assertEqual(dset.read_direct_chunk((5,)), (1, b'\x01'*5))
+
+    def test_unallocated(self):
+        """ Reading an unwritten chunk raises KeyError """
+        dset = self.f.create_dataset('foo', (10,), chunks=(5,))
+        with self.assertRaises(KeyError):
+            dset.read_direct_chunk((5,))
+
+    def test_misaligned(self):
+        """ Offsets must lie on chunk boundaries """
+        dset = self.f.create_dataset('foo', (10,), chunks=(5,))
+        with self.assertRaises(ValueError):
+            dset.read_direct_chunk((3,))
+        with self.assertRaises(ValueError):
+            dset.write_direct_chunk((3,), b'\x00'*20)
+
+    def test_contiguous(self):
+        """ Direct chunk I/O requires a chunked dataset """
+        dset = self.f.create_dataset('foo', (10,))
+        with self.assertRaises(TypeError):
+            dset.read_direct_chunk((0,))
+
+class TestParallelRead(BaseDataset):
+
+    """
+        Feature: Dataset.read decompresses chunks in parallel
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.data = np.arange(200*150, dtype='f8').reshape((200, 150)) % 97
+
+    def check(self, dset):
+        """ Compare parallel reads against ordinary ones """
+        for sel in (np.s_[...], np.s_[10:190, 5], np.s_[3, 1:149],
+                    np.s_[15:37, 40:130]):
+            out = dset.read(sel, workers=4)
+            self.assertEqual(out.shape, self.data[sel].shape)
+            self.assertArrayEqual(out, self.data[sel])
+
+    def test_gzip(self):
+        """ gzip with shuffle and fletcher32 """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32),
+                                     compression='gzip', shuffle=True,
+                                     fletcher32=True)
+        self.check(dset)
+
+    def test_lzf(self):
+        """ LZF """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32),
+                                     compression='lzf')
+        self.check(dset)
+
+    def test_unfiltered(self):
+        """ Chunked datasets without filters """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32))
+        self.check(dset)
+
+    def test_unallocated(self):
+        """ Unwritten chunks read as the fill value """
+        dset = self.f.create_dataset('foo', (100, 100), chunks=(10, 10),
+                                     compression='gzip', fillvalue=7)
+        dset[0:5, 0:5] = 1
+        self.assertArrayEqual(dset.read(workers=3), dset[...])
+
+    def test_astype(self):
+        """ astype() is respected """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32),
+                                     compression='gzip')
+        with dset.astype('i4'):
+            out = dset.read(np.s_[0:10, 0:10], workers=2)
+        self.assertEqual(out.dtype, np.dtype('i4'))
+        self.assertArrayEqual(out, self.data[0:10, 0:10].astype('i4'))
+
+    def test_fallback(self):
+        """ Unsupported selections fall back to an ordinary read """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32),
+                                     compression='gzip')
+        self.assertArrayEqual(dset.read(np.s_[::2, 3], workers=2),
+                              self.data[::2, 3])
+        dset = self.f.create_dataset('bar', data=self.data)
+        self.assertArrayEqual(dset.read(workers=2), self.data)
+
+    def test_out(self):
+        """ Output arrays are filled, or rejected like ordinary reads """
+        dset = self.f.create_dataset('foo', data=self.data, chunks=(32, 32),
+                                     compression='gzip')
+        out = np.zeros((10, 150))
+        self.assertIs(dset.read(np.s_[5:15], workers=2, out=out), out)
+        self.assertArrayEqual(out, self.data[5:15])
+        with self.assertRaises(TypeError):
+            dset.read(np.s_[5:6, :], workers=2, out=np.zeros((10, 150)))
+        out.flags.writeable = False
+        with self.assertRaises(TypeError):
+            dset.read(np.s_[5:15], workers=2, out=out)
+
+class TestParallelWrite(BaseDataset):
+
+    """
+        Feature: Dataset.write compresses chunks in parallel
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.data = np.arange(200*150, dtype='f8').reshape((200, 150)) % 97
+
+    def check(self, **kwds):
+        """ Write aligned selections, including edge chunks """
+        dset = self.f.create_dataset('foo', (200, 150), dtype='f8',
+                                     chunks=(32, 32), fillvalue=-1, **kwds)
+        dset.write(np.s_[32:200, 0:96], self.data[32:, :96], workers=3)
+        expected = np.empty((200, 150))
+        expected[...] = -1
+        expected[32:, :96] = self.data[32:, :96]
+        self.assertArrayEqual(dset[...], expected)
+        dset.write(None, self.data, workers=2)
+        self.assertArrayEqual(dset[...], self.data)
+
+    def test_gzip(self):
+        """ gzip with shuffle and fletcher32 """
+        self.check(compression='gzip', shuffle=True, fletcher32=True)
+
+    def test_lzf(self):
+        """ LZF """
+        self.check(compression='lzf')
+
+    def test_unfiltered(self):
+        """ Chunked datasets without filters """
+        self.check()
+
+    def test_incompressible(self):
+        """ LZF chunks which don't compress """
+        data = np.frombuffer(os.urandom(64), dtype='u1')
+        dset = self.f.create_dataset('foo', (64,), dtype='u1', chunks=(64,),
+                                     compression='lzf')
+        dset.write(None, data, workers=2)
+        self.assertArrayEqual(dset[...], data)
+
+    def test_fallback(self):
+        """ Misaligned selections fall back to an ordinary write """
+        dset = self.f.create_dataset('foo', (200, 150), dtype='f8',
+                                     chunks=(32, 32), compression='gzip')
+        dset.write(np.s_[1:5, 1:5], 42, workers=2)
+        self.assertArrayEqual(dset[1:5, 1:5], np.ones((4, 4))*42)
+        self.assertEqual(dset[0, 0], 0)
+
+@ut.skipUnless(hasattr(Dataset, 'chunk_info'),
+               "Chunk index inspection requires HDF5 1.10.5")
+class TestChunkInfo(BaseDataset):
+
+    """
+        Feature: The chunk index can be inspected
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.dset = self.f.create_dataset('foo', (100, 100), chunks=(10, 10),
+                                          compression='gzip')
+        self.dset[0:20, 0:10] = np.arange(200).reshape((20, 10))
+        self.dset[55, 55] = 1
+
+    def test_chunk_info(self):
+        """ chunk_info() lists every allocated chunk """
+        info = self.dset.chunk_info()
+        self.assertEqual(sorted(x.chunk_offset for x in info),
+                         [(0, 0), (10, 0), (50, 50)])
+        for x in info:
+            self.assertEqual(x.filter_mask, 0)
+            mask, data = self.dset.read_direct_chunk(x.chunk_offset)
+            self.assertEqual(x.size, len(data))
+            self.assertGreater(x.byte_offset, 0)
+
+    def test_sel(self):
+        """ Only chunks intersecting the selection are listed """
+        info = list(self.dset.iter_chunk_info(np.s_[19, :]))
+        self.assertEqual([x.chunk_offset for x in info], [(10, 0)])
+        self.assertEqual(self.dset.chunk_info(np.s_[60:, :]), [])
+
+    def test_many_chunks(self):
+        """ Chunks are listed by either lookup method """
+        self.dset[0:100, 0:30] = 1
+        expected = [(x, y) for x in range(0, 100, 10) for y in (0, 10, 20)]
+        info = self.dset.chunk_info()
+        self.assertEqual(sorted(x.chunk_offset for x in info),
+                         sorted(expected + [(50, 50)]))
+        info = self.dset.chunk_info(np.s_[40:60, 15:])
+        self.assertEqual(sorted(x.chunk_offset for x in info),
+                         [(40, 10), (40, 20), (50, 10), (50, 20), (50, 50)])
+
+    @ut.skipUnless(hasattr(h5py.h5d.DatasetID, 'chunk_iter'),
+                   "Chunk iteration requires HDF5 1.12.3")
+    def test_chunk_iter(self):
+        """ The chunk index can be walked in a single pass """
+        offsets = []
+        self.assertIsNone(self.dset.id.chunk_iter(lambda x: offsets.append(x.chunk_offset)))
+        self.assertEqual(sorted(offsets), [(0, 0), (10, 0), (50, 50)])
+        first = self.dset.id.chunk_iter(lambda x: x)
+        self.assertIsInstance(first, h5py.h5d.StoreInfo)
+
+    def test_by_coord(self):
+        """ Unallocated chunks have no byte offset """
+        info = self.dset.id.get_chunk_info_by_coord((90, 90))
+        self.assertEqual(info, h5py.h5d.StoreInfo((90, 90), 0, None, 0))
+        info = self.dset.id.get_chunk_info_by_coord((50, 50))
+        self.assertIsNotNone(info.byte_offset)
+
+    def test_contiguous(self):
+        """ Contiguous datasets have no chunk index """
+        dset = self.f.create_dataset('bar', (10,))
+        with self.assertRaises(TypeError):
+            dset.chunk_info()
+
+@ut.skipUnless(hasattr(h5py.h5d.DatasetID, 'get_chunk_info_by_coord'),
+               "Chunk index inspection requires HDF5 1.10.5")
+class TestSkipUnallocated(BaseDataset):
+
+    """
+        Feature: Reads can skip unallocated chunks
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.dset = self.f.create_dataset('foo', (100, 100), dtype='i4',
+                                          chunks=(10, 10), fillvalue=3)
+        self.dset.skip_unallocated = True
+
+    def compare(self, sel):
+        """ Read with and without skipping; return the fraction skipped """
+        out = self.dset[sel]
+        skipped = self.dset.skipped_fraction
+        self.dset.skip_unallocated = False
+        self.assertArrayEqual(out, self.dset[sel])
+        self.dset.skip_unallocated = True
+        return skipped
+
+    def test_empty(self):
+        """ Nothing is read from a dataset with no chunks """
+        self.assertEqual(self.compare(np.s_[...]), 1.0)
+
+    def test_sparse(self):
+        """ Only allocated chunks are read """
+        self.dset[0:20, 0:10] = np.arange(200).reshape((20, 10))
+        self.dset[55, 55] = 1
+        self.assertAlmostEqual(self.compare(np.s_[...]), 0.97)
+        self.assertAlmostEqual(self.compare(np.s_[50:60, 50:70]), 0.5)
+        self.assertAlmostEqual(self.compare(np.s_[55, :]), 0.9)
+        self.assertEqual(self.compare(np.s_[0:15, 5]), 0.0)
+
+    def test_mostly_allocated(self):
+        """ Selections mostly in allocated chunks are read normally """
+        self.dset[0:60, :] = 1
+        self.assertAlmostEqual(self.compare(np.s_[...]), 0.4)
+        self.assertAlmostEqual(self.compare(np.s_[50:, 0:5]), 0.8)
+
+    def test_astype(self):
+        """ astype() is respected """
+        self.dset[55, 55] = 1
+        with self.dset.astype('f8'):
+            out = self.dset[55, 50:60]
+        self.assertEqual(out.dtype, np.dtype('f8'))
+        self.assertArrayEqual(out, np.array([3, 3, 3, 3, 3, 1, 3, 3, 3, 3], 'f8'))
+
+    def test_fallback(self):
+        """ Other selections are read normally """
+        self.dset[55, 55] = 1
+        self.assertIsNone(self.compare(np.s_[::2, :]))
+        self.dset.skip_unallocated = False
+        self.dset[...]
+        self.assertIsNone(self.dset.skipped_fraction)
+
+class TestMaskRead(BaseDataset):
+
+    """
+        Feature: Dataset.read_masked reads boolean masks chunk by chunk
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.arr = np.arange(30*17, dtype='f8').reshape((30, 17))
+        self.mask = (self.arr % 7 == 3) | (self.arr % 11 == 0)
+
+    def test_chunked(self):
+        """ Masked values come back in C order """
+        dset = self.f.create_dataset('foo', data=self.arr, chunks=(4, 5))
+        self.assertArrayEqual(dset.read_masked(self.mask), self.arr[self.mask])
+
+    def test_contiguous(self):
+        """ Contiguous datasets are read in blocks of rows """
+        dset = self.f.create_dataset('foo', data=self.arr)
+        self.assertArrayEqual(dset.read_masked(self.mask), self.arr[self.mask])
+
+    def test_empty_chunks(self):
+        """ Chunks with nothing selected are skipped """
+        dset = self.f.create_dataset('foo', data=self.arr, chunks=(4, 5))
+        mask = self.mask.copy()
+        mask[4:8, :] = False
+        mask[:, 5:10] = False
+        self.assertArrayEqual(dset.read_masked(mask), self.arr[mask])
+
+    def test_sparse(self):
+        """ Masks selecting a few scattered points """
+        dset = self.f.create_dataset('foo', data=self.arr, chunks=(4, 5))
+        mask = np.zeros(self.arr.shape, dtype='bool')
+        mask[29, 0] = mask[3, 16] = mask[17, 8] = True
+        self.assertArrayEqual(dset.read_masked(mask), self.arr[mask])
+        mask[...] = False
+        out = dset.read_masked(mask)
+        self.assertEqual(out.shape, (0,))
+        self.assertEqual(out.dtype, np.dtype('f8'))
+
+    def test_astype(self):
+        """ astype() is respected """
+        dset = self.f.create_dataset('foo', data=self.arr, chunks=(4, 5))
+        with dset.astype('i4'):
+            out = dset.read_masked(self.mask)
+        self.assertEqual(out.dtype, np.dtype('i4'))
+        self.assertArrayEqual(out, self.arr[self.mask].astype('i4'))
+
+    def test_array_dtype(self):
+        """ Array dtypes keep their trailing dimensions """
+        arr = np.arange(10*2*3, dtype='i4').reshape((10, 2, 3))
+        dset = self.f.create_dataset('foo', (10,), dtype=np.dtype('(2,3)i4'))
+        dset[...] = arr
+        mask = np.array([1, 0, 0, 1, 1, 0, 0, 0, 1, 0], dtype='bool')
+        self.assertArrayEqual(dset.read_masked(mask), arr[mask])
+
+    def test_shape(self):
+        """ The mask must be boolean with the dataset's shape """
+        dset = self.f.create_dataset('foo', data=self.arr)
+        with self.assertRaises(TypeError):
+            dset.read_masked(self.mask[:10])
+        with self.assertRaises(TypeError):
+            dset.read_masked(self.mask.astype('i4'))
+
+class TestReadPlans(BaseDataset):
+
+    """
+        Feature: Repeated reads reuse cached types and dataspaces
+    """
+
+    def test_repeated(self):
+        """ Repeated small reads give the right data """
+        arr = np.arange(200, dtype='i4').reshape((20, 10))
+        dset = self.f.create_dataset('foo', data=arr)
+        for i in (0, 5, 19, -1):
+            self.assertArrayEqual(dset[i], arr[i])
+            self.assertEqual(dset[i, 3], arr[i, 3])
+            self.assertArrayEqual(dset[i, 2:8:3], arr[i, 2:8:3])
+
+    def test_astype(self):
+        """ Cached types follow astype() """
+        dset = self.f.create_dataset('foo', data=np.arange(10, dtype='i4'))
+        self.assertEqual(dset[2:4].dtype, np.dtype('i4'))
+        with dset.astype('f8'):
+            self.assertEqual(dset[2:4].dtype, np.dtype('f8'))
+        self.assertEqual(dset[2:4].dtype, np.dtype('i4'))
+
+    def test_fields(self):
+        """ Cached types follow field names """
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('foo', (10,), dtype=dt)
+        self.assertEqual(dset[0:2].dtype, dt)
+        self.assertEqual(dset['b', 0:2].dtype, np.dtype('f8'))
+        self.assertEqual(dset[0:2].dtype, dt)
+
+    def test_resize(self):
+        """ Reads see the new shape after a resize """
+        dset = self.f.create_dataset('foo', data=np.arange(10), maxshape=(None,))
+        self.assertArrayEqual(dset[5:], np.arange(5, 10))
+        dset.resize((20,))
+        dset[10:] = np.arange(10, 20)
+        self.assertArrayEqual(dset[5:], np.arange(5, 20))
+
+class TestReadMany(BaseDataset):
+
+    """
+        Feature: Several selections can be read at once
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.arr = np.arange(40*30, dtype='f8').reshape((40, 30))
+        self.dset = self.f.create_dataset('foo', data=self.arr, chunks=(8, 8))
+
+    def check(self, sels):
+        """ Compare read_many with reading each selection """
+        out = self.dset.read_many(sels)
+        self.assertEqual(len(out), len(sels))
+        for x, y in zip(out, sels):
+            self.assertArrayEqual(x, self.arr[y])
+        return out
+
+    def test_windows(self):
+        """ Windows in file order """
+        self.check([np.s_[0:3, 0:4], np.s_[10:12, 5:20], np.s_[30, :], np.s_[39, 29]])
+
+    def test_interleaved(self):
+        """ Windows whose rows interleave in the file """
+        out = self.check([np.s_[5:15, 20:25], np.s_[0:10, 0:3], np.s_[2:30:3, 10:19:4]])
+        for x in out[:2]:
+            self.assertIsNotNone(x.base)
+
+    def test_empty(self):
+        """ Empty lists and selections """
+        self.assertEqual(self.dset.read_many([]), [])
+        self.check([np.s_[3:3, :], np.s_[1:2, 1:2]])
+
+    def test_astype(self):
+        """ astype() is respected """
+        with self.dset.astype('i4'):
+            out = self.dset.read_many([np.s_[1:3, 4], np.s_[7, 2:6]])
+        self.assertEqual(out[0].dtype, np.dtype('i4'))
+        self.assertArrayEqual(out[1], self.arr[7, 2:6].astype('i4'))
+
+    def test_fallback(self):
+        """ Overlapping or fancy selections are read separately """
+        self.check([np.s_[0:5, 0:5], np.s_[4:8, 4:8]])
+        self.check([np.s_[[1, 5], 0:5], np.s_[9, :]])
+
+class TestBroadcastWrite(BaseDataset):
+
+    """
+        Feature: Broadcast writes are done from a tiled buffer
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        from h5py._hl import dataset
+        self.module = dataset
+        self.limit = dataset.BROADCAST_BUFFER_BYTES
+        dataset.BROADCAST_BUFFER_BYTES = 8*64
+
+    def tearDown(self):
+        self.module.BROADCAST_BUFFER_BYTES = self.limit
+        BaseDataset.tearDown(self)
+
+    def check(self, shape, sel, val, **kwds):
+        """ Compare a broadcast write with NumPy """
+        arr = np.arange(np.prod(shape), dtype='f8').reshape(shape)
+        dset = self.f.create_dataset('foo', data=arr, **kwds)
+        dset[sel] = val
+        arr[sel] = val
+        self.assertArrayEqual(dset[...], arr)
+        del self.f['foo']
+
+    def test_scalar(self):
+        """ Scalars over rows shorter or longer than the buffer """
+        self.check((100, 20), np.s_[:, :], 3)
+        self.check((100, 20), np.s_[5:97:3, 2:19:2], -1)
+        self.check((10, 200), np.s_[1:9, :], 7, chunks=(3, 30))
+        self.check((4, 6, 25), np.s_[:, 1, :], 2)
+
+    def test_row(self):
+        """ Row vectors repeated down a region """
+        self.check((100, 20), np.s_[:, :], np.arange(20))
+        self.check((50, 7, 4), np.s_[3:40, :, 1:3], np.ones((7, 2)))
+
+    def test_column(self):
+        """ Column vectors repeated along rows """
+        self.check((100, 20), np.s_[:, :], np.arange(100).reshape((100, 1)))
+        self.check((30, 8, 6), np.s_[::2, :, :], np.arange(15.).reshape((15, 1, 1)))
+
+    def test_fields(self):
+        """ Broadcast writes into a single compound field """
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('foo', (60, 10), dtype=dt)
+        dset['b', 2:50, :] = np.arange(10.)
+        dset['a', :, :] = 4
+        out = dset[...]
+        self.assertTrue(np.all(out['a'] == 4))
+        self.assertArrayEqual(out['b'][2:50], np.tile(np.arange(10.), (48, 1)))
+        self.assertArrayEqual(out['b'][:2], np.zeros((2, 10)))
+
+    def test_mismatch(self):
+        """ Incompatible shapes still raise TypeError """
+        dset = self.f.create_dataset('foo', (100, 20), 'f8')
+        with self.assertRaises(TypeError):
+            dset[:, :] = np.arange(19)
+
+class TestReadOut(BaseDataset):
+
+    """
+        Feature: Dataset.read() can store data in an existing array
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.arr = np.arange(20*30, dtype='f8').reshape((20, 30))
+        self.dset = self.f.create_dataset('foo', data=self.arr)
+
+    def test_contiguous(self):
+        """ Reads into C arrays return the same array """
+        out = np.zeros((20, 30))
+        self.assertIs(self.dset.read(out=out), out)
+        self.assertArrayEqual(out, self.arr)
+
+    def test_strided(self):
+        """ Reads into strided views leave the rest of the base alone """
+        big = np.zeros((20, 4, 60))
+        view = big[:, 3, ::2]
+        self.assertIs(self.dset.read(np.s_[:, :], out=view), view)
+        self.assertArrayEqual(big[:, 3, ::2], self.arr)
+        self.assertEqual(big.sum(), self.arr.sum())
+
+        big = np.zeros((7, 61), dtype='f4')
+        self.dset.read(np.s_[3:10, 1:30:2], out=big[:, 1::4])
+        self.assertArrayEqual(big[:, 1::4], self.arr[3:10, 1:30:2].astype('f4'))
+        self.assertEqual(big.sum(), self.arr[3:10, 1:30:2].sum())
+
+    def test_reversed(self):
+        """ Layouts which aren't hyperslabs are still filled in """
+        out = np.zeros((30, 20))
+        self.dset.read(out=out.T)
+        self.assertArrayEqual(out.T, self.arr)
+        out = np.zeros((5, 30))
+        self.dset.read(np.s_[[9, 2, 4, 1, 0]], out=out[::-1])
+        self.assertArrayEqual(out[::-1], self.arr[[9, 2, 4, 1, 0]])
+
+    def test_selections(self):
+        """ Integer, point and field selections """
+        out = np.zeros(())
+        self.dset.read(np.s_[2, 3], out=out)
+        self.assertEqual(out[()], self.arr[2, 3])
+        out = np.zeros((10,))
+        self.dset.read(np.s_[4, [1, 5, 9]], out=out[::3][:3])
+        self.assertArrayEqual(out[:7:3], self.arr[4, [1, 5, 9]])
+
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('bar', (10,), dtype=dt)
+        dset['b'] = np.arange(10.)
+        out = np.zeros((20,))
+        dset.read(np.s_['b'], out=out[::2])
+        self.assertArrayEqual(out[::2], np.arange(10.))
+
+    def test_errors(self):
+        """ Wrong shapes and read-only arrays raise TypeError """
+        with self.assertRaises(TypeError):
+            self.dset.read(np.s_[0:5], out=np.zeros((4, 30)))
+        out = np.zeros((20, 30))
+        out.flags.writeable = False
+        with self.assertRaises(TypeError):
+            self.dset.read(out=out)
+
+class TestStridedWrite(BaseDataset):
+
+    """
+        Feature: Non-contiguous arrays are written without a full copy
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.big = np.arange(20*4*60, dtype='f8').reshape((20, 4, 60))
+
+    def check(self, shape, sel, val, dtype='f8'):
+        """ Compare a write from a view with NumPy """
+        dset = self.f.create_dataset('foo%d' % len(self.f), shape, dtype=dtype)
+        dset[sel] = val
+        arr = np.zeros(shape, dtype=dtype)
+        arr[sel] = val
+        self.assertArrayEqual(dset[...], arr)
+
+    def test_rows(self):
+        """ Views with contiguous rows """
+        self.check((20, 30), np.s_[...], self.big[:, 3, 10:40])
+        self.check((25, 40), np.s_[2:22, 5:35], self.big[:, 1, :30], 'f4')
+        self.check((30,), np.s_[:], self.big[4, 2, 30:])
+
+    def test_strided(self):
+        """ Views with strided rows """
+        self.check((20, 30), np.s_[...], self.big[:, 3, ::2])
+        self.check((10, 30), np.s_[...], self.big[::2, 0, 1::2], 'i4')
+        self.check((60, 20), np.s_[...], self.big[:, 2, :].T)
+        self.check((20, 60), np.s_[...], self.big[:, 2, ::-1])
+
+    def test_selections(self):
+        """ Integer and fancy selections """
+        self.check((5, 20, 30), np.s_[3, :, :], self.big[:, 0, ::2])
+        self.check((20, 30), np.s_[[1, 5, 7], :], self.big[:3, 1, 30:])
+        self.check((20, 30), np.s_[:, [1, 5, 7]], self.big[:, 1, 30:33])
+        self.check((20, 30), np.s_[[7, 1, 5], :], self.big[:3, 1, ::2])
+
+    def test_readonly(self):
+        """ Read-only views """
+        val = self.big[:, 3, ::2]
+        val.flags.writeable = False
+        self.check((20, 30), np.s_[...], val)
+
+    def test_fields(self):
+        """ Strided writes into a single compound field """
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('foo', (20, 30), dtype=dt)
+        dset['b', :, :] = self.big[:, 3, ::2]
+        self.assertArrayEqual(dset['b'], self.big[:, 3, ::2])
+        self.assertTrue(np.all(dset['a'] == 0))
+
+class TestAppender(BaseDataset):
+
+    """
+        Feature: Rows can be appended through a buffer
+    """
+
+    def test_append(self):
+        """ Single rows, trimmed to length on close """
+        dset = self.f.create_dataset('foo', (0,), 'i4', maxshape=(None,), chunks=True)
+        with dset.appender(buffer_rows=10) as app:
+            for i in range(1000):
+                app.append(i)
+            self.assertEqual(len(app), 1000)
+        self.assertEqual(dset.shape, (1000,))
+        self.assertArrayEqual(dset[...], np.arange(1000, dtype='i4'))
+
+    def test_extend(self):
+        """ Blocks of rows, appended after existing data """
+        dset = self.f.create_dataset('foo', (5, 3), 'f8', maxshape=(None, 3), chunks=(4, 3))
+        arr = np.arange(60, dtype='f8').reshape((20, 3))
+        with dset.appender(buffer_rows=6) as app:
+            app.append([1, 2, 3])
+            app.extend(arr)
+            app.extend(np.ones((2, 3)))
+            app.extend(np.zeros((0, 3)))
+            app.flush()
+            self.assertGreaterEqual(dset.shape[0], 28)
+            self.assertArrayEqual(dset[5:28], np.vstack(([[1, 2, 3]], arr, np.ones((2, 3)))))
+        self.assertEqual(dset.shape, (28, 3))
+
+    def test_compound(self):
+        """ Compound rows from tuples """
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('foo', (0,), dt, maxshape=(None,), chunks=True)
+        with dset.appender() as app:
+            app.append((1, 2.5))
+            app.extend([(3, 4.5), (5, 6.5)])
+        self.assertTrue(np.all(dset[...] == np.array([(1, 2.5), (3, 4.5), (5, 6.5)], dtype=dt)))
+
+    def test_maxshape(self):
+        """ Appending beyond maxshape raises ValueError """
+        dset = self.f.create_dataset('foo', (0, 2), 'i4', maxshape=(10, 2), chunks=(4, 2))
+        app = dset.appender(buffer_rows=4)
+        app.extend(np.ones((10, 2)))
+        with self.assertRaises(ValueError):
+            app.extend(np.ones((3, 2)))
+        with self.assertRaises(ValueError):
+            app.append([1, 1])
+        app.close()
+        self.assertEqual(dset.shape, (10, 2))
+
+    def test_errors(self):
+        """ Contiguous datasets, wrong shapes and closed appenders """
+        dset = self.f.create_dataset('foo', (10, 2), 'i4')
+        with self.assertRaises(TypeError):
+            dset.appender()
+        dset = self.f.create_dataset('bar', (0, 2), 'i4', maxshape=(None, 2), chunks=(4, 2))
+        app = dset.appender()
+        with self.assertRaises(TypeError):
+            app.extend(np.ones((3, 3)))
+        app.close()
+        with self.assertRaises(ValueError):
+            app.append([1, 2])
+
+class TestAsyncWriter(BaseDataset):
+
+    """
+        Feature: Writes can be queued for a background thread
+    """
+
+    def test_rows(self):
+        """ Row writes, merged or not, land in order """
+        dset = self.f.create_dataset('foo', (100, 8), 'f8')
+        arr = np.arange(800, dtype='f8').reshape((100, 8))
+        with dset.async_writer(max_pending=4) as writer:
+            for i in range(100):
+                writer[i] = arr[i]
+            writer[10:12] = arr[50:52]
+            writer[20:40, 2:4] = -1
+            writer[90] = 7
+        arr[10:12] = arr[50:52].copy()
+        arr[20:40, 2:4] = -1
+        arr[90] = 7
+        self.assertArrayEqual(dset[...], arr)
+
+    def test_copies(self):
+        """ Data is copied when queued """
+        dset = self.f.create_dataset('foo', (10,), 'i4')
+        val = np.arange(10, dtype='i4')
+        lst = [1, 2, 3]
+        writer = dset.async_writer()
+        writer[...] = val
+        writer[5:8] = lst
+        val[:] = 0
+        lst[0] = 0
+        writer.close()
+        self.assertArrayEqual(dset[...], np.array([0, 1, 2, 3, 4, 1, 2, 3, 8, 9], dtype='i4'))
+
+    def test_fields(self):
+        """ Field and fancy selections """
+        dt = np.dtype([('a', 'i4'), ('b', 'f8')])
+        dset = self.f.create_dataset('foo', (10,), dtype=dt)
+        with dset.async_writer() as writer:
+            writer['b', 2:4] = [1.5, 2.5]
+            writer[[1, 5]] = np.array([(1, 1.0), (5, 5.0)], dtype=dt)
+        out = dset[...]
+        self.assertArrayEqual(out['a'], np.array([0, 1, 0, 0, 0, 5, 0, 0, 0, 0], dtype='i4'))
+        self.assertArrayEqual(out['b'], np.array([0, 1, 1.5, 2.5, 0, 5, 0, 0, 0, 0]))
+
+    def test_errors(self):
+        """ Errors are raised by flush(), and closed writers refuse writes """
+        dset = self.f.create_dataset('foo', (10,), 'i4')
+        writer = dset.async_writer()
+        writer[20] = 1
+        with self.assertRaises(ValueError):
+            writer.flush()
+        writer[0] = 3
+        writer.close()
+        self.assertEqual(dset[0], 3)
+        with self.assertRaises(ValueError):
+            writer[1] = 1
+
+    def test_exit_error(self):
+        """ Errors from the with block aren't replaced by write errors """
+        dset = self.f.create_dataset('foo', (10,), 'i4')
+        with self.assertRaises(KeyError):
+            with dset.async_writer() as writer:
+                writer[20] = 1
+                raise KeyError()
+
+    def test_collected(self):
+        """ Unclosed writers finish their writes and stop the thread """
+        dset = self.f.create_dataset('foo', (10,), 'i4')
+        writer = dset.async_writer(max_pending=1)
+        thread = writer._thread
+        writer[0] = 1
+        writer[1] = 2
+        del writer
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertArrayEqual(dset[0:2], np.array([1, 2], dtype='i4'))
 
 class TestStrings(BaseDataset):
 
@@ -1059,6 +1992,286 @@ class TestVlen(BaseDataset):
         self._help_float_testing(np_dt)
 
 
+class TestProxySelections(BaseDataset):
+
+    """
+        Feature: Types converted through a proxy buffer honor the memory
+        selection
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        dt = h5py.special_dtype(vlen=str)
+        self.arr = np.array([[str(i*100+j) for j in range(50)] for i in range(60)],
+                            dtype=object)
+        self.dset = self.f.create_dataset('foo', data=self.arr, dtype=dt)
+
+    def check(self, dest_sel):
+        """ Read a block into a selection of a larger array """
+        out = np.empty((60, 50), dtype=object)
+        out[...] = 'x'
+        self.dset.read_direct(out, np.s_[0:20, 0:10], dest_sel)
+        expected = np.empty((60, 50), dtype=object)
+        expected[...] = 'x'
+        expected[dest_sel] = self.arr[0:20, 0:10]
+        self.assertTrue(np.all(out == expected))
+
+    def test_block(self):
+        """ Contiguous block of rows """
+        self.check(np.s_[10:30, 5:15])
+
+    def test_strided(self):
+        """ Strided along both axes """
+        self.check(np.s_[0:40:2, 3:40:4])
+        self.check(np.s_[1:60:3, 0:10])
+
+    def test_points(self):
+        """ Point selections keep their order """
+        sels = [np.s_[5:15, 20:25], np.s_[0:10, 0:3], np.s_[2:30:3, 10:19:4]]
+        for x, y in zip(self.dset.read_many(sels), sels):
+            self.assertTrue(np.all(x == self.arr[y]))
+
+    def check_space(self, mspace, expected):
+        """ Low-level read of a whole dataset into the selection of mspace """
+        dt = h5py.special_dtype(vlen=str)
+        data = np.array([str(i) for i in range(mspace.get_select_npoints())], dtype=object)
+        dset = self.f.create_dataset('bar', data=data, dtype=dt)
+        out = np.empty(mspace.shape, dtype=object)
+        dset.id.read(mspace, dset.id.get_space(), out)
+        self.assertTrue(np.all(out[expected] == data))
+
+    def test_many_runs(self):
+        """ Selections with more runs than are listed at a time """
+        mspace = h5s.create_simple((150000, 4))
+        mspace.select_hyperslab((0, 0), (75000, 1), (2, 1))
+        mspace.select_hyperslab((1, 1), (75000, 1), (2, 1), op=h5s.SELECT_OR)
+        expected = np.zeros((150000, 4), dtype='bool')
+        expected[0::2, 0] = expected[1::2, 1] = True
+        self.check_space(mspace, expected)
+
+    def test_many_rows(self):
+        """ Blocks whose rows interleave, with more rows than are listed at
+        a time """
+        mspace = h5s.create_simple((150000, 4))
+        mspace.select_hyperslab((0, 0), (150000, 1))
+        mspace.select_hyperslab((0, 2), (150000, 2), op=h5s.SELECT_OR)
+        expected = np.ones((150000, 4), dtype='bool')
+        expected[:, 1] = False
+        self.check_space(mspace, expected)
+
+    def test_compound(self):
+        """ Compound types with a vlen member """
+        dt = np.dtype([('a', 'i4'), ('b', h5py.special_dtype(vlen=str))])
+        data = np.empty((100,), dtype=dt)
+        data['a'] = np.arange(100)
+        data['b'] = [str(i) for i in range(100)]
+        dset = self.f.create_dataset('bar', data=data)
+        out = np.empty((200,), dtype=dt)
+        out['a'] = -1
+        dset.read_direct(out, np.s_[0:50], np.s_[0:200:4])
+        self.assertArrayEqual(out['a'][0:200:4], np.arange(50, dtype='i4'))
+        self.assertArrayEqual(out['a'][1::4], -np.ones((50,), dtype='i4'))
+        self.assertEqual(list(out['b'][0:200:4]), [str(i) for i in range(50)])
+
+class TestBufferPool(BaseDataset):
+
+    """
+        Feature: Conversion buffers are reused between reads
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        dt = h5py.special_dtype(vlen=str)
+        data = np.array([str(i) for i in range(1000)], dtype=object)
+        self.dset = self.f.create_dataset('foo', data=data, dtype=dt)
+
+    def tearDown(self):
+        _proxy.set_buffer_pool_limit(32*1024*1024)
+        BaseDataset.tearDown(self)
+
+    def test_reuse(self):
+        """ Repeated reads of the same size reuse their buffers """
+        self.dset[0:100]
+        before = _proxy.get_buffer_pool_stats()
+        for idx in range(10):
+            self.assertEqual(list(self.dset[idx*100:(idx+1)*100]),
+                             [str(x) for x in range(idx*100, (idx+1)*100)])
+        after = _proxy.get_buffer_pool_stats()
+        requests = after['requests'] - before['requests']
+        self.assertGreaterEqual(requests, 10)
+        self.assertEqual(after['reused'] - before['reused'], requests)
+        self.assertGreater(after['cached'], 0)
+
+    def test_limit(self):
+        """ Nothing is kept with a zero limit """
+        _proxy.set_buffer_pool_limit(0)
+        before = _proxy.get_buffer_pool_stats()
+        self.dset[0:100]
+        self.dset[0:100]
+        after = _proxy.get_buffer_pool_stats()
+        self.assertEqual(after['reused'], before['reused'])
+        self.assertEqual(after['cached'], 0)
+
+class TestConversionStrips(BaseDataset):
+
+    """
+        Feature: Large converted transfers are done in strips
+    """
+
+    def setUp(self):
+        BaseDataset.setUp(self)
+        self.dt = h5py.special_dtype(vlen=str)
+        self.arr = np.array([[str(i*100+j) for j in range(50)] for i in range(60)],
+                            dtype=object)
+        self.dset = self.f.create_dataset('foo', data=self.arr, dtype=self.dt)
+        _proxy.set_conversion_strip_size(500)
+
+    def tearDown(self):
+        _proxy.set_conversion_strip_size(64*1024*1024)
+        BaseDataset.tearDown(self)
+
+    def assertObjectsEqual(self, a, b):
+        self.assertEqual(a.shape, b.shape)
+        self.assertTrue(np.all(a == b))
+
+    def test_read(self):
+        """ Reads of slices, index lists and masks """
+        for sel in (np.s_[...], np.s_[3:50:3, 7:44:2], np.s_[:, 7],
+                    np.s_[[1, 5, 9, 33], 2:40]):
+            self.assertObjectsEqual(self.dset[sel], self.arr[sel])
+        mask = np.zeros(self.arr.shape, dtype='bool')
+        mask[::7, 3::5] = True
+        self.assertObjectsEqual(self.dset[mask], self.arr[mask])
+
+    def test_read_direct(self):
+        """ Reads into a strided destination """
+        out = np.empty((60, 50), dtype=object)
+        self.dset.read_direct(out, np.s_[0:20, 0:10], np.s_[0:40:2, 3:40:4])
+        self.assertObjectsEqual(out[0:40:2, 3:40:4], self.arr[0:20, 0:10])
+
+    def test_write(self):
+        """ Writes of whole datasets and strided selections """
+        dset = self.f.create_dataset('bar', (60, 50), dtype=self.dt)
+        dset[...] = self.arr
+        dset[2:60:4, 1:50:3] = self.arr[0:15, 0:17]
+        expected = self.arr.copy()
+        expected[2:60:4, 1:50:3] = self.arr[0:15, 0:17]
+        self.assertObjectsEqual(dset[...], expected)
+
+    def test_split_rows(self):
+        """ Strips smaller than a row of a 3-D selection """
+        _proxy.set_conversion_strip_size(100)
+        arr = np.array([str(i) for i in range(8*9*10)], dtype=object).reshape((8, 9, 10))
+        dset = self.f.create_dataset('bar', data=arr, dtype=self.dt)
+        for sel in (np.s_[...], np.s_[1:7:2, 2:9:3, 1:10:2], np.s_[3, :, 4:]):
+            self.assertObjectsEqual(dset[sel], arr[sel])
+        out = np.empty((8, 9, 20), dtype=object)
+        dset.read_direct(out, np.s_[...], np.s_[:, :, ::2])
+        self.assertObjectsEqual(out[:, :, ::2], arr)
+        dset[2:8, 1:9:2, ::3] = arr[0:6, 0:4, 0:4]
+        expected = arr.copy()
+        expected[2:8, 1:9:2, ::3] = arr[0:6, 0:4, 0:4]
+        self.assertObjectsEqual(dset[...], expected)
+
+    def test_clustered(self):
+        """ Strips stay small for unevenly spread selections """
+        dset = self.f.create_dataset('bar', (400, 400), dtype=self.dt)
+        block = np.array([str(i) for i in range(100*100)], dtype=object).reshape((100, 100))
+        dset[0:100, 0:100] = block
+        dset[399, 399] = 'last'
+
+        fspace = dset.id.get_space()
+        fspace.select_hyperslab((0, 0), (100, 100))
+        fspace.select_hyperslab((399, 399), (1, 1), op=h5s.SELECT_OR)
+        mspace = h5s.create_simple((100*100+1,))
+        out = np.empty((100*100+1,), dtype=object)
+
+        _proxy.set_conversion_strip_size(16000)
+        _proxy.clear_buffer_pool()
+        dset.id.read(mspace, fspace, out, h5t.py_create(self.dt))
+        self.assertLessEqual(_proxy.get_buffer_pool_stats()['largest'], 2*16000)
+        self.assertObjectsEqual(out[:-1].reshape((100, 100)), block)
+        self.assertEqual(out[-1], 'last')
+
+    def test_compound(self):
+        """ Compound types with a vlen member """
+        dt = np.dtype([('a', 'i4'), ('b', self.dt)])
+        data = np.empty((1000,), dtype=dt)
+        data['a'] = np.arange(1000)
+        data['b'] = [str(i) for i in range(1000)]
+        dset = self.f.create_dataset('bar', data=data)
+        dset['a', 10:500] = -np.arange(490, dtype='i4')
+        out = dset[...]
+        self.assertArrayEqual(out['a'][10:500], -np.arange(490, dtype='i4'))
+        self.assertObjectsEqual(out['b'], data['b'])
+
+class TestTransferPlans(BaseDataset):
+
+    """
+        Feature: Low-level transfers reuse the plan for a memory type
+    """
+
+    def test_same_type(self):
+        """ One memory type used for reads and writes """
+        dt = np.dtype([('a', 'i4'), ('b', h5py.special_dtype(vlen=str))])
+        dset = self.f.create_dataset('foo', (10,), dtype=dt)
+        mtype = h5t.py_create(dt)
+        data = np.empty((10,), dtype=dt)
+        data['a'] = np.arange(10)
+        data['b'] = [str(i) for i in range(10)]
+        for idx in range(3):
+            dset.id.write(h5s.ALL, h5s.ALL, data, mtype)
+            out = np.empty((10,), dtype=dt)
+            dset.id.read(h5s.ALL, h5s.ALL, out, mtype)
+            self.assertArrayEqual(out['a'], data['a'])
+            self.assertEqual(list(out['b']), list(data['b']))
+
+    def test_field_types(self):
+        """ Memory types for different fields get their own plans """
+        dt = np.dtype([('a', 'i4'), ('b', h5py.special_dtype(vlen=str))])
+        data = np.empty((10,), dtype=dt)
+        data['b'] = [str(i) for i in range(10)]
+        dset = self.f.create_dataset('foo', data=data)
+        for idx in range(3):
+            dset['a'] = np.arange(10, dtype='i4') + idx
+            self.assertArrayEqual(dset['a'], np.arange(10, dtype='i4') + idx)
+            self.assertEqual(list(dset['b']), list(data['b']))
+
+    def test_modified_type(self):
+        """ A memory type changed after use is planned again """
+        dt = np.dtype([('a', 'i4'), ('b', h5py.special_dtype(vlen=str))])
+        data = np.empty((10,), dtype=dt)
+        data['a'] = np.arange(10)
+        data['b'] = [str(i) for i in range(10)]
+        dset = self.f.create_dataset('foo', data=data)
+        mtype = h5t.create(h5t.COMPOUND, dt.itemsize)
+        mtype.insert(b'a', dt.fields['a'][1], h5t.py_create('i4'))
+        out = np.zeros((10,), dtype=dt)
+        dset.id.read(h5s.ALL, h5s.ALL, out, mtype)
+        self.assertArrayEqual(out['a'], data['a'])
+        mtype.insert(b'b', dt.fields['b'][1], h5t.py_create(dt.fields['b'][0]))
+        dset.id.read(h5s.ALL, h5s.ALL, out, mtype)
+        self.assertEqual(list(out['b']), list(data['b']))
+
+    def test_reopened(self):
+        """ A dataset reopened after closing gets new plans """
+        fname = self.f.filename
+        mtype = h5t.py_create('f8')
+        self.f.create_dataset('foo', data=np.arange(10, dtype='f8'))
+        out = np.zeros((10,))
+        self.f['foo'].id.read(h5s.ALL, h5s.ALL, out, mtype)
+        self.f.close()
+        with File(fname, 'a') as f:
+            del f['foo']
+            f.create_dataset('foo', data=np.arange(10, dtype='i2')*3)
+        self.f = File(fname, 'a')
+        dsid = self.f['foo'].id
+        dsid.read(h5s.ALL, h5s.ALL, out, mtype)
+        self.assertArrayEqual(out, np.arange(10)*3.0)
+        dsid.close()
+        with self.assertRaises(ValueError):
+            dsid.read(h5s.ALL, h5s.ALL, out, mtype)
+
 class TestLowOpen(BaseDataset):
 
     def test_get_access_list(self):
@@ -14,6 +14,11 @@ try:
 except ImportError:
     import unittest as ut
 
+import os
+import sys
+import subprocess
+
+import h5py
 from h5py import h5
 
 def fixnames():
@@ -48,3 +53,16 @@ class TestH5(ut.TestCase):
     def test_repr(self):
         cfg = h5.get_config()
         repr(cfg)
+
+    def test_interpreter_exit(self):
+        """ Interpreter exits cleanly after converters have been used """
+        code = ("import h5py, numpy; "
+                "dt = h5py.special_dtype(vlen=str); "
+                "h5py.h5t.py_create(dt, logical=True)")
+        env = dict(os.environ)
+        path = os.path.dirname(os.path.dirname(h5py.__file__))
+        env['PYTHONPATH'] = os.pathsep.join(
+            [path] + ([env['PYTHONPATH']] if 'PYTHONPATH' in env else []))
+        for c in ("import h5py", code):
+            rc = subprocess.call([sys.executable, '-c', c], env=env)
+            self.assertEqual(rc, 0)
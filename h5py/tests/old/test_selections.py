@@ -13,9 +13,13 @@
 
 from __future__ import absolute_import
 
+import time
+
 import numpy as np
 import h5py
+from h5py import h5s
 import h5py._hl.selections2 as sel
+import h5py._hl.selections as sel1
 
 from .common import TestCase, ut
 
@@ -86,12 +90,99 @@ class TestScalarSliceRules(TestCase):
             shape, selection = sel.read_selections_scalar(self.dsid, (1,))
 
 
+class TestStridedHyperslab(TestCase):
 
+    """
+        Internal feature: describe strided arrays as memory hyperslabs
+    """
 
+    def layout(self, arr):
+        return sel1.strided_hyperslab(arr.shape, arr.strides, arr.itemsize)
 
+    def test_contiguous(self):
+        """ C arrays are a hyperslab of themselves """
+        arr = np.zeros((4, 5, 6))
+        self.assertEqual(self.layout(arr), ((4, 5, 6), (1, 1, 1)))
+        self.assertEqual(self.layout(arr[2:3]), ((1, 5, 6), (1, 1, 1)))
 
+    def test_views(self):
+        """ Regular views of C arrays """
+        big = np.zeros((10, 4, 9))
+        self.assertEqual(self.layout(big[:, 3, ::2]), ((10, 36), (1, 2)))
+        self.assertEqual(self.layout(big[:, ::3, ::2]), ((10, 4, 9), (1, 3, 2)))
+        self.assertEqual(self.layout(big[::2, :, 1]), ((5, 72), (1, 9)))
+        self.assertEqual(self.layout(np.zeros(10, 'i4,i4')['f1']), ((19,), (2,)))
 
+    def test_unsupported(self):
+        """ Transposed, reversed, overlapping and unaligned layouts aren't
+        hyperslabs """
+        arr = np.zeros((4, 5))
+        self.assertIsNone(self.layout(arr.T))
+        self.assertIsNone(self.layout(arr[::-1]))
+        self.assertIsNone(sel1.strided_hyperslab((3, 3), (8, 8), 8))
+        self.assertIsNone(self.layout(np.zeros(10, 'i4,i2')['f0']))
 
 
+class TestHyperslabUnion(TestCase):
 
+    """
+        Internal feature: select the union of many hyperslabs at once
+    """
 
+    def mask(self, space):
+        """ Boolean array of the points selected in a 2-D space """
+        out = np.zeros(space.shape, dtype='bool')
+        for lower, upper in space.get_select_hyper_blocklist().astype('i8'):
+            out[lower[0]:upper[0]+1, lower[1]:upper[1]+1] = True
+        return out
+
+    def test_matches_or(self):
+        """ Same selection as select_hyperslab with SELECT_OR """
+        start = np.random.randint(0, 30, (50, 2))
+        count = np.random.randint(1, 5, (50, 2))
+        stride = np.random.randint(1, 4, (50, 2))
+        expected = h5s.create_simple((50, 50))
+        expected.select_none()
+        for row in range(50):
+            expected.select_hyperslab(tuple(start[row]), tuple(count[row]),
+                                      tuple(stride[row]), op=h5s.SELECT_OR)
+        space = h5s.create_simple((50, 50))
+        space.select_hyperslabs(start, count, stride)
+        self.assertTrue(np.array_equal(self.mask(space), self.mask(expected)))
+
+    def test_replaces(self):
+        """ The previous selection is replaced """
+        space = h5s.create_simple((10, 10))
+        space.select_hyperslab((0, 0), (5, 5))
+        space.select_hyperslabs([(8, 8)], [(2, 2)])
+        self.assertEqual(space.get_select_npoints(), 4)
+        self.assertEqual(space.get_select_bounds(), ((8, 8), (9, 9)))
+
+    def test_empty(self):
+        """ No hyperslabs select nothing """
+        space = h5s.create_simple((10,))
+        space.select_hyperslabs(np.zeros((0, 1)), np.zeros((0, 1)))
+        self.assertEqual(space.get_select_npoints(), 0)
+
+    def test_shape(self):
+        """ Arrays must have one column per axis """
+        space = h5s.create_simple((10, 10))
+        with self.assertRaises(ValueError):
+            space.select_hyperslabs(np.zeros((3, 1)), np.ones((3, 1)))
+
+    @ut.skipIf(h5py.version.hdf5_version_tuple < (1, 10, 7),
+               "Hyperslabs are merged pairwise from HDF5 1.10.7")
+    def test_scaling(self):
+        """ Time grows roughly linearly with the number of hyperslabs """
+        def build(n):
+            space = h5s.create_simple((10*n,))
+            start = np.sort(np.random.choice(10*n, n, replace=False)).reshape((n, 1))
+            begin = time.time()
+            space.select_hyperslabs(start, np.ones((n, 1)))
+            elapsed = time.time() - begin
+            self.assertEqual(space.get_select_npoints(), n)
+            return elapsed
+        small = build(25000)
+        large = build(100000)
+        # Quadratic growth would make this about 16
+        self.assertLess(large, 10*small + 0.5)
@@ -222,6 +222,111 @@ class TestArraySlicing(BaseSlicing):
 
         self.assertTrue(np.all(dset[...] == out))
 
+class TestFancyIndexing(BaseSlicing):
+
+    """
+        Feature: Index lists may be out of order, contain repeats and be
+        given for several axes
+    """
+
+    def setUp(self):
+        BaseSlicing.setUp(self)
+        self.arr = np.arange(60, dtype='i').reshape((10, 6))
+        self.dset = self.f.create_dataset('x', data=self.arr)
+
+    def test_read_unsorted(self):
+        """ Reading unsorted indices follows the index order """
+        self.assertArrayEqual(self.dset[[7,2,5], :], self.arr[[7,2,5], :])
+        self.assertArrayEqual(self.dset[1:8, [4,0,3]], self.arr[1:8, [4,0,3]])
+
+    def test_read_repeated(self):
+        """ Reading repeated indices repeats the data """
+        self.assertArrayEqual(self.dset[3, [5,1,5,5]], self.arr[3, [5,1,5,5]])
+
+    def test_write_unsorted(self):
+        """ Writing unsorted indices follows the index order """
+        data = np.array([[-1]*6, [-2]*6, [-3]*6], dtype='i')
+        self.dset[[7,2,5]] = data
+        self.arr[[7,2,5]] = data
+        self.assertArrayEqual(self.dset[...], self.arr)
+
+    def test_write_repeated(self):
+        """ For repeated indices, the last value written wins """
+        self.dset[0, [4,1,4,1,4]] = np.array([10,11,12,13,14], dtype='i')
+        self.assertArrayEqual(self.dset[0, [1,4]], np.array([13,14], dtype='i'))
+
+    def test_write_shape(self):
+        """ Data must match the shape of the full index list """
+        with self.assertRaises(TypeError):
+            self.dset[0, [4,1,4]] = np.array([1,2], dtype='i')
+
+    def test_many_runs(self):
+        """ Long irregular index lists """
+        arr = np.arange(1000000, dtype='i4')
+        dset = self.f.create_dataset('y', data=arr)
+        indices = np.random.choice(1000000, 100000, replace=False)
+        self.assertArrayEqual(dset[indices.tolist()], arr[indices])
+        indices.sort()
+        dset[indices.tolist()] = -arr[indices]
+        arr[indices] *= -1
+        self.assertArrayEqual(dset[...], arr)
+
+    def test_read_orthogonal(self):
+        """ Lists on several axes select an outer product """
+        out = self.dset[[1,5,9], [0,2,3,4]]
+        self.assertArrayEqual(out, self.arr[np.ix_([1,5,9], [0,2,3,4])])
+
+    def test_read_orthogonal_3d(self):
+        """ Orthogonal lists mix with slices, ints and masks """
+        arr = np.arange(4*5*6, dtype='i').reshape((4,5,6))
+        dset = self.f.create_dataset('y', data=arr)
+        mask = np.array([True, False, True, True, False, True])
+        out = dset[[3,0], 1:4, mask]
+        self.assertArrayEqual(out, arr[[3,0], 1:4][..., mask])
+        out = dset[[2,0,2], 4, [5,1]]
+        self.assertArrayEqual(out, arr[np.ix_([2,0,2], [4], [5,1])][:, 0, :])
+
+    def test_write_orthogonal(self):
+        """ Writing to lists on several axes """
+        data = np.array([[-1,-2], [-3,-4], [-5,-6]], dtype='i')
+        self.dset[[8,0,4], [5,2]] = data
+        self.arr[np.ix_([8,0,4], [5,2])] = data
+        self.assertArrayEqual(self.dset[...], self.arr)
+
+    def test_many_runs_orthogonal(self):
+        """ Irregular lists on several axes, read through the bounding box """
+        arr = np.arange(300*400, dtype='i4').reshape((300, 400))
+        dset = self.f.create_dataset('y', data=arr)
+        rows = np.random.randint(0, 300, 100).tolist()
+        cols = np.random.randint(0, 400, 120).tolist()
+        self.assertArrayEqual(dset[rows, cols], arr[np.ix_(rows, cols)])
+        self.assertArrayEqual(dset[rows, 5:9], arr[rows, 5:9])
+
+    def test_many_runs_sparse(self):
+        """ Irregular lists on several axes, too sparse for the bounding box """
+        arr = np.arange(50*20000, dtype='i4').reshape((50, 20000))
+        dset = self.f.create_dataset('y', data=arr)
+        rows = np.random.choice(50, 40, replace=False).tolist()
+        cols = np.random.choice(20000, 300, replace=False).tolist()
+        self.assertArrayEqual(dset[rows, cols], arr[np.ix_(rows, cols)])
+
+    def test_many_runs_write(self):
+        """ Writing irregular lists on several axes """
+        arr = np.arange(300*400, dtype='i4').reshape((300, 400))
+        dset = self.f.create_dataset('y', data=arr)
+        rows = np.sort(np.random.choice(300, 100, replace=False)).tolist()
+        cols = np.sort(np.random.choice(400, 120, replace=False)).tolist()
+        data = -np.arange(100*120, dtype='i4').reshape((100, 120))
+        dset[rows, cols] = data
+        arr[np.ix_(rows, cols)] = data
+        self.assertArrayEqual(dset[...], arr)
+
+    def test_direct_unsorted(self):
+        """ Direct transfers reject unsorted index lists """
+        out = np.empty((3, 6), dtype='i')
+        with self.assertRaises(TypeError):
+            self.dset.read_direct(out, np.s_[[7,2,5], :])
+
 class TestEmptySlicing(BaseSlicing):
 
     """
@@ -0,0 +1,64 @@
+# This file is part of h5py, a Python interface to the HDF5 library.
+#
+# http://www.h5py.org
+#
+# Copyright 2008-2013 Andrew Collette and contributors
+#
+# License:  Standard 3-clause BSD; see "license.txt" for full license terms
+#           and contributor agreement.
+
+"""
+    Benchmarks reads and writes of long, irregular index lists.
+
+    Random index lists split into about one hyperslab per two indices.
+    Building the selection should take time roughly proportional to the
+    number of indices, not to its square.  Lists on two axes select one
+    hyperslab per pair of runs, so those reads go through the bounding box.
+"""
+
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import h5py
+
+COUNTS = (10000, 20000, 50000, 100000)
+SIDES = (100, 200, 400)
+
+
+def timeit(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+if __name__ == '__main__':
+
+    fd, fname = tempfile.mkstemp(suffix='.hdf5')
+    os.close(fd)
+    try:
+        with h5py.File(fname, 'w') as f:
+            for n in COUNTS:
+                dset = f.create_dataset('x%d' % n, data=np.arange(10*n, dtype='f8'))
+                indices = np.sort(np.random.choice(10*n, n, replace=False)).tolist()
+                data = np.random.random(n)
+
+                def write():
+                    dset[indices] = data
+                t_read = timeit(lambda: dset[indices])
+                t_write = timeit(write)
+                print("%6d random indices:  read %.3f s  write %.3f s"
+                      % (n, t_read, t_write))
+
+            for n in SIDES:
+                dset = f.create_dataset('y%d' % n, data=np.zeros((4*n, 4*n), dtype='f8'))
+                rows = np.random.randint(0, 4*n, n).tolist()
+                cols = np.random.randint(0, 4*n, n).tolist()
+                t_read = timeit(lambda: dset[rows, cols])
+                print("%4d x %-4d random lists:  read %.3f s" % (n, n, t_read))
+    finally:
+        os.remove(fname)
@@ -0,0 +1,95 @@
+# This file is part of h5py, a Python interface to the HDF5 library.
+#
+# http://www.h5py.org
+#
+# Copyright 2008-2013 Andrew Collette and contributors
+#
+# License:  Standard 3-clause BSD; see "license.txt" for full license terms
+#           and contributor agreement.
+
+"""
+    Benchmarks lock contention for threads reading from unrelated files.
+
+    Like examples/threading_example.py, each worker is a threading.Thread
+    subclass sharing h5py with the others.  Here every worker owns its own
+    file and repeatedly reads slices from it.  Total throughput is reported
+    for increasing thread counts, with the global lock and (if the HDF5
+    library is thread-safe) with per-file locking.
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import threading
+
+import numpy as np
+
+import h5py
+
+SHAPE = (2048, 4096)
+NREADS = 200
+THREAD_COUNTS = (1, 2, 4, 8)
+
+
+class ReadThread(threading.Thread):
+
+    """
+        Reads random 64-row slices from a single dataset.
+    """
+
+    def __init__(self, fname):
+        threading.Thread.__init__(self)
+        self.fname = fname
+
+    def run(self):
+        with h5py.File(self.fname, 'r') as f:
+            dset = f['data']
+            for idx in np.random.randint(0, SHAPE[0]-64, NREADS):
+                dset[idx:idx+64]
+
+
+def make_files(dirname, n):
+    names = [os.path.join(dirname, "bench_file_locking_%d.hdf5" % idx)
+             for idx in range(n)]
+    for name in names:
+        with h5py.File(name, 'w') as f:
+            f.create_dataset('data', data=np.random.random(SHAPE))
+    return names
+
+
+def run(names):
+    threads = [ReadThread(name) for name in names]
+    start = time.time()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return len(names)*NREADS/(time.time()-start)
+
+
+if __name__ == '__main__':
+
+    config = h5py.get_config()
+    dirname = tempfile.mkdtemp()
+    try:
+        names = make_files(dirname, max(THREAD_COUNTS))
+
+        modes = [False]
+        try:
+            config.per_file_locking = True
+            modes.append(True)
+        except RuntimeError:
+            print("HDF5 is not thread-safe; per-file locking unavailable")
+        config.per_file_locking = False
+
+        for mode in modes:
+            config.per_file_locking = mode
+            print("Per-file locking: %s" % mode)
+            for nthreads in THREAD_COUNTS:
+                rate = run(names[:nthreads])
+                print("    %2d threads: %8.1f reads/s" % (nthreads, rate))
+    finally:
+        shutil.rmtree(dirname)
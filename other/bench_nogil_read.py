@@ -0,0 +1,86 @@
+# This file is part of h5py, a Python interface to the HDF5 library.
+#
+# http://www.h5py.org
+#
+# Copyright 2008-2013 Andrew Collette and contributors
+#
+# License:  Standard 3-clause BSD; see "license.txt" for full license terms
+#           and contributor agreement.
+
+"""
+    Benchmarks NumPy computation running alongside Dataset.__getitem__.
+
+    A reader thread repeatedly reads a large dataset while a compute thread
+    performs NumPy work.  Since the GIL is released during H5Dread, the
+    compute thread should complete roughly as many iterations as it does
+    when running alone.
+"""
+
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+import threading
+
+import numpy as np
+
+import h5py
+
+SHAPE = (4096, 8192)    # 256 MB of float64
+DURATION = 5.0
+
+
+def make_file(fname):
+    with h5py.File(fname, 'w') as f:
+        dset = f.create_dataset('data', SHAPE, dtype='f8')
+        row = np.random.random(SHAPE[1])
+        for idx in range(SHAPE[0]):
+            dset[idx] = row
+
+
+def compute(stop, counter):
+    a = np.random.random((256, 256))
+    while not stop.is_set():
+        np.dot(a, a)
+        counter[0] += 1
+
+
+def read(stop, counter, dset):
+    while not stop.is_set():
+        dset[...]
+        counter[0] += 1
+
+
+def run(fname, with_reader):
+    stop = threading.Event()
+    ncompute = [0]
+    nread = [0]
+    with h5py.File(fname, 'r') as f:
+        threads = [threading.Thread(target=compute, args=(stop, ncompute))]
+        if with_reader:
+            threads.append(threading.Thread(target=read,
+                                            args=(stop, nread, f['data'])))
+        for th in threads:
+            th.start()
+        time.sleep(DURATION)
+        stop.set()
+        for th in threads:
+            th.join()
+    return ncompute[0], nread[0]
+
+
+if __name__ == '__main__':
+
+    fd, fname = tempfile.mkstemp(suffix='.hdf5')
+    os.close(fd)
+    try:
+        make_file(fname)
+        alone, _ = run(fname, False)
+        shared, nread = run(fname, True)
+    finally:
+        os.remove(fname)
+
+    print("Compute iterations alone:          %d" % alone)
+    print("Compute iterations while reading:  %d (%d full reads)" % (shared, nread))
+    print("Ratio: %.2f" % (shared/float(alone)))
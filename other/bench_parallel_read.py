@@ -0,0 +1,71 @@
+# This file is part of h5py, a Python interface to the HDF5 library.
+#
+# http://www.h5py.org
+#
+# Copyright 2008-2013 Andrew Collette and contributors
+#
+# License:  Standard 3-clause BSD; see "license.txt" for full license terms
+#           and contributor agreement.
+
+"""
+    Benchmarks Dataset.read(workers=N) and Dataset.write(workers=N)
+    against ordinary slicing, for gzip- and LZF-compressed datasets.
+"""
+
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import h5py
+
+SHAPE = (4096, 4096)    # 128 MB of float64
+CHUNKS = (256, 256)
+WORKERS = (2, 4, 8)
+
+
+def make_file(fname, data):
+    with h5py.File(fname, 'w') as f:
+        f.create_dataset('gzip', data=data, chunks=CHUNKS,
+                         compression='gzip', shuffle=True)
+        f.create_dataset('lzf', data=data, chunks=CHUNKS, compression='lzf')
+
+
+def timeit(func):
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+if __name__ == '__main__':
+
+    data = np.random.randint(0, 1000, SHAPE).astype('f8')
+    fd, fname = tempfile.mkstemp(suffix='.hdf5')
+    os.close(fd)
+    try:
+        make_file(fname, data)
+
+        with h5py.File(fname, 'r+') as f:
+            for name in ('gzip', 'lzf'):
+                dset = f[name]
+
+                serial = timeit(lambda: dset[...])
+                print("%-5s read serial:     %.2f s" % (name, serial))
+                for workers in WORKERS:
+                    parallel = timeit(lambda: dset.read(workers=workers))
+                    print("%-5s read %d workers:  %.2f s (%.1fx)" % (name, workers,
+                          parallel, serial/parallel))
+
+                def write():
+                    dset[...] = data
+                serial = timeit(write)
+                print("%-5s write serial:    %.2f s" % (name, serial))
+                for workers in WORKERS:
+                    parallel = timeit(lambda: dset.write(None, data, workers=workers))
+                    print("%-5s write %d workers: %.2f s (%.1fx)" % (name, workers,
+                          parallel, serial/parallel))
+    finally:
+        os.remove(fname)
@@ -0,0 +1,80 @@
+# This file is part of h5py, a Python interface to the HDF5 library.
+#
+# http://www.h5py.org
+#
+# Copyright 2008-2013 Andrew Collette and contributors
+#
+# License:  Standard 3-clause BSD; see "license.txt" for full license terms
+#           and contributor agreement.
+
+"""
+    Benchmarks strided reads of variable-length string and compound
+    datasets, which go through the proxy buffer and its scatter/gather
+    step.  Both the file and the memory selection are strided.
+"""
+
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import h5py
+
+ROWS = 2000
+COLS = 500
+REPEAT = 5
+
+
+def make_file(fname):
+    str_dt = h5py.special_dtype(vlen=str)
+    cmp_dt = np.dtype([('index', 'i8'), ('value', 'f8'), ('name', str_dt)])
+
+    strings = np.array(["row %d col %d" % (i, j) for i in range(ROWS)
+                        for j in range(COLS)], dtype=object)
+    records = np.empty((ROWS*COLS,), dtype=cmp_dt)
+    records['index'] = np.arange(ROWS*COLS)
+    records['value'] = np.random.random(ROWS*COLS)
+    records['name'] = strings
+
+    with h5py.File(fname, 'w') as f:
+        f.create_dataset('vlen', data=strings.reshape((ROWS, COLS)), dtype=str_dt)
+        f.create_dataset('compound', data=records.reshape((ROWS, COLS)))
+
+
+def timeit(func):
+    start = time.time()
+    for _ in range(REPEAT):
+        func()
+    return (time.time() - start)/REPEAT
+
+
+if __name__ == '__main__':
+
+    fd, fname = tempfile.mkstemp(suffix='.hdf5')
+    os.close(fd)
+    try:
+        make_file(fname)
+
+        with h5py.File(fname, 'r') as f:
+            for name in ('vlen', 'compound'):
+                dset = f[name]
+                dest = np.empty((ROWS, COLS), dtype=dset.dtype)
+
+                t = timeit(lambda: dset[::2, ::3])
+                print("%-8s  dset[::2, ::3]:              %.3f s" % (name, t))
+
+                t = timeit(lambda: dset[::2, 10:400])
+                print("%-8s  dset[::2, 10:400]:           %.3f s" % (name, t))
+
+                t = timeit(lambda: dset.read_direct(dest, np.s_[0:1000, 0:250],
+                                                    np.s_[::2, ::2]))
+                print("%-8s  read_direct to [::2, ::2]:   %.3f s" % (name, t))
+
+                t = timeit(lambda: dset.read_direct(dest, np.s_[0:1000, 0:400],
+                                                    np.s_[1000:2000, 50:450]))
+                print("%-8s  read_direct to a sub-block:  %.3f s" % (name, t))
+    finally:
+        os.remove(fname)